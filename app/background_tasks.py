@@ -3,33 +3,73 @@
 Планировщик для автоматической проверки оплат и синхронизации
 """
 
+import functools
+from datetime import datetime
+
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
 
-from app.database import (
-    migrate_many_users,
-    sync_is_vip_for_all_users,
+from app.database.aio import (
+    run_sync,
+    sync_vip_status,
     process_all_pending_payments
 )
-from app.services import notify_payment_processed
+from app.database.replicator import replicator
+from app.database.write_buffer import write_buffer
+from app.database.votes import vote_aggregator
+from app.services.broadcast_jobs import broadcast_jobs
 from app.services.subscription import (
-    check_and_expire_subscriptions,
-    check_expiring_soon_subscriptions,
-    check_expired_subscriptions_for_reminders
+    scan_subscriptions,
+    expire_subscriptions
 )
+from app.utils.api_stats import scoped
+from app.utils.job_stats import job_stats
+from app.utils.leader_lease import leader_lease
 from app.services.notifications import (
-    notify_expiring_3_days,
-    notify_expiring_today,
-    notify_expired_3_days,
-    notify_expired_7_days
+    notify_payments_processed,
+    notify_subscription_reminders
 )
 from app.config import (
     PAYMENT_CHECK_INTERVAL_SECONDS,
-    USER_SYNC_INTERVAL_MINUTES
+    USER_SYNC_INTERVAL_MINUTES,
+    JOB_MISFIRE_GRACE_SECONDS,
+    WRITE_BUFFER_FLUSH_INTERVAL_SECONDS,
+    REPLICATION_PUSH_INTERVAL_SECONDS,
+    REPLICATION_PULL_INTERVAL_MINUTES,
+    ORPHAN_RECOVERY_INTERVAL_SECONDS
+)
+
+
+# Общие настройки задач: запуск не накладывается на предыдущий (max_instances=1),
+# пропущенные сроки сливаются в один запуск (coalesce), опоздание до misfire_grace_time
+JOB_DEFAULTS = {
+    'max_instances': 1,
+    'coalesce': True,
+    'misfire_grace_time': JOB_MISFIRE_GRACE_SECONDS,
+}
+
+# Задачи, которые выполняет только ведущий процесс (остальные - в каждом процессе).
+# Репликация тоже: local.db общий, и два процесса отправили бы одни и те же строки
+LEADER_JOB_IDS = (
+    'check_payments', 'sync_users', 'check_subscriptions', 'recover_orphans',
+    'replication_push', 'replication_pull'
 )
 
 
+def leader_only(task):
+    """Пропустить запуск, если процесс не ведущий (аренда потеряна между heartbeat)"""
+    @functools.wraps(task)
+    async def wrapper(*args, **kwargs):
+        if not leader_lease.is_leader:
+            print(f"💤 {task.__name__} пропущена: процесс не ведущий")
+            return None
+        return await task(*args, **kwargs)
+    return wrapper
+
+
+@leader_only
+@scoped('job:check_payments')
 async def check_payments_task(bot):
     """
     Фоновая задача проверки и обработки оплат из Tilda
@@ -37,32 +77,45 @@ async def check_payments_task(bot):
     """
     print("💳 Проверка оплат...")
 
-    notified_users = process_all_pending_payments()
+    notified_users = await process_all_pending_payments()
 
     if notified_users:
         print(f"📨 Отправка уведомлений {len(notified_users)} пользователям...")
-        for user_id in notified_users:
-            await notify_payment_processed(bot, user_id)
+        await notify_payments_processed(bot, notified_users)
 
     print("✅ Проверка оплат завершена!\n")
 
 
+@leader_only
+@scoped('job:sync_users')
 async def sync_users_task(bot):
-    print("🔄 Синхронизация пользователей...")
+    """
+    Миграция временных VIP + синхронизация is_vip
 
-    print("📋 Миграция временных VIP пользователей...")
-    migrate_many_users()
+    Одно чтение (колонки users до is_vip и лист members); если с прошлого
+    запуска ничего не поменялось, на этом всё и заканчивается.
+    """
+    print("🔄 Синхронизация пользователей...")
 
-    print("📋 Синхронизация is_vip...")
-    sync_is_vip_for_all_users()
+    await sync_vip_status()
 
     print("✅ Синхронизация завершена!\n")
 
 
+@leader_only
+@scoped('job:check_subscriptions')
 async def check_subscriptions_task(bot):
     """
     Фоновая задача проверки подписок
-    Запускается раз в день в 12:00 + сразу при старте бота
+    Запускается раз в день в 12:00 + сразу, как процесс стал ведущим
+
+    Деактивация истекших подписок выполняется при каждом запуске.
+    Напоминания - не больше раза в день: отметка дня общая для всех процессов
+    (leader_lease.claim_day), поэтому смена ведущего, перезапуск или запуск
+    в 12:00 после утреннего старта не отправят их повторно.
+
+    Лист users читается один раз, все группы считаются в памяти,
+    деактивация - одним batch_update.
 
     Уведомления:
     - За 3 дня до истечения
@@ -70,48 +123,90 @@ async def check_subscriptions_task(bot):
     - Через 3 дня после истечения
     - Через 7 дней после истечения (последнее)
     """
-    print("📅 Проверка подписок...")
+    send_reminders = leader_lease.claim_day('check_subscriptions')
+    if not send_reminders:
+        print("ℹ️ Напоминания сегодня уже отправлены: только деактивация истекших подписок")
+
+    try:
+        await _check_subscriptions(bot, send_reminders)
+    except Exception:
+        # Упавшую проверку можно повторить в тот же день
+        if send_reminders:
+            leader_lease.release_day('check_subscriptions')
+        raise
+
 
-    # 1. СНАЧАЛА проверяем и отправляем уведомления (пока подписки ещё активны!)
-    expiring = await check_expiring_soon_subscriptions()
+async def _check_subscriptions(bot, send_reminders: bool = True):
+    print("📅 Проверка подписок...")
 
-    # Уведомления за 3 дня
-    for user_id in expiring['expiring_3_days']:
-        await notify_expiring_3_days(bot, user_id)
+    # 0. Один проход по снимку users
+    groups = await run_sync(scan_subscriptions)
 
-    # Уведомления в последний день (сегодня)
-    for user_id in expiring['expiring_today']:
-        await notify_expiring_today(bot, user_id)
+    # 1. СНАЧАЛА отправляем уведомления (пока подписки ещё активны!)
+    if send_reminders:
+        # Уведомления за 3 дня
+        await notify_subscription_reminders(bot, 'expiring_3_days', groups['expiring_3_days'])
 
-    # 2. ПОТОМ деактивируем истекшие подписки
-    await check_and_expire_subscriptions()
+        # Уведомления в последний день (сегодня)
+        await notify_subscription_reminders(bot, 'expiring_today', groups['expiring_today'])
 
-    # 3. Проверяем истёкшие подписки для напоминаний (после истечения)
-    expired_reminders = await check_expired_subscriptions_for_reminders()
+    # 2. ПОТОМ деактивируем истекшие подписки (при каждом запуске)
+    await run_sync(expire_subscriptions, groups['to_expire'])
 
-    # Уведомления через 3 дня после истечения
-    for user_id in expired_reminders['expired_3_days']:
-        await notify_expired_3_days(bot, user_id)
+    # 3. Напоминания после истечения
+    if send_reminders:
+        # Уведомления через 3 дня после истечения
+        await notify_subscription_reminders(bot, 'expired_3_days', groups['expired_3_days'])
 
-    # Уведомления через 7 дней после истечения (последнее)
-    for user_id in expired_reminders['expired_7_days']:
-        await notify_expired_7_days(bot, user_id)
+        # Уведомления через 7 дней после истечения (последнее)
+        await notify_subscription_reminders(bot, 'expired_7_days', groups['expired_7_days'])
 
     print("✅ Проверка подписок завершена!\n")
 
 
+@leader_only
+@scoped('job:recover_orphans')
+async def recover_orphans_task(bot):
+    """Продолжить рассылки и записать голоса, оставшиеся от остановленных или упавших процессов"""
+    await broadcast_jobs.resume_interrupted()
+    await run_sync(vote_aggregator.adopt_orphans, leader_lease.alive_owners())
+
+
 # ============================================================================
 # НАСТРОЙКА ПЛАНИРОВЩИКА
 # ============================================================================
 
-async def run_initial_subscription_check(bot):
-    """Запустить проверку подписок сразу при старте бота"""
-    print("\n🚀 Запуск начальной проверки подписок...")
-    await check_subscriptions_task(bot)
+@scoped('job:flush_write_buffer')
+async def flush_write_buffer_task(bot):
+    """Сброс буфера отложенной записи пользователей и очереди голосов в лист users"""
+    if len(write_buffer):
+        await run_sync(write_buffer.flush)
+    if len(vote_aggregator):
+        await run_sync(vote_aggregator.flush)
+
+
+@leader_only
+@scoped('job:replication_push')
+async def replication_push_task(bot):
+    """Отправка локальных изменений в Google Sheets (режим STORAGE_BACKEND=sqlite)"""
+    await run_sync(replicator.push)
+
+
+@leader_only
+@scoped('job:replication_pull')
+async def replication_pull_task(bot):
+    """Сверка с Google Sheets: подтягиваем ручные правки (режим STORAGE_BACKEND=sqlite)"""
+    print("🔁 Сверка локальной базы с Google Sheets...")
+    await run_sync(replicator.pull)
 
 
 def setup_scheduler(bot):
-    scheduler = AsyncIOScheduler()
+    scheduler = AsyncIOScheduler(job_defaults=JOB_DEFAULTS)
+    # Длительность, наложения, опоздания и вызовы API каждой задачи (/jobs)
+    job_stats.attach(scheduler)
+
+    # Задачи 1-3 и 6-8 выполняет только ведущий процесс: они добавляются на паузе
+    # и включаются, когда этот процесс получает аренду (см. _on_leader_change)
 
     # Задача 1: Проверка оплат (каждые 30 секунд)
     scheduler.add_job(
@@ -120,6 +215,7 @@ def setup_scheduler(bot):
         args=[bot],
         id='check_payments',
         name='Проверка оплат',
+        next_run_time=None,
         replace_existing=True
     )
     print(f"⚡ Задача 'Проверка оплат' настроена: каждые {PAYMENT_CHECK_INTERVAL_SECONDS} секунд")
@@ -131,6 +227,7 @@ def setup_scheduler(bot):
         args=[bot],
         id='sync_users',
         name='Синхронизация пользователей',
+        next_run_time=None,
         replace_existing=True
     )
     print(f"🔄 Задача 'Синхронизация пользователей' настроена: каждые {USER_SYNC_INTERVAL_MINUTES} минут")
@@ -142,21 +239,86 @@ def setup_scheduler(bot):
         args=[bot],
         id='check_subscriptions',
         name='Проверка подписок',
+        next_run_time=None,
         replace_existing=True
     )
     print("📅 Задача 'Проверка подписок' настроена: каждый день в 12:00")
 
-    # Задача 4: Начальная проверка подписок (сразу при запуске)
+    # Задача 5: Сброс буфера записи пользователей (каждые 2 секунды)
     scheduler.add_job(
-        check_subscriptions_task,
+        flush_write_buffer_task,
+        trigger=IntervalTrigger(seconds=WRITE_BUFFER_FLUSH_INTERVAL_SECONDS),
+        args=[bot],
+        id='flush_write_buffer',
+        name='Сброс буфера записи',
+        replace_existing=True
+    )
+    print(f"💾 Задача 'Сброс буфера записи' настроена: каждые {WRITE_BUFFER_FLUSH_INTERVAL_SECONDS} секунд")
+
+    # Задачи 6-7: Репликация локальной базы (только в режиме STORAGE_BACKEND=sqlite)
+    if replicator:
+        scheduler.add_job(
+            replication_push_task,
+            trigger=IntervalTrigger(seconds=REPLICATION_PUSH_INTERVAL_SECONDS),
+            args=[bot],
+            id='replication_push',
+            name='Отправка изменений в Google Sheets',
+            next_run_time=None,
+            replace_existing=True
+        )
+        scheduler.add_job(
+            replication_pull_task,
+            trigger=IntervalTrigger(minutes=REPLICATION_PULL_INTERVAL_MINUTES),
+            args=[bot],
+            id='replication_pull',
+            name='Сверка с Google Sheets',
+            next_run_time=None,
+            replace_existing=True
+        )
+        print(
+            f"💾 Репликация настроена: отправка каждые {REPLICATION_PUSH_INTERVAL_SECONDS} секунд, "
+            f"сверка каждые {REPLICATION_PULL_INTERVAL_MINUTES} минут"
+        )
+
+    # Задача 8: Работа завершившихся процессов (прерванные рассылки, журналы голосов)
+    scheduler.add_job(
+        recover_orphans_task,
+        trigger=IntervalTrigger(seconds=ORPHAN_RECOVERY_INTERVAL_SECONDS),
         args=[bot],
-        id='initial_subscription_check',
-        name='Начальная проверка подписок',
+        id='recover_orphans',
+        name='Подхват прерванной работы',
+        next_run_time=None,
         replace_existing=True
     )
-    print("🔍 Начальная проверка подписок будет запущена сразу...")
+    print(f"🔁 Задача 'Подхват прерванной работы' настроена: каждые {ORPHAN_RECOVERY_INTERVAL_SECONDS} секунд")
 
     scheduler.start()
     print("🚀 Планировщик запущен!\n")
 
+    leader_lease.on_change(functools.partial(_on_leader_change, scheduler, bot))
+    leader_lease.start()
+
     return scheduler
+
+
+def _on_leader_change(scheduler, bot, leader: bool):
+    """Включить задачи ведущего (и начальную проверку подписок) или поставить их на паузу"""
+    for job_id in LEADER_JOB_IDS:
+        if scheduler.get_job(job_id) is None:
+            # Репликации нет без STORAGE_BACKEND=sqlite
+            continue
+        if leader:
+            scheduler.resume_job(job_id)
+        else:
+            scheduler.pause_job(job_id)
+
+    if leader:
+        now = datetime.now(scheduler.timezone)
+        # Прерванные рассылки - сразу, не дожидаясь интервала
+        scheduler.modify_job('recover_orphans', next_run_time=now)
+
+        # Начальная проверка подписок - ближайший запуск той же задачи, а не отдельная:
+        # один id, одна статистика в /jobs, max_instances=1 не даст наложиться на запуск в 12:00
+        # (после неё следующий запуск снова по расписанию)
+        scheduler.modify_job('check_subscriptions', next_run_time=now)
+        print("🔍 Начальная проверка подписок будет запущена сразу...")
@@ -19,6 +19,10 @@ PAYMENT_CHECK_INTERVAL_SECONDS = 30
 # Интервал синхронизации пользователей (в минутах)
 USER_SYNC_INTERVAL_MINUTES = 15
 
+# Насколько задача может опоздать (event loop занят, процесс на паузе) и всё
+# равно выполниться, в секундах; более поздний запуск пропускается и учитывается в /jobs
+JOB_MISFIRE_GRACE_SECONDS = 15
+
 
 # ============================================================================
 # ВНЕШНИЕ ССЫЛКИ
@@ -38,13 +42,161 @@ SUPPORT_URL = 'https://t.me/peaceful_room_help'
 # НАСТРОЙКИ РАССЫЛКИ
 # ============================================================================
 
-# Задержка между сообщениями при рассылке (в секундах)
+# Начальная задержка между сообщениями при рассылке (в секундах)
+# Рассылка стартует с 1/BROADCAST_DELAY_SECONDS сообщений в секунду и дальше
+# сама разгоняется до TELEGRAM_MAX_MESSAGES_PER_SECOND (или замедляется при RetryAfter)
 BROADCAST_DELAY_SECONDS = 0.10
 
+# Сколько сообщений рассылки отправляется параллельно
+BROADCAST_CONCURRENCY = 10
+
+# Файл SQLite с заданиями рассылок (для продолжения после перезапуска)
+BROADCAST_JOBS_DB = 'data/broadcasts.db'
+
+# Как часто сохранять прогресс рассылки (каждые N получателей)
+BROADCAST_CHECKPOINT_INTERVAL = 50
+
 # Частота обновления прогресса рассылки (каждые N пользователей)
 BROADCAST_PROGRESS_UPDATE_INTERVAL = 50
 
 
+# ============================================================================
+# УВЕДОМЛЕНИЯ
+# ============================================================================
+
+# Общий лимит Telegram на отправку сообщений (сообщений в секунду)
+TELEGRAM_MAX_MESSAGES_PER_SECOND = 30
+
+# Сколько уведомлений отправляется параллельно
+NOTIFICATION_CONCURRENCY = 10
+
+# Сколько раз повторять отправку после RetryAfter
+NOTIFICATION_MAX_RETRIES = 3
+
+
+# ============================================================================
+# РАБОТА С БД (Google Sheets)
+# ============================================================================
+
+# Размер пула потоков для синхронных вызовов gspread из обработчиков
+DB_EXECUTOR_MAX_WORKERS = 8
+
+# Интервал замера задержки event loop (в секундах)
+LOOP_LAG_CHECK_INTERVAL_SECONDS = 0.5
+
+# Порог задержки event loop, после которого пишем предупреждение (в секундах)
+LOOP_LAG_WARNING_THRESHOLD_SECONDS = 0.2
+
+# Время жизни снимка таблицы users в памяти (в секундах)
+# По истечении снимок перечитывается одним запросом get_all_values()
+USERS_CACHE_TTL_SECONDS = 600
+
+# Время жизни кэша листа config (ссылки и списки VIP/Diamond, в секундах)
+# После истечения отдаём старые значения и обновляем кэш в фоне
+CONFIG_CACHE_TTL_SECONDS = 60
+
+# Время жизни списков VIP/Diamond/временный VIP из листа members (в секундах)
+# После истечения отдаём старые значения и обновляем списки в фоне
+MEMBERSHIP_CACHE_TTL_SECONDS = 60
+
+# Файл с курсором чтения листа Tilda (последняя прочитанная строка + необработанные)
+TILDA_STATE_FILE = 'data/tilda_state.json'
+
+# Полная сверка листа Tilda раз в N проверок (страховка от ручных правок)
+TILDA_FULL_RECONCILE_EVERY = 20
+
+# Отложенная запись изменений пользователей: как часто сбрасывать буфер (в секундах)
+WRITE_BUFFER_FLUSH_INTERVAL_SECONDS = 2
+
+# Сбросить буфер сразу, если в нём накопилось столько ячеек
+WRITE_BUFFER_MAX_CELLS = 200
+
+# Журнал принятых, но ещё не записанных в лист голосов (JSON Lines)
+# У каждого процесса свой файл: data/votes_journal.<процесс>.jsonl
+VOTE_JOURNAL_FILE = 'data/votes_journal.jsonl'
+
+# Записать голоса сразу, если в очереди накопилось столько голосов
+VOTE_FLUSH_MAX_PENDING = 200
+
+# Локальная база для режима STORAGE_BACKEND=sqlite (users и config)
+LOCAL_DB_FILE = 'data/local.db'
+
+# Как часто отправлять локальные изменения в Google Sheets (в секундах)
+REPLICATION_PUSH_INTERVAL_SECONDS = 15
+
+# Как часто подтягивать ручные правки из Google Sheets (в минутах)
+REPLICATION_PULL_INTERVAL_MINUTES = 5
+
+# Квота Google Sheets API на сервисный аккаунт (запросов в минуту)
+SHEETS_QUOTA_PER_MINUTE = 60
+
+# Запас запросов, которые можно сделать подряд без ожидания
+SHEETS_QUOTA_BURST = 15
+
+# Доля запаса, которую фоновые задачи не трогают (оставлена обработчикам)
+SHEETS_QUOTA_INTERACTIVE_RESERVE = 0.3
+
+# Пауза всех вызовов после ответа 429 от Google (в секундах)
+SHEETS_QUOTA_BACKOFF_SECONDS = 10
+
+
+# ============================================================================
+# СОСТОЯНИЯ (FSM)
+# ============================================================================
+
+# Файл SQLite для состояний FSM (переживают перезапуск бота)
+# Хранилище выбирается в run.py переменной окружения FSM_STORAGE: sqlite | memory
+FSM_STORAGE_DB = 'data/fsm.db'
+
+# Сколько последних ключей держать в памяти (LRU поверх SQLite)
+FSM_CACHE_SIZE = 1000
+
+# Через сколько секунд без изменений состояние считается брошенным и удаляется
+FSM_STATE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+
+# ============================================================================
+# НЕСКОЛЬКО ПРОЦЕССОВ БОТА
+# ============================================================================
+
+# Файл SQLite с арендой роли ведущего (общий для всех процессов бота)
+# Проверку оплат, синхронизацию пользователей и проверку подписок выполняет только ведущий
+LEADER_LEASE_DB = 'data/leader.db'
+
+# Срок аренды без продления (в секундах): через столько резервный процесс
+# забирает роль у упавшего ведущего
+LEADER_LEASE_TTL_SECONDS = 10
+
+# Как часто ведущий продлевает аренду, а резервный пытается её забрать (в секундах)
+LEADER_HEARTBEAT_SECONDS = 2
+
+# Как часто ведущий ищет работу завершившихся процессов (прерванные рассылки,
+# журналы голосов) и продолжает её (в секундах)
+ORPHAN_RECOVERY_INTERVAL_SECONDS = 60
+
+# Число процессов бота задаётся в run.py переменной окружения BOT_PROCESSES:
+# при BOT_PROCESSES > 1 кэш FSM отключается (FSM_CACHE_SIZE не используется)
+
+
+# ============================================================================
+# ПОЛУЧЕНИЕ АПДЕЙТОВ (POLLING / WEBHOOK)
+# ============================================================================
+
+# Режим выбирается в run.py: задан WEBHOOK_URL - webhook, иначе polling
+# Остальные переменные окружения: WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT
+
+# Путь, на который Telegram присылает апдейты (добавляется к WEBHOOK_URL)
+WEBHOOK_PATH = '/webhook'
+
+# Адрес и порт встроенного aiohttp-сервера по умолчанию
+WEBHOOK_DEFAULT_HOST = '0.0.0.0'
+WEBHOOK_DEFAULT_PORT = 8080
+
+# Сколько апдейтов обрабатывается одновременно (в обоих режимах),
+# остальные ждут в очереди
+UPDATE_CONCURRENCY_LIMIT = 32
+
+
 # ============================================================================
 # ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
 # ============================================================================
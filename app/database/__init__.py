@@ -15,7 +15,8 @@ from app.database.models import (
     User,
     Subscription,
     Payment,
-    RoomLinks
+    RoomLinks,
+    StartContext
 )
 
 # Users
@@ -25,11 +26,15 @@ from app.database.users import (
     add_user,
     add_user_with_subscription,
     update_user_batch,
+    update_users_batch,
     get_user_privileges,
     add_user_to_diamond_list,
     get_links,
     is_temporarily_vip_user,
     migrate_single_user,
+    load_start_context,
+    prepare_start,
+    sync_vip_status,
     migrate_many_users,
     sync_is_vip_for_all_users,
     save_vote,
@@ -61,6 +66,7 @@ __all__ = [
     'Subscription',
     'Payment',
     'RoomLinks',
+    'StartContext',
 
     # Users functions
     'get_user',
@@ -68,11 +74,15 @@ __all__ = [
     'add_user',
     'add_user_with_subscription',
     'update_user_batch',
+    'update_users_batch',
     'get_user_privileges',
     'add_user_to_diamond_list',
     'get_links',
     'is_temporarily_vip_user',
     'migrate_single_user',
+    'load_start_context',
+    'prepare_start',
+    'sync_vip_status',
     'migrate_many_users',
     'sync_is_vip_for_all_users',
     'save_vote',
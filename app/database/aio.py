@@ -0,0 +1,130 @@
+"""
+Асинхронный фасад над app.database
+Синхронные вызовы gspread выполняются в ограниченном пуле потоков,
+чтобы медленный запрос к Google Sheets не блокировал event loop
+"""
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from app.config import DB_EXECUTOR_MAX_WORKERS
+from app.database import users, payments
+
+
+# ============================================================================
+# ПУЛ ПОТОКОВ
+# ============================================================================
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Возвращает общий пул потоков для работы с БД (создаётся при первом вызове)
+
+    Returns:
+        ThreadPoolExecutor: Пул на DB_EXECUTOR_MAX_WORKERS потоков
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=DB_EXECUTOR_MAX_WORKERS,
+            thread_name_prefix='sheets'
+        )
+    return _executor
+
+
+def shutdown_executor(wait: bool = True):
+    """Остановить пул потоков (вызывается при остановке бота)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait)
+        _executor = None
+
+
+async def run_sync(func: Callable, *args, **kwargs) -> Any:
+    """
+    Выполнить синхронную функцию БД в пуле потоков
+
+    Контекст (contextvars) копируется в поток, поэтому всё,
+    что привязано к текущему обработчику, видно и внутри функции.
+
+    Args:
+        func: Синхронная функция
+        *args, **kwargs: Аргументы функции
+
+    Returns:
+        Результат func
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, func, *args, **kwargs)
+    return await loop.run_in_executor(get_executor(), call)
+
+
+def _to_async(func: Callable) -> Callable:
+    """Обернуть синхронную функцию БД в корутину с тем же именем и сигнатурой"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_sync(func, *args, **kwargs)
+    return wrapper
+
+
+# ============================================================================
+# ПОЛЬЗОВАТЕЛИ
+# ============================================================================
+
+get_user = _to_async(users.get_user)
+get_all_users = _to_async(users.get_all_users)
+add_user = _to_async(users.add_user)
+add_user_with_subscription = _to_async(users.add_user_with_subscription)
+update_user_batch = _to_async(users.update_user_batch)
+update_users_batch = _to_async(users.update_users_batch)
+get_user_privileges = _to_async(users.get_user_privileges)
+add_user_to_diamond_list = _to_async(users.add_user_to_diamond_list)
+get_links = _to_async(users.get_links)
+is_temporarily_vip_user = _to_async(users.is_temporarily_vip_user)
+migrate_single_user = _to_async(users.migrate_single_user)
+load_start_context = _to_async(users.load_start_context)
+prepare_start = _to_async(users.prepare_start)
+sync_vip_status = _to_async(users.sync_vip_status)
+migrate_many_users = _to_async(users.migrate_many_users)
+sync_is_vip_for_all_users = _to_async(users.sync_is_vip_for_all_users)
+save_vote = _to_async(users.save_vote)
+get_vote_stats = _to_async(users.get_vote_stats)
+
+
+# ============================================================================
+# ПЛАТЕЖИ И ПОДПИСКИ
+# ============================================================================
+
+get_subscription_status = _to_async(payments.get_subscription_status)
+sync_user_subscription = _to_async(payments.sync_user_subscription)
+process_all_pending_payments = _to_async(payments.process_all_pending_payments)
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Как использовать:
+
+В обработчиках (вместо прямого импорта из app.database):
+    from app.database.aio import get_user, get_links
+
+    user = await get_user(message.from_user.id)
+    main_link, vip_link, diamond_link = await get_links()
+
+Для произвольной синхронной функции:
+    from app.database.aio import run_sync
+
+    result = await run_sync(users_worksheet.get_all_records)
+
+Размер пула задаётся в app/config.py (DB_EXECUTOR_MAX_WORKERS).
+Пока один пользователь ждёт ответа Google, остальные обработчики
+продолжают работать — event loop не блокируется.
+"""
@@ -0,0 +1,167 @@
+"""
+Кэш листа config
+Ссылки на комнаты (и старые ячейки списков) читаются одним запросом A2:F2
+"""
+
+import time
+import threading
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from app.config import CONFIG_CACHE_TTL_SECONDS
+from app.database.connection import config_worksheet
+from app.database.models import RoomLinks
+from app.utils.api_stats import start_thread
+
+
+# Диапазон строки конфигурации: A-C ссылки, D-F списки
+CONFIG_RANGE = 'A2:F2'
+
+
+def _split_list(raw: str, lower: bool = False) -> List[str]:
+    """Разобрать ячейку со списком через запятую"""
+    items = [item.strip() for item in (raw or '').split(',') if item.strip()]
+    return [item.lower() for item in items] if lower else items
+
+
+@dataclass
+class ConfigSnapshot:
+    """
+    Разобранная строка конфигурации
+
+    Атрибуты:
+        links: Ссылки на комнаты (A2, B2, C2)
+        vip_ids: Старый VIP список user_id (D2) - переносится в лист members
+        diamond_ids: Старый Diamond список user_id (E2) - переносится в лист members
+        temp_vip_usernames: Старый временный VIP список (F2) - переносится в лист members
+    """
+    links: RoomLinks
+    vip_ids: List[str] = field(default_factory=list)
+    diamond_ids: List[str] = field(default_factory=list)
+    temp_vip_usernames: List[str] = field(default_factory=list)
+
+    @staticmethod
+    def from_row(row: List[str]) -> 'ConfigSnapshot':
+        """
+        Создаёт снимок из значений A2:F2
+
+        Args:
+            row: Значения ячеек (хвостовые пустые ячейки API не возвращает)
+        """
+        row = list(row) + [''] * (6 - len(row))
+        return ConfigSnapshot(
+            links=RoomLinks(main=row[0] or '', vip=row[1] or '', diamond=row[2] or ''),
+            vip_ids=_split_list(row[3]),
+            diamond_ids=_split_list(row[4]),
+            temp_vip_usernames=_split_list(row[5], lower=True)
+        )
+
+
+class ConfigCache:
+    """
+    Кэш конфигурации со стратегией stale-while-revalidate
+
+    - Первый вызов get() читает A2:F2 синхронно
+    - Пока кэш свежий (ttl), get() не ходит в API
+    - Устаревший кэш отдаётся сразу, а обновление идёт в фоновом потоке
+    - invalidate() сбрасывает кэш: следующий get() прочитает лист заново
+    """
+
+    def __init__(self, worksheet, ttl: float = CONFIG_CACHE_TTL_SECONDS):
+        self.worksheet = worksheet
+        self.ttl = ttl
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._loaded_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def refresh(self) -> ConfigSnapshot:
+        """Прочитать A2:F2 одним запросом и обновить кэш"""
+        values = self.worksheet.get(CONFIG_RANGE)
+        return self.load_row(values[0] if values else [])
+
+    def load_row(self, row: List[str]) -> ConfigSnapshot:
+        """Обновить кэш из уже прочитанных значений A2:F2"""
+        snapshot = ConfigSnapshot.from_row(row)
+
+        with self._lock:
+            self._snapshot = snapshot
+            self._loaded_at = time.monotonic()
+        return snapshot
+
+    def get(self) -> ConfigSnapshot:
+        """
+        Текущая конфигурация
+
+        Returns:
+            ConfigSnapshot: Свежий или (пока идёт фоновое обновление) слегка устаревший снимок
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            stale = time.monotonic() - self._loaded_at >= self.ttl
+            start_refresh = snapshot is not None and stale and not self._refreshing
+            if start_refresh:
+                self._refreshing = True
+
+        if snapshot is None:
+            return self.refresh()
+
+        if start_refresh:
+            start_thread('refresh:config', self._background_refresh)
+
+        return snapshot
+
+    def peek(self) -> Optional[ConfigSnapshot]:
+        """Последний загруженный снимок (без API, даже устаревший) или None"""
+        with self._lock:
+            return self._snapshot
+
+    @property
+    def is_fresh(self) -> bool:
+        """Кэш загружен и не старше ttl"""
+        with self._lock:
+            return self._snapshot is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    def invalidate(self):
+        """Сбросить кэш после локальной записи в лист config"""
+        with self._lock:
+            self._snapshot = None
+            self._loaded_at = 0.0
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"⚠️ Не удалось обновить кэш config, используем старые значения: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+
+# Глобальный кэш конфигурации
+config_cache = ConfigCache(config_worksheet)
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Как использовать:
+
+Чтение (из памяти):
+    from app.database.config_cache import config_cache
+
+    config = config_cache.get()
+    config.links.vip
+
+Списки VIP/Diamond/временный VIP живут в листе members (app/database/membership.py),
+ячейки D2/E2/F2 читаются только для переноса старых значений.
+
+Запись (read-modify-write по свежим данным):
+    config = config_cache.refresh()           # 1 запрос A2:F2
+    config_worksheet.update('A2', [[...]])
+    config_cache.invalidate()
+
+Раньше /start читал config 5-7 раз через acell(), теперь - не больше одного раза в минуту.
+"""
@@ -4,10 +4,18 @@
 """
 
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
 import gspread
 from dotenv import load_dotenv
 from google.oauth2.service_account import Credentials
 
+from app.utils.api_stats import InstrumentedWorksheet, api_stats
+from app.utils.sheets_quota import QuotaWorksheet, current_lane, sheets_quota
+
 # Загружаем переменные окружения
 load_dotenv()
 
@@ -17,6 +25,14 @@ SPREADSHEET_ID_DB = os.getenv('SPREADSHEET_ID_DB')
 SPREADSHEET_ID_TILDA_DB = os.getenv('SPREADSHEET_ID_TILDA_DB')
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 
+# Где живут users и config: sheets (напрямую в Google Sheets)
+# или sqlite (локальная база + репликация в Google Sheets)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'sheets')
+
+# Откуда берутся листы: google (реальный API) или fake (имитация в памяти
+# для замеров без квоты, см. app/database/fake_sheets.py)
+SHEETS_BACKEND = os.getenv('SHEETS_BACKEND', 'google')
+
 
 # ============================================================================
 # ИНИЦИАЛИЗАЦИЯ КЛИЕНТА
@@ -42,8 +58,43 @@ def init_google_sheets_client():
         raise
 
 
-# Глобальный клиент (инициализируется при импорте модуля)
-client = init_google_sheets_client()
+_client = None
+_client_lock = threading.Lock()
+
+_spreadsheets: Dict[str, gspread.Spreadsheet] = {}
+_spreadsheet_locks: Dict[str, threading.Lock] = {}
+_spreadsheets_lock = threading.Lock()
+
+
+def get_client() -> gspread.Client:
+    """Клиент Google Sheets (авторизуется при первом вызове)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            if SHEETS_BACKEND == 'fake':
+                from app.database.fake_sheets import create_fake_client_from_env
+                _client = create_fake_client_from_env()
+            else:
+                _client = init_google_sheets_client()
+        return _client
+
+
+def open_spreadsheet(key: str) -> gspread.Spreadsheet:
+    """
+    Таблица по ключу (open_by_key выполняется один раз на таблицу)
+
+    users и config лежат в одной таблице и используют один объект.
+    """
+    with _spreadsheets_lock:
+        lock = _spreadsheet_locks.setdefault(key, threading.Lock())
+
+    with lock:
+        if key not in _spreadsheets:
+            client = get_client()
+            sheets_quota.acquire(current_lane())
+            with api_stats.track('spreadsheet', 'open_by_key'):
+                _spreadsheets[key] = client.open_by_key(key)
+        return _spreadsheets[key]
 
 
 # ============================================================================
@@ -58,8 +109,10 @@ def get_users_worksheet():
         gspread.Worksheet: Лист с данными пользователей
     """
     try:
-        sheet = client.open_by_key(SPREADSHEET_ID_DB)
-        worksheet = sheet.worksheet("users")
+        spreadsheet = open_spreadsheet(SPREADSHEET_ID_DB)
+        sheets_quota.acquire(current_lane())
+        with api_stats.track('spreadsheet', 'worksheet'):
+            worksheet = spreadsheet.worksheet("users")
         print(f"📊 Подключен к листу: {worksheet.title} ({worksheet.row_count} строк)")
         return worksheet
     except Exception as e:
@@ -75,8 +128,10 @@ def get_config_worksheet():
         gspread.Worksheet: Лист с конфигурацией бота
     """
     try:
-        sheet = client.open_by_key(SPREADSHEET_ID_DB)
-        worksheet = sheet.worksheet("config")
+        spreadsheet = open_spreadsheet(SPREADSHEET_ID_DB)
+        sheets_quota.acquire(current_lane())
+        with api_stats.track('spreadsheet', 'worksheet'):
+            worksheet = spreadsheet.worksheet("config")
         print(f"⚙️ Подключен к листу: {worksheet.title} ({worksheet.row_count} строк)")
         return worksheet
     except Exception as e:
@@ -84,6 +139,57 @@ def get_config_worksheet():
         raise
 
 
+def get_members_worksheet():
+    """
+    Возвращает лист 'members' из основной БД
+
+    Лист не создаётся здесь: это разовый шаг миграции
+    (create_members_worksheet, см. membership.migrate).
+
+    Returns:
+        gspread.Worksheet: Лист со списками VIP / Diamond / временный VIP
+    """
+    try:
+        spreadsheet = open_spreadsheet(SPREADSHEET_ID_DB)
+        sheets_quota.acquire(current_lane())
+        with api_stats.track('spreadsheet', 'worksheet'):
+            worksheet = spreadsheet.worksheet("members")
+        print(f"👥 Подключен к листу: {worksheet.title} ({worksheet.row_count} строк)")
+        return worksheet
+    except gspread.exceptions.WorksheetNotFound:
+        print("❌ Листа 'members' нет: запустите бота с MIGRATE_MEMBERS=1 или выполните /migrate_members")
+        raise
+    except Exception as e:
+        print(f"❌ Ошибка получения листа 'members': {e}")
+        raise
+
+
+def create_members_worksheet() -> bool:
+    """
+    Создать лист 'members' с заголовками, если его ещё нет (разовый шаг миграции)
+
+    Returns:
+        bool: True если лист создан, False если он уже был
+    """
+    spreadsheet = open_spreadsheet(SPREADSHEET_ID_DB)
+    sheets_quota.acquire(current_lane())
+    with api_stats.track('spreadsheet', 'worksheet'):
+        try:
+            spreadsheet.worksheet("members")
+            return False
+        except gspread.exceptions.WorksheetNotFound:
+            pass
+
+    sheets_quota.acquire(current_lane())
+    with api_stats.track('spreadsheet', 'add_worksheet'):
+        worksheet = spreadsheet.add_worksheet("members", rows=1000, cols=4)
+    sheets_quota.acquire(current_lane())
+    with api_stats.track('members', 'append_row'):
+        worksheet.append_row(['list', 'member', 'added_at', 'removed_at'])
+    print("🆕 Создан лист 'members'")
+    return True
+
+
 def get_tilda_worksheet():
     """
     Возвращает лист 'Лист1' из БД Tilda (платежи)
@@ -92,8 +198,10 @@ def get_tilda_worksheet():
         gspread.Worksheet: Лист с данными о платежах из Tilda
     """
     try:
-        sheet = client.open_by_key(SPREADSHEET_ID_TILDA_DB)
-        worksheet = sheet.worksheet("Лист1")
+        spreadsheet = open_spreadsheet(SPREADSHEET_ID_TILDA_DB)
+        sheets_quota.acquire(current_lane())
+        with api_stats.track('spreadsheet', 'worksheet'):
+            worksheet = spreadsheet.worksheet("Лист1")
         print(f"💳 Подключен к листу: {worksheet.title} ({worksheet.row_count} строк)")
         return worksheet
     except Exception as e:
@@ -101,16 +209,107 @@ def get_tilda_worksheet():
         raise
 
 
+class LazyWorksheet:
+    """
+    Лист, который подключается при первом обращении
+
+    Все атрибуты и методы gspread.Worksheet доступны через прокси.
+    Если подключиться не удалось, ошибка получает только текущий вызов -
+    следующий вызов попробует подключиться снова.
+
+    Атрибуты:
+        name: Название листа (для отчётов)
+    """
+
+    def __init__(self, name: str, opener: Callable[[], gspread.Worksheet]):
+        self.name = name
+        self._opener = opener
+        self._worksheet: Optional[gspread.Worksheet] = None
+        self._lock = threading.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._worksheet is not None
+
+    def resolve(self) -> gspread.Worksheet:
+        """Подключиться к листу (если ещё не подключены) и вернуть его"""
+        if self._worksheet is None:
+            with self._lock:
+                if self._worksheet is None:
+                    self._worksheet = self._opener()
+        return self._worksheet
+
+    def __getattr__(self, attr):
+        return getattr(self.resolve(), attr)
+
+    def __repr__(self) -> str:
+        state = 'подключен' if self.connected else 'не подключен'
+        return f"<LazyWorksheet {self.name} ({state})>"
+
+
+def warmup_worksheets() -> Dict[str, Optional[float]]:
+    """
+    Подключить все листы параллельно и напечатать отчёт о времени
+
+    Ошибки не прерывают запуск: лист останется неподключенным
+    и подключится при первом обращении.
+
+    Returns:
+        dict: {название: время подключения в секундах или None при ошибке}
+    """
+    sheets = [users_remote_worksheet, config_remote_worksheet, members_remote_worksheet, tilda_worksheet]
+    started = time.monotonic()
+
+    def connect(sheet) -> Optional[float]:
+        sheet_started = time.monotonic()
+        try:
+            sheet.resolve()
+            return time.monotonic() - sheet_started
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=len(sheets), thread_name_prefix='sheets-warmup') as pool:
+        timings = dict(zip((sheet.name for sheet in sheets), pool.map(connect, sheets)))
+
+    report = ', '.join(
+        f"{name} {seconds * 1000:.0f} мс" if seconds is not None else f"{name} ❌"
+        for name, seconds in timings.items()
+    )
+    print(f"⏱ Подключение к Google Sheets: {report} (всего {(time.monotonic() - started) * 1000:.0f} мс)")
+    return timings
+
+
 # ============================================================================
-# ИНИЦИАЛИЗАЦИЯ ЛИСТОВ (при импорте модуля)
+# РАБОЧИЕ ЛИСТЫ (подключаются при первом обращении)
 # ============================================================================
 
-# Основные листы (инициализируются сразу)
-users_worksheet = get_users_worksheet()
-config_worksheet = get_config_worksheet()
-tilda_worksheet = get_tilda_worksheet()
+def remote_worksheet(name: str, title: str, opener: Callable):
+    """Лист (или таблица) Google Sheets: ленивое подключение + учёт вызовов + общая квота"""
+    return QuotaWorksheet(InstrumentedWorksheet(LazyWorksheet(title, opener), name))
+
 
-print("✅ Все листы успешно инициализированы\n")
+# Листы Google Sheets (статистика - app/utils/api_stats.py, квота - app/utils/sheets_quota.py)
+users_remote_worksheet = remote_worksheet('users', 'users', get_users_worksheet)
+config_remote_worksheet = remote_worksheet('config', 'config', get_config_worksheet)
+members_remote_worksheet = remote_worksheet('members', 'members', get_members_worksheet)
+tilda_worksheet = remote_worksheet('tilda', 'Лист1', get_tilda_worksheet)
+
+# Основная таблица целиком: несколько диапазонов users/config одним values_batch_get
+main_spreadsheet = remote_worksheet('spreadsheet', 'main', lambda: open_spreadsheet(SPREADSHEET_ID_DB))
+
+if STORAGE_BACKEND == 'sqlite':
+    # users, config и members читаются и пишутся локально, в таблицу их отправляет репликатор
+    from app.database.local_store import local_store
+    users_worksheet = local_store.worksheet('users')
+    config_worksheet = local_store.worksheet('config')
+    members_worksheet = local_store.worksheet('members')
+    # Пакетное чтение не нужно: локальные листы читаются без сети
+    main_spreadsheet = None
+    print("💾 Режим хранения: локальная SQLite + репликация в Google Sheets")
+else:
+    users_worksheet = users_remote_worksheet
+    config_worksheet = config_remote_worksheet
+    members_worksheet = members_remote_worksheet
 
 
 # ============================================================================
@@ -132,8 +331,13 @@ print("✅ Все листы успешно инициализированы\n")
     # Обновление
     users_worksheet.update('A2', [['new_value']])
 
+Импорт модуля не ходит в сеть: клиент авторизуется, а листы открываются
+при первом обращении. При старте бота warmup_worksheets() подключает
+все листы параллельно в фоне, пока бот уже принимает сообщения.
+
 Преимущества:
-    - Подключение выполняется один раз при запуске бота
+    - Бот стартует сразу, даже если Google Sheets недоступен
+    - Таблица users/config открывается один раз (один open_by_key)
     - Не нужно передавать worksheet между функциями
     - Централизованная обработка ошибок подключения
 """
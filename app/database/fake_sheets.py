@@ -0,0 +1,446 @@
+"""
+Имитация Google Sheets в памяти
+Совместима с используемой частью gspread: для нагрузочных замеров
+слоя данных без реального API и его квоты
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import gspread
+from gspread.utils import a1_range_to_grid_range, a1_to_rowcol, numericise_all, rowcol_to_a1
+from requests import Response
+
+
+# Заголовки листов (как в боевой таблице)
+USERS_HEADERS = [
+    'user_id', 'username', 'first_name', 'joined_at', 'last_activity',
+    'is_vip', 'is_diamond', 'is_sub_active', 'sub_start', 'sub_end',
+    'last_updated_info', 'phone_number', 'email', 'Ручное примечание', 'vote_response'
+]
+TILDA_HEADERS = [
+    'Name', 'Email', 'Phone', 'Как_с_вами_связаться_в_Телеграм_username',
+    'payment', 'valid to', 'Дата начала подписки', 'processed'
+]
+CONFIG_HEADERS = ['main_link', 'vip_link', 'diamond_link', 'vip_list', 'diamond_list', 'temp_vip_list']
+MEMBERS_HEADERS = ['list', 'member', 'added_at', 'removed_at']
+
+
+class FakeLimits:
+    """
+    Поведение имитируемого API, общее для всех листов (как квота проекта)
+
+    Атрибуты:
+        latency: Задержка каждого вызова (сек)
+        jitter: Случайная добавка к задержке (0..jitter сек)
+        quota_per_minute: Лимит запросов за скользящую минуту (0 - без лимита)
+        error_rate: Доля вызовов, которые случайно получают 429
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        quota_per_minute: int = 0,
+        error_rate: float = 0.0
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.quota_per_minute = quota_per_minute
+        self.error_rate = error_rate
+        self.calls: Counter = Counter()
+        self.rejected = 0
+        self._window: deque = deque()
+        self._lock = threading.Lock()
+
+    def admit(self, sheet: str, method: str):
+        """Учесть вызов: задержка, квота, случайная 429"""
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+
+        with self._lock:
+            self.calls[(sheet, method)] += 1
+            now = time.monotonic()
+            while self._window and now - self._window[0] > 60:
+                self._window.popleft()
+
+            over_quota = self.quota_per_minute and len(self._window) >= self.quota_per_minute
+            injected = self.error_rate and random.random() < self.error_rate
+            if over_quota or injected:
+                self.rejected += 1
+                raise quota_error(
+                    "Quota exceeded for quota metric 'Read requests'" if over_quota else "Injected 429"
+                )
+            self._window.append(now)
+
+    def stats(self) -> dict:
+        """Сколько вызовов каждого метода было и сколько отклонено"""
+        with self._lock:
+            return {
+                'calls': dict(self.calls),
+                'total': sum(self.calls.values()),
+                'rejected': self.rejected,
+                'last_minute': len(self._window)
+            }
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.rejected = 0
+            self._window.clear()
+
+
+def quota_error(message: str) -> gspread.exceptions.APIError:
+    """APIError с кодом 429, как его возвращает Google"""
+    response = Response()
+    response.status_code = 429
+    response._content = json.dumps({
+        'error': {'code': 429, 'message': message, 'status': 'RESOURCE_EXHAUSTED'}
+    }).encode()
+    return gspread.exceptions.APIError(response)
+
+
+class FakeWorksheet:
+    """
+    Лист в памяти с интерфейсом gspread.Worksheet
+
+    Поддерживаются: get_all_values, get_all_records, get, batch_get, row_values,
+    find, findall, acell, update, batch_update, append_row, append_rows.
+
+    Атрибуты:
+        title: Название листа
+        limits: Общие задержка/квота/ошибки
+    """
+
+    def __init__(self, title: str, rows: List[List], limits: FakeLimits):
+        self.title = title
+        self.limits = limits
+        self._rows: List[List[str]] = [[str(value) for value in row] for row in rows]
+        self._lock = threading.Lock()
+
+    @property
+    def row_count(self) -> int:
+        return max(len(self._rows), 1000)
+
+    @property
+    def col_count(self) -> int:
+        return max((len(row) for row in self._rows), default=26)
+
+    def _call(self, method: str):
+        self.limits.admit(self.title, method)
+
+    # ------------------------------------------------------------------------
+    # Чтение
+    # ------------------------------------------------------------------------
+
+    def get_all_values(self, **kwargs) -> List[List[str]]:
+        self._call('get_all_values')
+        with self._lock:
+            width = self.col_count
+            return [row + [''] * (width - len(row)) for row in self._rows]
+
+    def get_all_records(self, **kwargs) -> List[dict]:
+        self._call('get_all_records')
+        with self._lock:
+            if not self._rows:
+                return []
+            headers = self._rows[0]
+            return [
+                dict(zip(headers, numericise_all(row + [''] * (len(headers) - len(row)))))
+                for row in self._rows[1:]
+            ]
+
+    def get(self, range_name: str, **kwargs) -> List[List[str]]:
+        self._call('get')
+        return self._read_range(range_name)
+
+    def batch_get(self, ranges: List[str], **kwargs) -> List[List[List[str]]]:
+        self._call('batch_get')
+        return [self._read_range(range_name) for range_name in ranges]
+
+    def row_values(self, row: int, **kwargs) -> List[str]:
+        self._call('row_values')
+        with self._lock:
+            values = list(self._rows[row - 1]) if row <= len(self._rows) else []
+        return self._trim(values)
+
+    def acell(self, label: str, **kwargs) -> gspread.Cell:
+        self._call('acell')
+        row, col = a1_to_rowcol(label)
+        with self._lock:
+            value = self._cell(row, col)
+        return gspread.Cell(row, col, value or None)
+
+    def find(self, query, in_row: Optional[int] = None, in_column: Optional[int] = None, **kwargs):
+        self._call('find')
+        found = self._search(str(query), in_row, in_column, first=True)
+        return found[0] if found else None
+
+    def findall(self, query, in_row: Optional[int] = None, in_column: Optional[int] = None, **kwargs):
+        self._call('findall')
+        return self._search(str(query), in_row, in_column, first=False)
+
+    # ------------------------------------------------------------------------
+    # Запись
+    # ------------------------------------------------------------------------
+
+    def update(self, range_name=None, values=None, **kwargs):
+        # Оба порядка аргументов, как в gspread: update('E2', [[...]]) и update([[...]], 'E2')
+        if not isinstance(range_name, str):
+            range_name, values = values, range_name
+        self._call('update')
+        with self._lock:
+            self._write(range_name, values)
+
+    def batch_update(self, data: List[dict], **kwargs):
+        self._call('batch_update')
+        with self._lock:
+            for item in data:
+                self._write(item['range'], item['values'])
+
+    def append_row(self, values: List, **kwargs) -> dict:
+        self._call('append_row')
+        with self._lock:
+            return self._append([values])
+
+    def append_rows(self, values: List[List], **kwargs) -> dict:
+        self._call('append_rows')
+        with self._lock:
+            return self._append(values)
+
+    # ------------------------------------------------------------------------
+
+    def _cell(self, row: int, col: int) -> str:
+        if row <= len(self._rows) and col <= len(self._rows[row - 1]):
+            return self._rows[row - 1][col - 1]
+        return ''
+
+    def _read_range(self, range_name: str) -> List[List[str]]:
+        grid = a1_range_to_grid_range(range_name.split('!')[-1])
+        with self._lock:
+            first_row = grid.get('startRowIndex', 0)
+            last_row = min(grid.get('endRowIndex', len(self._rows)), len(self._rows))
+            first_col = grid.get('startColumnIndex', 0)
+            last_col = grid.get('endColumnIndex')
+            result = [self._trim(self._rows[index][first_col:last_col]) for index in range(first_row, last_row)]
+
+        while result and not result[-1]:
+            result.pop()
+        return result
+
+    def _search(self, query: str, in_row, in_column, first: bool) -> List[gspread.Cell]:
+        found = []
+        with self._lock:
+            for row_number, row in enumerate(self._rows, start=1):
+                if in_row and row_number != in_row:
+                    continue
+                for col_number, value in enumerate(row, start=1):
+                    if in_column and col_number != in_column:
+                        continue
+                    if value == query:
+                        found.append(gspread.Cell(row_number, col_number, value))
+                        if first:
+                            return found
+        return found
+
+    def _write(self, range_name: str, values: List[List]):
+        grid = a1_range_to_grid_range(range_name.split('!')[-1])
+        first_row = grid.get('startRowIndex', 0) + 1
+        first_col = grid.get('startColumnIndex', 0) + 1
+
+        for row_offset, row_values in enumerate(values):
+            row_number = first_row + row_offset
+            while len(self._rows) < row_number:
+                self._rows.append([])
+            row = self._rows[row_number - 1]
+            last_col = first_col + len(row_values) - 1
+            if len(row) < last_col:
+                row.extend([''] * (last_col - len(row)))
+            for col_offset, value in enumerate(row_values):
+                row[first_col - 1 + col_offset] = str(value)
+
+    def _append(self, rows: List[List]) -> dict:
+        first_row = len(self._rows) + 1
+        for values in rows:
+            self._rows.append([str(value) for value in values])
+        last_cell = rowcol_to_a1(len(self._rows), max(len(rows[0]), 1) if rows else 1)
+        return {'updates': {'updatedRange': f"'{self.title}'!A{first_row}:{last_cell}"}}
+
+    @staticmethod
+    def _trim(values: List[str]) -> List[str]:
+        values = list(values)
+        while values and values[-1] == '':
+            values.pop()
+        return values
+
+
+class FakeSpreadsheet:
+    """Таблица в памяти: листы по названию + values_batch_get"""
+
+    def __init__(self, worksheets: Dict[str, FakeWorksheet], limits: FakeLimits):
+        self._worksheets = worksheets
+        self.limits = limits
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self.limits.admit('spreadsheet', 'worksheet')
+        if title not in self._worksheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self._worksheets[title]
+
+    def worksheets(self) -> List[FakeWorksheet]:
+        return list(self._worksheets.values())
+
+    def add_worksheet(self, title: str, rows: int = 1000, cols: int = 26, **kwargs) -> FakeWorksheet:
+        self.limits.admit('spreadsheet', 'add_worksheet')
+        self._worksheets[title] = FakeWorksheet(title, [], self.limits)
+        return self._worksheets[title]
+
+    def values_batch_get(self, ranges: List[str], **kwargs) -> dict:
+        self.limits.admit('spreadsheet', 'values_batch_get')
+        value_ranges = []
+        for range_name in ranges:
+            # Диапазон без '!' - весь лист, как в API
+            title, _, a1 = range_name.partition('!')
+            sheet = self._worksheets[title.strip("'")]
+            value_ranges.append({'range': range_name, 'values': sheet._read_range(a1 or 'A:ZZ')})
+        return {'valueRanges': value_ranges}
+
+
+class FakeClient:
+    """
+    Клиент: open_by_key отдаёт одну таблицу со всеми листами
+    (users, config, members и Лист1 Tilda), ключ не важен
+    """
+
+    def __init__(self, spreadsheet: FakeSpreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def open_by_key(self, key: str) -> FakeSpreadsheet:
+        self.spreadsheet.limits.admit('client', 'open_by_key')
+        return self.spreadsheet
+
+
+# ============================================================================
+# СИНТЕТИЧЕСКИЕ ДАННЫЕ
+# ============================================================================
+
+def generate_users(count: int, seed: int = 1) -> List[List[str]]:
+    """
+    Лист users на count пользователей (с заголовком)
+
+    Подписки разбросаны на ±30 дней от сегодня, чтобы ежедневная
+    проверка находила пользователей во всех группах (включая ещё
+    активные подписки, истёкшие за последние сутки).
+    """
+    rng = random.Random(seed)
+    now = datetime.now()
+    fmt = '%Y-%m-%d %H:%M:%S'
+    rows = [list(USERS_HEADERS)]
+
+    for index in range(count):
+        user_id = 100_000_000 + index
+        has_sub = rng.random() < 0.6
+        sub_end = now + timedelta(days=rng.randint(-30, 30), hours=rng.randint(0, 23))
+        rows.append([
+            str(user_id), f"@user{index}", f"User {index}",
+            now.strftime(fmt), now.strftime(fmt),
+            'False', str(has_sub), str(has_sub and sub_end > now - timedelta(days=1)),
+            (sub_end - timedelta(days=30)).strftime(fmt) if has_sub else '',
+            sub_end.strftime(fmt) if has_sub else '',
+            now.strftime(fmt), '', f"user{index}@example.com" if has_sub else '',
+            '', rng.choice(['', '', '1', '2', '3'])
+        ])
+    return rows
+
+
+def generate_tilda(count: int, unprocessed: int, users: int, seed: int = 2) -> List[List[str]]:
+    """Лист Tilda: count оплат, последние unprocessed - необработанные"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    fmt = '%Y-%m-%d %H:%M:%S'
+    rows = [list(TILDA_HEADERS)]
+
+    for index in range(count):
+        user_index = rng.randrange(max(users, 1))
+        processed = '' if index >= count - unprocessed else 'TRUE'
+        rows.append([
+            f"User {user_index}", f"user{user_index}@example.com", '',
+            f"@user{user_index}", '990',
+            (now + timedelta(days=30)).strftime(fmt), now.strftime(fmt), processed
+        ])
+    return rows
+
+
+def create_fake_client(
+    users: int = 10_000,
+    tilda_rows: int = 1_000,
+    tilda_unprocessed: int = 5,
+    limits: Optional[FakeLimits] = None
+) -> FakeClient:
+    """Клиент с синтетической таблицей заданного размера"""
+    limits = limits or FakeLimits()
+    # Списки уже перенесены в лист members, ячейки config D2/E2/F2 пустые
+    config_row = ['https://t.me/+main', 'https://t.me/+vip', 'https://t.me/+diamond', '', '', '']
+    members_rows = [MEMBERS_HEADERS] + [
+        ['vip', str(100_000_000 + index), '2025-01-01 12:00:00', '']
+        for index in range(0, min(users, 200), 7)
+    ] + [['temp_vip', username, '2025-01-01 12:00:00', ''] for username in ('someone', 'another')]
+    spreadsheet = FakeSpreadsheet({
+        'users': FakeWorksheet('users', generate_users(users), limits),
+        'config': FakeWorksheet('config', [CONFIG_HEADERS, config_row], limits),
+        'members': FakeWorksheet('members', members_rows, limits),
+        'Лист1': FakeWorksheet('Лист1', generate_tilda(tilda_rows, tilda_unprocessed, users), limits),
+    }, limits)
+    print(f"🧪 Имитация Google Sheets: {users} пользователей, {tilda_rows} оплат Tilda")
+    return FakeClient(spreadsheet)
+
+
+def create_fake_client_from_env() -> FakeClient:
+    """Клиент по переменным окружения FAKE_SHEETS_*"""
+    limits = FakeLimits(
+        latency=float(os.getenv('FAKE_SHEETS_LATENCY_MS', '300')) / 1000,
+        jitter=float(os.getenv('FAKE_SHEETS_JITTER_MS', '200')) / 1000,
+        quota_per_minute=int(os.getenv('FAKE_SHEETS_QUOTA_PER_MINUTE', '300')),
+        error_rate=float(os.getenv('FAKE_SHEETS_ERROR_RATE', '0'))
+    )
+    return create_fake_client(
+        users=int(os.getenv('FAKE_SHEETS_USERS', '10000')),
+        tilda_rows=int(os.getenv('FAKE_SHEETS_TILDA_ROWS', '1000')),
+        tilda_unprocessed=int(os.getenv('FAKE_SHEETS_TILDA_UNPROCESSED', '5')),
+        limits=limits
+    )
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Как использовать:
+
+Весь бот на имитации (в .env):
+    SHEETS_BACKEND=fake
+    FAKE_SHEETS_USERS=100000          # размер листа users
+    FAKE_SHEETS_LATENCY_MS=300        # задержка каждого вызова
+    FAKE_SHEETS_JITTER_MS=200         # + случайная добавка
+    FAKE_SHEETS_QUOTA_PER_MINUTE=300  # 429 при превышении (0 - без лимита)
+    FAKE_SHEETS_ERROR_RATE=0.01       # доля случайных 429
+
+В замерах напрямую:
+    from app.database.fake_sheets import FakeLimits, create_fake_client
+
+    limits = FakeLimits(latency=0.3)
+    client = create_fake_client(users=50_000, limits=limits)
+    users = client.open_by_key('any').worksheet('users')
+    ...
+    print(limits.stats())   # {'calls': {('users', 'get_all_values'): 1, ...}, 'rejected': 0, ...}
+
+Данные живут только в памяти процесса и пропадают при перезапуске.
+"""
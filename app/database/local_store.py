@@ -0,0 +1,339 @@
+"""
+Локальное хранилище листов в SQLite
+Повторяет нужную часть API gspread.Worksheet, поэтому users.py и кэши
+работают с ним так же, как с Google Sheets, но без сетевых запросов
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import gspread
+from gspread.utils import a1_range_to_grid_range, numericise_all, rowcol_to_a1
+
+from app.config import LOCAL_DB_FILE
+
+
+class LocalStore:
+    """
+    Файл SQLite с копиями листов
+
+    Строки листа хранятся целиком (JSON-список значений) под своим номером.
+    Каждая локальная запись помечает изменённые ячейки как "грязные" -
+    их потом отправляет в Google Sheets репликатор (app/database/replicator.py).
+
+    Файл могут открыть несколько процессов бота: записи идут транзакциями
+    BEGIN IMMEDIATE (см. transaction), а номера изменений (seq) и новых строк
+    выдаются внутри этих транзакций, поэтому процессы их не делят.
+
+    Атрибуты:
+        path: Путь к файлу базы
+    """
+
+    def __init__(self, path: str = LOCAL_DB_FILE):
+        self.path = path
+        self.lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        with self.lock:
+            if self._conn is None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self._conn = sqlite3.connect(self.path, check_same_thread=False)
+                self._conn.execute('PRAGMA journal_mode=WAL')
+                self._conn.execute('PRAGMA synchronous=NORMAL')
+                self._conn.executescript("""
+                    CREATE TABLE IF NOT EXISTS sheet_rows (
+                        sheet TEXT NOT NULL,
+                        row INTEGER NOT NULL,
+                        data TEXT NOT NULL,
+                        PRIMARY KEY (sheet, row)
+                    ) WITHOUT ROWID;
+                    CREATE TABLE IF NOT EXISTS dirty_cells (
+                        sheet TEXT NOT NULL,
+                        row INTEGER NOT NULL,
+                        col INTEGER NOT NULL,
+                        seq INTEGER NOT NULL,
+                        PRIMARY KEY (sheet, row, col)
+                    ) WITHOUT ROWID;
+                """)
+            return self._conn
+
+    @contextmanager
+    def transaction(self):
+        """
+        Транзакция записи (BEGIN IMMEDIATE)
+
+        Блокировка записи берётся сразу, поэтому чтение внутри транзакции
+        (последняя строка, последний seq) не устареет до записи - другие
+        процессы ждут. Вложенный вызов продолжает внешнюю транзакцию.
+        """
+        with self.lock:
+            conn = self.conn
+            if conn.in_transaction:
+                yield conn
+                return
+
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def worksheet(self, title: str) -> 'LocalWorksheet':
+        return LocalWorksheet(self, title)
+
+    # ------------------------------------------------------------------------
+    # Строки
+    # ------------------------------------------------------------------------
+
+    def rows(self, sheet: str) -> Dict[int, List[str]]:
+        """Все строки листа {номер: значения}"""
+        with self.lock:
+            cursor = self.conn.execute("SELECT row, data FROM sheet_rows WHERE sheet = ?", (sheet,))
+            return {row: json.loads(data) for row, data in cursor}
+
+    def row(self, sheet: str, row: int) -> List[str]:
+        with self.lock:
+            found = self.conn.execute(
+                "SELECT data FROM sheet_rows WHERE sheet = ? AND row = ?", (sheet, row)
+            ).fetchone()
+            return json.loads(found[0]) if found else []
+
+    def max_row(self, sheet: str) -> int:
+        with self.lock:
+            return self.conn.execute(
+                "SELECT MAX(row) FROM sheet_rows WHERE sheet = ?", (sheet,)
+            ).fetchone()[0] or 0
+
+    def write_cells(self, sheet: str, cells: Dict[Tuple[int, int], str], dirty: bool = True):
+        """
+        Записать ячейки {(строка, колонка): значение} одной транзакцией
+
+        Args:
+            dirty: Пометить ячейки для отправки в Google Sheets
+                   (False - значения пришли из самой таблицы)
+        """
+        if not cells:
+            return
+
+        by_row: Dict[int, Dict[int, str]] = {}
+        for (row, col), value in cells.items():
+            by_row.setdefault(row, {})[col] = value
+
+        with self.transaction():
+            for row, row_cells in by_row.items():
+                values = self.row(sheet, row)
+                width = max(row_cells)
+                if len(values) < width:
+                    values.extend([''] * (width - len(values)))
+                for col, value in row_cells.items():
+                    values[col - 1] = str(value)
+                self._put_row(sheet, row, values)
+
+            if dirty:
+                # seq выдаётся внутри транзакции: общий рост для всех процессов,
+                # повторная запись ячейки всегда получает seq больше прежнего
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO dirty_cells (sheet, row, col, seq) "
+                    "VALUES (?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM dirty_cells))",
+                    [(sheet, row, col) for row, col in cells]
+                )
+
+    def delete_rows(self, sheet: str, rows: List[int]):
+        with self.transaction():
+            self.conn.executemany(
+                "DELETE FROM sheet_rows WHERE sheet = ? AND row = ?", [(sheet, row) for row in rows]
+            )
+
+    def _put_row(self, sheet: str, row: int, values: List[str]):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO sheet_rows (sheet, row, data) VALUES (?, ?, ?)",
+            (sheet, row, json.dumps(values, ensure_ascii=False))
+        )
+
+    # ------------------------------------------------------------------------
+    # Грязные ячейки
+    # ------------------------------------------------------------------------
+
+    def dirty_cells(self, sheet: str) -> Dict[Tuple[int, int], int]:
+        """Ячейки, ещё не отправленные в Google Sheets: {(строка, колонка): seq}"""
+        with self.lock:
+            cursor = self.conn.execute("SELECT row, col, seq FROM dirty_cells WHERE sheet = ?", (sheet,))
+            return {(row, col): seq for row, col, seq in cursor}
+
+    def clear_dirty(self, sheet: str, cells: Dict[Tuple[int, int], int]):
+        """
+        Снять пометку с отправленных ячеек
+
+        Ячейка, изменённая повторно во время отправки (seq вырос), остаётся грязной.
+        """
+        with self.transaction():
+            self.conn.executemany(
+                "DELETE FROM dirty_cells WHERE sheet = ? AND row = ? AND col = ? AND seq = ?",
+                [(sheet, row, col, seq) for (row, col), seq in cells.items()]
+            )
+
+    def dirty_count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM dirty_cells").fetchone()[0]
+
+
+class LocalWorksheet:
+    """
+    Лист в LocalStore с интерфейсом gspread.Worksheet
+
+    Поддерживаются методы, которые использует бот: get_all_values, get_all_records,
+    get, row_values, find, append_row, append_rows, update, batch_update.
+
+    Атрибуты:
+        title: Название листа
+    """
+
+    def __init__(self, store: LocalStore, title: str):
+        self.store = store
+        self.title = title
+
+    @property
+    def row_count(self) -> int:
+        return self.store.max_row(self.title)
+
+    # ------------------------------------------------------------------------
+    # Чтение
+    # ------------------------------------------------------------------------
+
+    def get_all_values(self) -> List[List[str]]:
+        rows = self.store.rows(self.title)
+        if not rows:
+            return []
+
+        width = max(len(values) for values in rows.values())
+        return [
+            self._pad(rows.get(row_number, []), width)
+            for row_number in range(1, max(rows) + 1)
+        ]
+
+    def get_all_records(self) -> List[dict]:
+        values = self.get_all_values()
+        if not values:
+            return []
+
+        headers = values[0]
+        return [dict(zip(headers, numericise_all(row))) for row in values[1:]]
+
+    def get(self, range_name: str) -> List[List[str]]:
+        grid = a1_range_to_grid_range(range_name)
+        first_row = grid.get('startRowIndex', 0) + 1
+        last_row = grid.get('endRowIndex', self.row_count)
+        first_col = grid.get('startColumnIndex', 0)
+        last_col = grid.get('endColumnIndex')
+
+        result = []
+        for row_number in range(first_row, last_row + 1):
+            result.append(self._trim(self.store.row(self.title, row_number)[first_col:last_col]))
+
+        # Как и API, не возвращаем хвостовые пустые строки
+        while result and not result[-1]:
+            result.pop()
+        return result
+
+    def row_values(self, row: int) -> List[str]:
+        return self._trim(self.store.row(self.title, row))
+
+    def find(self, query: str, in_row: Optional[int] = None, in_column: Optional[int] = None):
+        for row_number, values in sorted(self.store.rows(self.title).items()):
+            if in_row and row_number != in_row:
+                continue
+            for col_number, value in enumerate(values, start=1):
+                if in_column and col_number != in_column:
+                    continue
+                if value == str(query):
+                    return gspread.Cell(row_number, col_number, value)
+        return None
+
+    # ------------------------------------------------------------------------
+    # Запись
+    # ------------------------------------------------------------------------
+
+    def append_row(self, values: List, **kwargs) -> dict:
+        # Номер строки и запись - одна транзакция: два процесса не займут одну строку
+        with self.store.transaction():
+            row = self.store.max_row(self.title) + 1
+            self.store.write_cells(
+                self.title, {(row, col): value for col, value in enumerate(values, start=1)}
+            )
+
+        last_cell = rowcol_to_a1(row, max(len(values), 1))
+        return {'updates': {'updatedRange': f"{self.title}!A{row}:{last_cell}"}}
+
+    def append_rows(self, values: List[List], **kwargs) -> dict:
+        with self.store.transaction():
+            first_row = self.store.max_row(self.title) + 1
+            self.store.write_cells(self.title, {
+                (first_row + offset, col): value
+                for offset, row_values in enumerate(values)
+                for col, value in enumerate(row_values, start=1)
+            })
+
+        last_cell = rowcol_to_a1(first_row + len(values) - 1, max((len(row) for row in values), default=1))
+        return {'updates': {'updatedRange': f"{self.title}!A{first_row}:{last_cell}"}}
+
+    def update(self, range_name, values=None, **kwargs):
+        # Поддерживаем оба порядка аргументов, как gspread: update('E2', [[...]]) и update([[...]], 'E2')
+        if not isinstance(range_name, str):
+            range_name, values = values, range_name
+        self.batch_update([{'range': range_name, 'values': values}])
+
+    def batch_update(self, data: List[dict], **kwargs):
+        cells: Dict[Tuple[int, int], str] = {}
+        for item in data:
+            grid = a1_range_to_grid_range(item['range'])
+            first_row = grid.get('startRowIndex', 0) + 1
+            first_col = grid.get('startColumnIndex', 0) + 1
+            for row_offset, row_values in enumerate(item['values']):
+                for col_offset, value in enumerate(row_values):
+                    cells[(first_row + row_offset, first_col + col_offset)] = str(value)
+
+        self.store.write_cells(self.title, cells)
+
+    # ------------------------------------------------------------------------
+
+    @staticmethod
+    def _pad(values: List[str], width: int) -> List[str]:
+        return list(values) + [''] * (width - len(values))
+
+    @staticmethod
+    def _trim(values: List[str]) -> List[str]:
+        values = list(values)
+        while values and values[-1] == '':
+            values.pop()
+        return values
+
+
+# Глобальное хранилище (файл открывается при первом обращении)
+local_store = LocalStore()
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Как использовать:
+
+Включается переменной окружения STORAGE_BACKEND=sqlite (по умолчанию sheets).
+Тогда app/database/connection.py отдаёт users_worksheet и config_worksheet
+из LocalStore, и весь код users.py / payments.py работает с локальной базой:
+
+    users_worksheet.batch_update([...])   # запись в SQLite + пометка ячеек
+    users_worksheet.get_all_values()      # чтение из SQLite
+
+Отправка в Google Sheets и подтягивание ручных правок - app/database/replicator.py.
+Лист Tilda всегда читается напрямую из Google Sheets.
+"""
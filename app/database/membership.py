@@ -0,0 +1,364 @@
+"""
+Списки VIP / Diamond / временный VIP
+Лист members: одна строка на участника списка, в памяти - множества для проверки за O(1)
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import gspread
+from gspread.utils import rowcol_to_a1
+
+from app.config import MEMBERSHIP_CACHE_TTL_SECONDS
+from app.database.connection import members_worksheet, config_worksheet, create_members_worksheet
+from app.database.config_cache import config_cache
+from app.database.single_flight import SingleFlight
+from app.database.users_cache import UsersCache
+from app.utils.api_stats import start_thread
+
+
+# Списки
+VIP = 'vip'                 # user_id (раньше config D2)
+DIAMOND = 'diamond'         # user_id (раньше config E2)
+TEMP_VIP = 'temp_vip'       # username без @ в нижнем регистре (раньше config F2)
+
+# Колонки листа members
+MEMBERS_HEADERS = ['list', 'member', 'added_at', 'removed_at']
+_REMOVED_COL = MEMBERS_HEADERS.index('removed_at') + 1
+
+# Ячейки со старыми списками через запятую
+LEGACY_CELLS = {VIP: 'D2', DIAMOND: 'E2', TEMP_VIP: 'F2'}
+
+
+def normalize(list_name: str, member) -> str:
+    """Привести участника к виду, в котором он хранится в списке"""
+    value = str(member or '').strip()
+    if list_name == TEMP_VIP:
+        return value.lstrip('@').lower()
+    return value
+
+
+class MembershipStore:
+    """
+    Списки участников на листе members
+
+    Строка листа: list | member | added_at | removed_at. Удаление не сдвигает
+    строки: заполняется removed_at (повторное добавление очищает его).
+    Ручные правки в листе подхватываются при следующем обновлении (ttl).
+
+    - чтение: множества в памяти, устаревшие данные отдаются сразу,
+      обновление идёт в фоне (как config_cache)
+    - add(): новые участники одним append_rows, вернувшиеся - одним batch_update
+    - remove(): одним batch_update
+    - создание листа и перенос старых ячеек config D2/E2/F2 - отдельный
+      разовый шаг migrate(), в обычном обновлении его нет
+    - пока листа нет (миграция не запускалась), списки читаются из ячеек
+      config D2/E2/F2 с предупреждением (в обычной работе ничего не падает)
+
+    Атрибуты:
+        worksheet: Лист members
+        ttl: Время жизни данных в памяти (сек)
+    """
+
+    def __init__(self, worksheet, ttl: float = MEMBERSHIP_CACHE_TTL_SECONDS):
+        self.worksheet = worksheet
+        self.ttl = ttl
+        self._members: Dict[str, Set[str]] = {}
+        self._active_rows: Dict[Tuple[str, str], List[int]] = {}
+        self._removed_rows: Dict[Tuple[str, str], int] = {}
+        self._has_header = False
+        self._loaded_at: Optional[float] = None
+        self._refreshing = False
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._flight = SingleFlight('membership')
+
+    # ------------------------------------------------------------------------
+    # Загрузка
+    # ------------------------------------------------------------------------
+
+    def refresh(self):
+        """Перечитать лист (один get_all_values)"""
+        self._flight.do('refresh', self._refresh)
+
+    def _refresh(self):
+        try:
+            values = self.worksheet.get_all_values()
+        except gspread.exceptions.WorksheetNotFound:
+            values = []
+        if not values:
+            # Листа нет (или он пуст даже без заголовков) - миграция не запускалась
+            self._load_legacy()
+            return
+        self.load_values(values)
+
+    def _load_legacy(self):
+        """Листа members ещё нет: списки из ячеек config D2/E2/F2"""
+        legacy = self._legacy_lists(config_cache.get())
+        members = {
+            list_name: {normalize(list_name, member) for member in values} - {''}
+            for list_name, values in legacy.items()
+        }
+
+        with self._lock:
+            self._members = members
+            self._active_rows = {}
+            self._removed_rows = {}
+            self._has_header = False
+            self._loaded_at = time.monotonic()
+
+        print("⚠️ Листа members нет, списки взяты из ячеек config D2/E2/F2: "
+              "выполните миграцию (MIGRATE_MEMBERS=1 или /migrate_members)")
+
+    def load_values(self, values: List[List[str]]):
+        """Построить индекс по значениям листа (со строкой заголовков)"""
+        members: Dict[str, Set[str]] = {}
+        active_rows: Dict[Tuple[str, str], List[int]] = {}
+        removed_rows: Dict[Tuple[str, str], int] = {}
+
+        for row_number, row in enumerate(values[1:], start=2):
+            row = list(row) + [''] * (len(MEMBERS_HEADERS) - len(row))
+            list_name = row[0].strip().lower()
+            member = normalize(list_name, row[1])
+            if not list_name or not member:
+                continue
+
+            key = (list_name, member)
+            if row[3].strip():
+                removed_rows.setdefault(key, row_number)
+            else:
+                members.setdefault(list_name, set()).add(member)
+                active_rows.setdefault(key, []).append(row_number)
+
+        with self._lock:
+            self._members = members
+            self._active_rows = active_rows
+            self._removed_rows = removed_rows
+            self._has_header = bool(values)
+            self._loaded_at = time.monotonic()
+
+        print("👥 Списки загружены: " + ', '.join(
+            f"{name} {len(members.get(name, ()))}" for name in (VIP, DIAMOND, TEMP_VIP)
+        ))
+
+    def _ensure_loaded(self):
+        """Загрузить при первом обращении, устаревшие данные обновить в фоне"""
+        with self._lock:
+            loaded = self._loaded_at is not None
+            stale = loaded and time.monotonic() - self._loaded_at >= self.ttl
+            start_refresh = stale and not self._refreshing
+            if start_refresh:
+                self._refreshing = True
+
+        if not loaded:
+            self.refresh()
+        elif start_refresh:
+            start_thread('refresh:membership', self._background_refresh)
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"⚠️ Не удалось обновить списки, используем старые значения: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def invalidate(self):
+        """Перечитать лист при следующем обращении"""
+        with self._lock:
+            self._loaded_at = None
+
+    # ------------------------------------------------------------------------
+    # Чтение
+    # ------------------------------------------------------------------------
+
+    def contains(self, list_name: str, member) -> bool:
+        """Есть ли участник в списке (O(1), без API при загруженном индексе)"""
+        self._ensure_loaded()
+        with self._lock:
+            return normalize(list_name, member) in self._members.get(list_name, ())
+
+    def members(self, list_name: str) -> Set[str]:
+        """Копия множества участников списка"""
+        self._ensure_loaded()
+        with self._lock:
+            return set(self._members.get(list_name, ()))
+
+    # ------------------------------------------------------------------------
+    # Запись
+    # ------------------------------------------------------------------------
+
+    def add(self, list_name: str, members: Iterable) -> int:
+        """
+        Добавить участников в список
+
+        Returns:
+            int: Сколько участников добавлено (уже состоящие не считаются)
+        """
+        self._ensure_loaded()
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        with self._write_lock:
+            with self._lock:
+                current = self._members.get(list_name, set())
+                fresh = sorted({normalize(list_name, member) for member in members} - current - {''})
+                revived = {member: self._removed_rows[(list_name, member)]
+                           for member in fresh if (list_name, member) in self._removed_rows}
+                appended = [member for member in fresh if member not in revived]
+                header_missing = not self._has_header
+
+            if not fresh:
+                return 0
+
+            if revived:
+                self.worksheet.batch_update([
+                    {'range': rowcol_to_a1(row_number, _REMOVED_COL), 'values': [['']]}
+                    for row_number in revived.values()
+                ])
+
+            first_row = None
+            if appended:
+                rows = [[list_name, member, now, ''] for member in appended]
+                if header_missing:
+                    rows.insert(0, MEMBERS_HEADERS)
+                response = self.worksheet.append_rows(rows)
+                first_row = UsersCache.row_number_from_append(response)
+                if first_row and header_missing:
+                    first_row += 1
+
+            with self._lock:
+                self._members.setdefault(list_name, set()).update(fresh)
+                for member, row_number in revived.items():
+                    del self._removed_rows[(list_name, member)]
+                    self._active_rows[(list_name, member)] = [row_number]
+                for offset, member in enumerate(appended):
+                    if first_row:
+                        self._active_rows[(list_name, member)] = [first_row + offset]
+                if appended:
+                    self._has_header = True
+                if appended and not first_row:
+                    # Номер строки неизвестен - перечитаем лист при следующем обращении
+                    self._loaded_at = None
+
+        return len(fresh)
+
+    def remove(self, list_name: str, members: Iterable) -> int:
+        """
+        Убрать участников из списка (пометка removed_at, строки не удаляются)
+
+        Returns:
+            int: Сколько участников убрано
+        """
+        self._ensure_loaded()
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        with self._write_lock:
+            with self._lock:
+                current = self._members.get(list_name, set())
+                gone = {normalize(list_name, member) for member in members} & current
+                rows = {member: list(self._active_rows.get((list_name, member), [])) for member in gone}
+
+            updates = [
+                {'range': rowcol_to_a1(row_number, _REMOVED_COL), 'values': [[now]]}
+                for member_rows in rows.values() for row_number in member_rows
+            ]
+            if updates:
+                self.worksheet.batch_update(updates)
+
+            with self._lock:
+                for member, member_rows in rows.items():
+                    self._members[list_name].discard(member)
+                    self._active_rows.pop((list_name, member), None)
+                    if member_rows:
+                        self._removed_rows[(list_name, member)] = member_rows[0]
+
+        return len(gone)
+
+    # ------------------------------------------------------------------------
+    # Разовая миграция: лист members + перенос из config D2/E2/F2
+    # ------------------------------------------------------------------------
+
+    def migrate(self) -> Dict[str, int]:
+        """
+        Создать лист members (если его нет) и перенести в него списки
+        из ячеек config D2/E2/F2, очистив ячейки
+
+        Запускается явно: MIGRATE_MEMBERS=1 при старте (run.py) или /migrate_members.
+        Повторный запуск безопасен: уже перенесённые участники не дублируются.
+
+        Returns:
+            dict: {список: сколько участников добавлено}
+        """
+        print("🚚 МИГРАЦИЯ СПИСКОВ: лист members и ячейки config D2/E2/F2")
+        if create_members_worksheet():
+            print("🚚 Лист members создан")
+        self.refresh()
+
+        # Свежие значения ячеек (их могли поправить вручную)
+        legacy = self._legacy_lists(config_cache.refresh())
+        added = {list_name: self.add(list_name, members) for list_name, members in legacy.items() if members}
+        if added:
+            config_worksheet.batch_update([
+                {'range': LEGACY_CELLS[list_name], 'values': [['']]} for list_name in added
+            ])
+            config_cache.invalidate()
+
+        if added:
+            print(f"🚚 МИГРАЦИЯ СПИСКОВ ЗАВЕРШЕНА: перенесено {added}, ячейки config очищены")
+        else:
+            print("🚚 МИГРАЦИЯ СПИСКОВ ЗАВЕРШЕНА: в config переносить нечего")
+        return added
+
+    def legacy_pending(self) -> bool:
+        """Остались ли списки в ячейках config D2/E2/F2 (из кэша config, без API)"""
+        return any(self._legacy_lists(config_cache.get()).values())
+
+    @staticmethod
+    def _legacy_lists(config) -> Dict[str, List[str]]:
+        return {
+            VIP: config.vip_ids,
+            DIAMOND: config.diamond_ids,
+            TEMP_VIP: config.temp_vip_usernames,
+        }
+
+
+# Глобальные списки (лист читается при первом обращении)
+membership = MembershipStore(members_worksheet)
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Как использовать:
+
+    from app.database.membership import membership, VIP, DIAMOND, TEMP_VIP
+
+    membership.contains(VIP, user_id)             # O(1), без API
+    membership.contains(TEMP_VIP, '@SomeUser')    # username нормализуется
+    membership.add(DIAMOND, [user_id])            # один append_rows
+    membership.remove(TEMP_VIP, usernames)        # один batch_update
+
+Лист members (создаётся разовой миграцией, см. ниже):
+    list     | member   | added_at            | removed_at
+    vip      | 12345678 | 2025-01-01 12:00:00 |
+    temp_vip | someuser | 2025-01-01 12:00:00 | 2025-01-02 09:00:00
+
+Добавить участника вручную - новой строкой в листе (removed_at пустой),
+убрать - заполнить removed_at. Изменения видны боту через MEMBERSHIP_CACHE_TTL_SECONDS.
+
+Ячейки config D2/E2/F2 больше не используются (пока листа members нет,
+списки читаются из них). Создание листа и перенос
+ячеек - разовый шаг, который запускается явно:
+    MIGRATE_MEMBERS=1 python run.py   # при старте (в ведущем процессе)
+    /migrate_members                  # командой админа
+Пока в ячейках что-то есть, при старте печатается предупреждение.
+"""
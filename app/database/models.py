@@ -190,6 +190,25 @@ class RoomLinks:
     diamond: str
 
 
+@dataclass
+class StartContext:
+    """
+    Всё, что нужно главному меню (/start и "Назад")
+
+    Атрибуты:
+        user: Данные пользователя или None (новый пользователь)
+        is_vip: Есть в VIP списке (config D2)
+        is_diamond: is_diamond == 'True' в профиле
+        links: Ссылки на комнаты
+        loaded: False - чтение не удалось (user=None не значит "новый пользователь")
+    """
+    user: Optional[dict]
+    is_vip: bool
+    is_diamond: bool
+    links: RoomLinks
+    loaded: bool = True
+
+
 # ============================================================================
 # ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
 # ============================================================================
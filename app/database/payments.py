@@ -8,13 +8,17 @@ from typing import Tuple, List, Optional
 from collections import defaultdict
 
 from app.database.connection import tilda_worksheet
+from app.database.models import Payment
+from app.database.single_flight import users_flight
+from app.database.tilda_feed import tilda_feed
 from app.database.users import (
     get_user,
     update_user_batch,
     add_user_with_subscription,
-    add_user_to_diamond_list,
-    users_worksheet
+    add_user_to_diamond_list
 )
+from app.database.users_cache import users_cache
+from app.database.write_buffer import write_buffer
 from app.utils.formatters import clean_telegram_username, format_date_for_user
 
 
@@ -130,6 +134,8 @@ def sync_user_subscription(user_id: int, user_username: str) -> Tuple[bool, str,
     """
     Синхронизировать подписку пользователя с Tilda вручную
 
+    Повторное нажатие, пока проверка ещё идёт, получает её результат.
+
     Args:
         user_id: Telegram ID
         user_username: Username пользователя
@@ -137,6 +143,10 @@ def sync_user_subscription(user_id: int, user_username: str) -> Tuple[bool, str,
     Returns:
         tuple: (success, message, end_date_str)
     """
+    return users_flight.do(('sync_subscription', user_id), _sync_user_subscription, user_id, user_username)
+
+
+def _sync_user_subscription(user_id: int, user_username: str) -> Tuple[bool, str, Optional[str]]:
     try:
         cleaned_username = clean_telegram_username(user_username)
         if not cleaned_username:
@@ -144,39 +154,31 @@ def sync_user_subscription(user_id: int, user_username: str) -> Tuple[bool, str,
 
         print(f"🔍 Синхронизация для {cleaned_username} (ID: {user_id})")
 
-        # Получаем необработанные записи
-        all_tilda_records = tilda_worksheet.get_all_records()
-        unprocessed_records = [
-            record for record in all_tilda_records
-            if not record.get('processed', '')
-        ]
+        # Получаем необработанные платежи (только новые строки листа)
+        unprocessed_payments = tilda_feed.fetch_unprocessed()
 
-        if not unprocessed_records:
+        if not unprocessed_payments:
             return False, "Новых оплат не найдено.", None
 
-        # Ищем записи пользователя
-        user_records = []
-        for record in unprocessed_records:
-            record_username = clean_telegram_username(
-                record.get('Как_с_вами_связаться_в_Телеграм_username', '')
-            )
-
-            if record_username == cleaned_username:
-                user_records.append(record)
+        # Ищем платежи пользователя
+        user_payments = [
+            payment for payment in unprocessed_payments
+            if clean_telegram_username(payment.username) == cleaned_username
+        ]
 
-        if not user_records:
+        if not user_payments:
             return False, "Оплаты для вашего username не найдены.", None
 
-        print(f"📋 Найдено {len(user_records)} записей для {cleaned_username}")
+        print(f"📋 Найдено {len(user_payments)} записей для {cleaned_username}")
 
         # Извлекаем данные
-        email = user_records[0].get('Email', '')
-        phone = user_records[0].get('Phone', '')
+        email = user_payments[0].email or ''
+        phone = user_payments[0].phone or ''
 
         # Находим максимальную дату окончания
         max_end_date = None
-        for record in user_records:
-            end_date_str = record.get('valid to', '')
+        for payment in user_payments:
+            end_date_str = payment.valid_to or ''
             try:
                 end_date = datetime.strptime(end_date_str, '%Y-%m-%d %H:%M:%S')
                 if max_end_date is None or end_date > max_end_date:
@@ -188,7 +190,7 @@ def sync_user_subscription(user_id: int, user_username: str) -> Tuple[bool, str,
         if not max_end_date:
             return False, "Не удалось определить дату окончания подписки.", None
 
-        tilda_start_date = user_records[0].get('Дата начала подписки', '')
+        tilda_start_date = user_payments[0].start_date
         if not tilda_start_date:
             tilda_start_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
@@ -241,8 +243,9 @@ def sync_user_subscription(user_id: int, user_username: str) -> Tuple[bool, str,
 
             message = f"🎉 Добро пожаловать! Ваша подписка активна до {max_end_date.strftime('%d.%m.%Y')}"
 
-        # Помечаем записи как обработанные
-        _mark_records_as_processed(user_records)
+        # Помечаем записи как обработанные (только после записи подписки в лист)
+        if write_buffer.flush():
+            _mark_records_as_processed(user_payments)
 
         print(f"✅ Синхронизация для {cleaned_username} завершена")
         return True, message, tilda_max_end_date_str
@@ -265,35 +268,33 @@ def process_all_pending_payments() -> List[int]:
         list: Список user_id для отправки уведомлений
     """
     try:
-        all_tilda_records = tilda_worksheet.get_all_records()
-        unprocessed_records = [
-            record for record in all_tilda_records
-            if not record.get('processed', '')
-        ]
+        unprocessed_payments = tilda_feed.fetch_unprocessed()
 
-        if not unprocessed_records:
+        if not unprocessed_payments:
             print("ℹ️ Нет необработанных оплат")
             return []
 
-        print(f"📋 Найдено {len(unprocessed_records)} необработанных оплат")
+        print(f"📋 Найдено {len(unprocessed_payments)} необработанных оплат")
 
         notified_users = []
+        processed_payments = []
 
         # Группируем по username
-        records_by_username = defaultdict(list)
-        for record in unprocessed_records:
-            username = clean_telegram_username(
-                record.get('Как_с_вами_связаться_в_Телеграм_username', '')
-            )
+        payments_by_username = defaultdict(list)
+        for payment in unprocessed_payments:
+            username = clean_telegram_username(payment.username)
             if username:
-                records_by_username[username].append(record)
+                payments_by_username[username].append(payment)
+
+        # Сопоставляем username → пользователь по индексу (лист users читается не больше раза)
+        users_by_username = _find_users_by_usernames(payments_by_username.keys())
 
         # Обрабатываем каждого пользователя
-        for username, user_records in records_by_username.items():
+        for username, user_payments in payments_by_username.items():
             print(f"🔍 Обработка для {username}")
 
             # Ищем user_id по username
-            user = _find_user_by_username(username)
+            user = users_by_username.get(username)
             if not user:
                 print(f"⚠️ Пользователь {username} не найден в БД")
                 continue
@@ -304,14 +305,21 @@ def process_all_pending_payments() -> List[int]:
                 continue
 
             # Обрабатываем платёж
-            success = _process_user_payment(user, user_records)
+            success = _process_user_payment(user, user_payments)
             if success:
                 add_user_to_diamond_list(user_id)
                 notified_users.append(user_id)
                 print(f"✅ Обработан {username} (ID: {user_id})")
 
-            # Помечаем записи как обработанные
-            _mark_records_as_processed(user_records)
+            processed_payments.extend(user_payments)
+
+        # Подписки всех пользователей - одним batch_update, затем пометка оплат
+        # одним batch_update. Если запись не удалась, оплаты останутся
+        # необработанными и будут повторены (и уведомлены) в следующей проверке.
+        if processed_payments:
+            if not write_buffer.flush():
+                return []
+            _mark_records_as_processed(processed_payments)
 
         print(f"✅ Обработано {len(notified_users)} платежей")
         return notified_users
@@ -326,29 +334,59 @@ def process_all_pending_payments() -> List[int]:
 # ============================================================================
 
 def _find_user_by_username(username: str) -> Optional[dict]:
-    """Найти пользователя по username"""
+    """Найти пользователя по username (по индексу снимка users)"""
     try:
-        all_users = users_worksheet.get_all_records()
-        for u in all_users:
-            user_username = clean_telegram_username(u.get('username', ''))
-            if user_username == username:
-                return u
-        return None
+        return users_cache.find_by_username(username)
     except Exception as e:
         print(f"❌ Ошибка поиска пользователя {username}: {e}")
         return None
 
 
-def _process_user_payment(user: dict, user_records: list) -> bool:
+def _find_users_by_usernames(usernames) -> dict:
+    """
+    Найти пользователей для набора username за один проход
+
+    Если кого-то нет в снимке и снимок не перечитывался в этом цикле,
+    перечитываем лист users один раз (пользователь мог добавиться вручную).
+
+    Returns:
+        dict: {username: данные пользователя} только для найденных
+    """
+    usernames = list(usernames)
+    loaded_before = users_cache.loaded_at
+    found = {}
+
+    for username in usernames:
+        user = _find_user_by_username(username)
+        if user:
+            found[username] = user
+
+    missing = [username for username in usernames if username not in found]
+    if missing and users_cache.loaded_at == loaded_before:
+        try:
+            users_cache.reload()
+        except Exception as e:
+            print(f"❌ Ошибка перечитывания users: {e}")
+            return found
+
+        for username in missing:
+            user = _find_user_by_username(username)
+            if user:
+                found[username] = user
+
+    return found
+
+
+def _process_user_payment(user: dict, user_payments: List[Payment]) -> bool:
     """Обработать платёж пользователя"""
     try:
-        email = user_records[0].get('Email', '')
-        phone = user_records[0].get('Phone', '')
+        email = user_payments[0].email or ''
+        phone = user_payments[0].phone or ''
 
         # Находим максимальную дату
         max_end_date = None
-        for record in user_records:
-            end_date_str = record.get('valid to', '')
+        for payment in user_payments:
+            end_date_str = payment.valid_to or ''
             try:
                 end_date = datetime.strptime(end_date_str, '%Y-%m-%d %H:%M:%S')
                 if max_end_date is None or end_date > max_end_date:
@@ -360,7 +398,7 @@ def _process_user_payment(user: dict, user_records: list) -> bool:
             print(f"⚠️ Не удалось определить дату окончания")
             return False
 
-        tilda_start_date = user_records[0].get('Дата начала подписки', '')
+        tilda_start_date = user_payments[0].start_date
         if not tilda_start_date:
             tilda_start_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
@@ -393,41 +431,36 @@ def _process_user_payment(user: dict, user_records: list) -> bool:
         return False
 
 
-def _mark_records_as_processed(user_records: list):
-    """Пометить записи в Tilda как обработанные"""
-    try:
-        processed_updates = []
-
-        for record in user_records:
-            try:
-                username_to_find = record['Как_с_вами_связаться_в_Телеграм_username']
-                expected_email = record.get('Email', '')
-                expected_valid_to = record.get('valid to', '')
-
-                cells = tilda_worksheet.findall(username_to_find)
-
-                for cell in cells:
-                    row_data = tilda_worksheet.row_values(cell.row)
-
-                    actual_email = row_data[1] if len(row_data) > 1 else ''
-                    actual_valid_to = row_data[17] if len(row_data) > 17 else ''
+def _mark_records_as_processed(user_payments: List[Payment]):
+    """
+    Пометить записи в Tilda как обработанные
 
-                    if (expected_email and actual_email == expected_email and
-                            expected_valid_to and actual_valid_to == expected_valid_to):
+    Номера строк уже известны из курсора Tilda, поэтому поиска нет:
+    одно чтение batch_get (строки не сдвинулись?) и одна запись
+    batch_update по колонке processed для всех совпавших строк.
+    Несовпавшие строки не помечаются: после полной сверки курсора
+    эти оплаты найдутся на новых местах.
+    """
+    try:
+        for payment in user_payments:
+            if not payment.row_number:
+                print(f"⚠️ Нет номера строки для оплаты {payment.username}")
 
-                        processed_updates.append({
-                            'range': f"T{cell.row}",
-                            'values': [['TRUE']]
-                        })
-                        print(f"✅ Помечена строка {cell.row}")
-                        break
+        processed_column = tilda_feed.processed_column()
+        processed_updates = []
+        row_numbers = []
 
-            except Exception as e:
-                print(f"❌ Ошибка при пометке записи: {e}")
-                continue
+        for payment in tilda_feed.verify(user_payments):
+            processed_updates.append({
+                'range': f"{processed_column}{payment.row_number}",
+                'values': [['TRUE']]
+            })
+            row_numbers.append(payment.row_number)
 
         if processed_updates:
             tilda_worksheet.batch_update(processed_updates)
+            tilda_feed.forget(row_numbers)
+            print(f"✅ Помечены строки {row_numbers}")
 
     except Exception as e:
         print(f"❌ Ошибка пометки записей: {e}")
@@ -0,0 +1,298 @@
+"""
+Репликация локальной базы в Google Sheets
+Локальные изменения пачками отправляются в таблицу, ручные правки из таблицы
+подтягиваются обратно по расписанию
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from gspread.utils import rowcol_to_a1
+
+from app.database.local_store import LocalStore
+from app.database.users_cache import UsersCache
+
+
+class SheetMirror:
+    """
+    Связь одного локального листа с листом Google Sheets
+
+    Строки сопоставляются по ключу: для users - по user_id (колонка A),
+    для members - по содержимому (list + member, колонки A и B),
+    для config - по номеру строки (key_columns=None). Номера строк
+    в таблице запоминаются при каждом pull().
+
+    Строка, ключа которой нет в таблице, отправляется только через
+    append_rows - в строку по угаданному номеру запись не идёт
+    (кроме config, где строки фиксированы). Для листов, которые правят
+    вручную (fresh_rows=True), номера строк перечитываются перед каждой
+    отправкой: вставленная вручную строка не сдвинет запись в чужую строку.
+
+    Правило конфликтов: ячейка, изменённая локально и ещё не отправленная,
+    побеждает; все остальные ячейки берутся из таблицы (ручные правки,
+    например колонка "Ручное примечание" или списки в config).
+
+    Атрибуты:
+        store: Локальное хранилище
+        title: Название листа в LocalStore
+        remote: Лист gspread
+        key_columns: Колонки-ключ (1 = A) или None - ключ по номеру строки
+        fresh_rows: Сверяться с таблицей перед каждой отправкой (+1 get_all_values)
+    """
+
+    def __init__(
+        self,
+        store: LocalStore,
+        title: str,
+        remote,
+        key_columns: Optional[Tuple[int, ...]] = (1,),
+        fresh_rows: bool = False
+    ):
+        self.store = store
+        self.title = title
+        self.remote = remote
+        self.key_columns = key_columns
+        self.fresh_rows = fresh_rows
+        self._remote_rows: Dict[str, int] = {}
+        self._pulled = False
+
+    def _key(self, row_number: int, values: List[str]) -> str:
+        if self.key_columns is None:
+            return str(row_number)
+        parts = [
+            str(values[col - 1]).strip() if col <= len(values) else ''
+            for col in self.key_columns
+        ]
+        if not all(parts):
+            return ''
+        return '\x1f'.join(parts)
+
+    # ------------------------------------------------------------------------
+    # Локальное → Google Sheets
+    # ------------------------------------------------------------------------
+
+    def push(self) -> int:
+        """
+        Отправить грязные ячейки: правки одним batch_update, новые строки одним append_rows
+
+        Returns:
+            int: Сколько ячеек отправлено
+        """
+        dirty = self.store.dirty_cells(self.title)
+        if not dirty:
+            return 0
+        if not self._pulled or self.fresh_rows:
+            self.pull()
+            dirty = self.store.dirty_cells(self.title)
+
+        rows = self.store.rows(self.title)
+        updates = []
+        new_rows: List[Tuple[str, List[str]]] = []
+        dirty_by_row: Dict[int, List[int]] = {}
+        for row_number, col in dirty:
+            dirty_by_row.setdefault(row_number, []).append(col)
+
+        for row_number, cols in sorted(dirty_by_row.items()):
+            values = rows.get(row_number, [])
+            key = self._key(row_number, values)
+            remote_row = self._remote_rows.get(key) if self.key_columns else row_number
+
+            if remote_row is None:
+                if key:
+                    new_rows.append((key, values))
+                continue
+
+            for col in sorted(cols):
+                value = values[col - 1] if col <= len(values) else ''
+                updates.append({'range': rowcol_to_a1(remote_row, col), 'values': [[value]]})
+
+        if updates:
+            self.remote.batch_update(updates)
+
+        if new_rows:
+            response = self.remote.append_rows([values for _, values in new_rows])
+            first_row = UsersCache.row_number_from_append(response)
+            if first_row:
+                for offset, (key, _) in enumerate(new_rows):
+                    self._remote_rows[key] = first_row + offset
+            else:
+                # Номера новых строк неизвестны - перед следующей отправкой сверимся с таблицей
+                self._pulled = False
+
+        self.store.clear_dirty(self.title, dirty)
+        sent = len(updates) + sum(len(values) for _, values in new_rows)
+        print(f"📤 Репликация {self.title}: {len(updates)} ячеек, {len(new_rows)} новых строк")
+        return sent
+
+    # ------------------------------------------------------------------------
+    # Google Sheets → локальное
+    # ------------------------------------------------------------------------
+
+    def pull(self) -> int:
+        """
+        Подтянуть таблицу: ручные правки, строки, добавленные или удалённые вручную
+
+        Returns:
+            int: Сколько ячеек/строк изменилось локально
+        """
+        remote_values = self.remote.get_all_values()
+
+        with self.store.transaction():
+            local_rows = self.store.rows(self.title)
+            dirty = self.store.dirty_cells(self.title)
+            dirty_rows = {row_number for row_number, _ in dirty}
+
+            local_by_key = {}
+            for row_number, values in sorted(local_rows.items()):
+                key = self._key(row_number, values)
+                if key and key not in local_by_key:
+                    local_by_key[key] = row_number
+
+            remote_rows: Dict[str, int] = {}
+            cells: Dict[Tuple[int, int], str] = {}
+            next_row = max(local_rows, default=0) + 1
+
+            for remote_row, values in enumerate(remote_values, start=1):
+                key = self._key(remote_row, values)
+                if not key or key in remote_rows:
+                    continue
+                remote_rows[key] = remote_row
+
+                local_row = local_by_key.get(key)
+                if local_row is None:
+                    local_row = remote_row if self.key_columns is None else next_row
+                    next_row = max(next_row, local_row) + 1
+                    local_values = []
+                else:
+                    local_values = local_rows[local_row]
+
+                width = max(len(values), len(local_values))
+                for col in range(1, width + 1):
+                    if (local_row, col) in dirty:
+                        continue
+                    remote_value = values[col - 1] if col <= len(values) else ''
+                    local_value = local_values[col - 1] if col <= len(local_values) else ''
+                    if remote_value != local_value:
+                        cells[(local_row, col)] = remote_value
+
+            # Строки, удалённые из таблицы вручную (и без неотправленных правок)
+            removed = [
+                row_number for key, row_number in local_by_key.items()
+                if key not in remote_rows and row_number not in dirty_rows
+            ]
+
+            self.store.write_cells(self.title, cells, dirty=False)
+            self.store.delete_rows(self.title, removed)
+            self._remote_rows = remote_rows
+            self._pulled = True
+
+        changed = len(cells) + len(removed)
+        if changed:
+            print(f"📥 Репликация {self.title}: из таблицы получено {len(cells)} ячеек, удалено строк {len(removed)}")
+        return changed
+
+
+class Replicator:
+    """
+    Репликатор всех локальных листов
+
+    Методы синхронные (gspread) - вызывайте через run_sync из event loop.
+    """
+
+    def __init__(self, mirrors: List[SheetMirror]):
+        self.mirrors = mirrors
+        self._lock = threading.Lock()
+
+    def bootstrap(self):
+        """Первичная загрузка: если локальный лист пуст, скопировать его из таблицы"""
+        with self._lock:
+            for mirror in self.mirrors:
+                if mirror.store.max_row(mirror.title) == 0:
+                    print(f"📦 Первичная загрузка листа {mirror.title} в локальную базу")
+                self._safe(mirror.pull, mirror)
+        self._invalidate_caches()
+
+    def push(self) -> int:
+        """Отправить все локальные изменения"""
+        with self._lock:
+            return sum(self._safe(mirror.push, mirror) for mirror in self.mirrors)
+
+    def pull(self) -> int:
+        """Отправить локальные изменения, затем подтянуть ручные правки"""
+        with self._lock:
+            changed = 0
+            for mirror in self.mirrors:
+                self._safe(mirror.push, mirror)
+                changed += self._safe(mirror.pull, mirror)
+
+        if changed:
+            self._invalidate_caches()
+        return changed
+
+    @staticmethod
+    def _safe(func, mirror: SheetMirror) -> int:
+        try:
+            return func()
+        except Exception as e:
+            # Изменения остаются грязными и уйдут при следующей попытке
+            print(f"⚠️ Ошибка репликации листа {mirror.title}: {e}")
+            return 0
+
+    @staticmethod
+    def _invalidate_caches():
+        from app.database.config_cache import config_cache
+        from app.database.membership import membership
+        from app.database.users_cache import users_cache
+        users_cache.invalidate()
+        config_cache.invalidate()
+        membership.invalidate()
+
+
+def create_replicator() -> Optional[Replicator]:
+    """Репликатор для режима STORAGE_BACKEND=sqlite (None в режиме sheets)"""
+    from app.database import connection
+
+    if connection.STORAGE_BACKEND != 'sqlite':
+        return None
+
+    return Replicator([
+        SheetMirror(connection.local_store, 'users', connection.users_remote_worksheet, key_columns=(1,)),
+        SheetMirror(connection.local_store, 'config', connection.config_remote_worksheet, key_columns=None),
+        # Лист members правят вручную: строки - по содержимому (list + member),
+        # новые строки - только через append_rows, номера строк - свежие на каждую отправку
+        SheetMirror(
+            connection.local_store, 'members', connection.members_remote_worksheet,
+            key_columns=(1, 2), fresh_rows=True
+        ),
+    ])
+
+
+# Глобальный репликатор (None, если бот работает напрямую с Google Sheets)
+replicator = create_replicator()
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Как использовать:
+
+    from app.database.replicator import replicator
+
+    if replicator:
+        await run_sync(replicator.bootstrap)   # при старте
+        await run_sync(replicator.push)        # каждые REPLICATION_PUSH_INTERVAL_SECONDS
+        await run_sync(replicator.pull)        # каждые REPLICATION_PULL_INTERVAL_MINUTES
+
+Стоимость: одна отправка = один batch_update (+ append_rows для новых
+пользователей) на лист, одна сверка = один get_all_values на лист.
+
+Строки users сопоставляются по user_id, номера строк в таблице обновляются
+при каждой сверке. Если таблицу отсортировали вручную, до следующей сверки
+отправка может попасть не в ту строку - сортируйте между сверками с паузой
+в REPLICATION_PULL_INTERVAL_MINUTES или перезапускайте бота.
+
+Строки members сопоставляются по list + member, и перед каждой отправкой
+лист перечитывается, поэтому ручные вставки и удаления строк там безопасны.
+"""
@@ -0,0 +1,107 @@
+"""
+Объединение одинаковых одновременных запросов (single-flight)
+Пока запрос по ключу выполняется, повторные вызовы с тем же ключом
+ждут его и получают тот же результат вместо своего похода в API
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Call:
+    """Выполняющийся запрос: результат или исключение + событие завершения"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """
+    Группа single-flight (потокобезопасная)
+
+    Вызовы gspread выполняются в потоках executor (app/database/aio.py),
+    поэтому ожидание блокирующее. Результат не кэшируется: после завершения
+    запроса следующий вызов выполнит его заново.
+
+    Результат общий для всех ожидавших - не изменяйте его на месте.
+
+    Атрибуты:
+        name: Название группы (для отчётов)
+        executed: Сколько запросов выполнено
+        shared: Сколько вызовов получили чужой результат
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.executed = 0
+        self.shared = 0
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable, *args, **kwargs):
+        """
+        Выполнить func(*args, **kwargs) или дождаться уже идущего вызова с тем же ключом
+
+        Исключение выполнившего вызова получают и все ожидавшие.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'executed': self.executed, 'shared': self.shared, 'in_flight': len(self._calls)}
+
+
+# Общая группа для функций app/database/users.py и payments.py
+# (снимок users и лента Tilda держат свои группы)
+users_flight = SingleFlight('users')
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Как использовать:
+
+    from app.database.single_flight import users_flight
+
+    # Два одновременных вызова -> один get_all_records()
+    records = users_flight.do('get_all_records', users_worksheet.get_all_records)
+
+    # Ключ - всё, что делает запросы одинаковыми
+    users_flight.do(('lookup', user_id), lookup, user_id)
+
+Подключено:
+    - users_cache.reload / поиск пользователя вне снимка (по user_id)
+    - get_all_records() листа users (рассылки, миграции, статистика голосования)
+    - чтение новых оплат Tilda и ручная проверка оплаты (по user_id)
+
+Это не кэш: свежесть данных не меняется, убираются только дубли
+одновременных запросов (двойные нажатия, задача + обработчик).
+"""
@@ -0,0 +1,257 @@
+"""
+Инкрементальное чтение платежей из Tilda
+Каждая проверка читает только новые строки листа, а не всю историю оплат
+"""
+
+import json
+import os
+import threading
+from typing import Dict, List
+
+import gspread
+
+from app.config import TILDA_STATE_FILE, TILDA_FULL_RECONCILE_EVERY
+from app.database.connection import tilda_worksheet
+from app.database.models import Payment
+from app.database.single_flight import SingleFlight
+from app.utils.leader_lease import leader_lease
+
+
+class TildaFeed:
+    """
+    Курсор по листу Tilda
+
+    Хранит номер последней прочитанной строки и необработанные записи
+    (processed пустой) вместе с номерами их строк. Состояние сохраняется
+    в JSON-файл, поэтому после перезапуска чтение продолжается с того же места.
+
+    Файл общий для всех процессов бота, поэтому пишет его только ведущий.
+    Резервный процесс (кнопка "проверить оплату") ведёт свой курсор в памяти,
+    а став ведущим, сначала перечитывает файл и продолжает с его места.
+
+    - Обычная проверка: один запрос get() на диапазон после last_row
+    - Раз в full_every проверок (и при отсутствии состояния): полная сверка
+      через get_all_values(), которая подхватывает ручные правки в листе
+
+    Атрибуты:
+        worksheet: Лист Tilda
+        state_file: Путь к файлу состояния
+        full_every: Период полной сверки (в проверках)
+    """
+
+    def __init__(
+        self,
+        worksheet,
+        state_file: str = TILDA_STATE_FILE,
+        full_every: int = TILDA_FULL_RECONCILE_EVERY
+    ):
+        self.worksheet = worksheet
+        self.state_file = state_file
+        self.full_every = full_every
+        self.headers: List[str] = []
+        self.last_row = 0
+        self._pending: Dict[int, List[str]] = {}
+        self._polls_since_full = 0
+        self._loaded = False
+        self._owns_state = False
+        self._lock = threading.Lock()
+        self._flight = SingleFlight('tilda')
+
+    # ------------------------------------------------------------------------
+    # Чтение
+    # ------------------------------------------------------------------------
+
+    def fetch_unprocessed(self) -> List[Payment]:
+        """
+        Необработанные платежи Tilda
+
+        Одновременные вызовы (задача проверки оплат + кнопка "проверить оплату")
+        получают результат одного чтения.
+
+        Returns:
+            list: Платежи с заполненным row_number (номер строки в листе)
+        """
+        return self._flight.do('fetch', self._fetch)
+
+    def _fetch(self) -> List[Payment]:
+        with self._lock:
+            leader = leader_lease.is_leader
+            if not self._loaded or (leader and not self._owns_state):
+                self._load_state()
+            self._owns_state = leader
+
+            if not self.headers or self._polls_since_full >= self.full_every:
+                self._full_reconcile()
+            else:
+                self._read_tail()
+                self._polls_since_full += 1
+
+            self._save_state()
+            return [
+                Payment.from_dict(self._to_record(values), row_number)
+                for row_number, values in sorted(self._pending.items())
+            ]
+
+    def forget(self, row_numbers):
+        """Убрать строки из необработанных (после пометки processed в листе)"""
+        with self._lock:
+            for row_number in row_numbers:
+                self._pending.pop(row_number, None)
+            self._save_state()
+
+    def verify(self, payments: List[Payment]) -> List[Payment]:
+        """
+        Сверить строки листа с платежами курсора перед пометкой processed
+
+        Строки могли сдвинуться (ручная вставка, удаление, сортировка) - тогда
+        номер строки из курсора указывает на чужую оплату. Все строки читаются
+        одним batch_get; при расхождении курсор сбрасывается и следующая
+        проверка делает полную сверку.
+
+        Returns:
+            list: Платежи, строки которых совпали (их можно помечать)
+        """
+        payments = [payment for payment in payments if payment.row_number]
+        if not payments or not self.headers:
+            return []
+
+        last_col = gspread.utils.rowcol_to_a1(1, len(self.headers)).rstrip('0123456789')
+        ranges = [f'A{payment.row_number}:{last_col}{payment.row_number}' for payment in payments]
+        results = self.worksheet.batch_get(ranges)
+
+        confirmed = []
+        moved = []
+        for payment, rows in zip(payments, results):
+            current = Payment.from_dict(self._to_record(rows[0] if rows else []), payment.row_number)
+            if self._same_payment(payment, current):
+                confirmed.append(payment)
+            else:
+                moved.append(payment.row_number)
+
+        if moved:
+            print(f"⚠️ Строки Tilda {moved} не совпадают с курсором, будет полная сверка")
+            self.invalidate()
+        return confirmed
+
+    def invalidate(self):
+        """Сбросить курсор: следующая проверка перечитает весь лист"""
+        with self._lock:
+            self.headers = []
+            self._pending = {}
+            self._save_state()
+
+    @staticmethod
+    def _same_payment(expected: Payment, current: Payment) -> bool:
+        fields = ('username', 'email', 'valid_to', 'start_date')
+        return all(
+            str(getattr(expected, name) or '').strip() == str(getattr(current, name) or '').strip()
+            for name in fields
+        )
+
+    def processed_column(self) -> str:
+        """Буква колонки processed (по заголовкам листа, по умолчанию T)"""
+        if 'processed' in self.headers:
+            col_index = self.headers.index('processed') + 1
+            return gspread.utils.rowcol_to_a1(1, col_index).rstrip('0123456789')
+        return 'T'
+
+    def _full_reconcile(self):
+        """Полная сверка: перечитать весь лист"""
+        values = self.worksheet.get_all_values()
+
+        self.headers = list(values[0]) if values else []
+        self._pending = {}
+        for row_number, row in enumerate(values[1:], start=2):
+            self._remember(row_number, row)
+
+        self.last_row = max(len(values), 1)
+        self._polls_since_full = 0
+        print(f"🔄 Полная сверка Tilda: {self.last_row - 1} строк, необработанных {len(self._pending)}")
+
+    def _read_tail(self):
+        """Прочитать только строки, появившиеся после last_row"""
+        last_col = gspread.utils.rowcol_to_a1(1, len(self.headers)).rstrip('0123456789')
+        tail = self.worksheet.get(f'A{self.last_row + 1}:{last_col}')
+
+        for offset, row in enumerate(tail):
+            self._remember(self.last_row + 1 + offset, row)
+
+        if tail:
+            print(f"📥 Tilda: прочитано новых строк {len(tail)}")
+            self.last_row += len(tail)
+
+    def _remember(self, row_number: int, row: List):
+        """Запомнить строку, если она не пустая и ещё не обработана"""
+        if not any(str(value).strip() for value in row):
+            return
+
+        record = self._to_record(row)
+        if not record.get('processed', ''):
+            self._pending[row_number] = [str(value) for value in row]
+
+    def _to_record(self, row: List) -> dict:
+        row = list(row) + [''] * (len(self.headers) - len(row))
+        return dict(zip(self.headers, row))
+
+    # ------------------------------------------------------------------------
+    # Состояние на диске
+    # ------------------------------------------------------------------------
+
+    def _load_state(self):
+        self._loaded = True
+        if not os.path.exists(self.state_file):
+            return
+
+        try:
+            with open(self.state_file, encoding='utf-8') as f:
+                state = json.load(f)
+            self.headers = state.get('headers', [])
+            self.last_row = int(state.get('last_row', 0))
+            self._pending = {int(row): values for row, values in state.get('pending', {}).items()}
+            print(f"📂 Курсор Tilda восстановлен: строка {self.last_row}, необработанных {len(self._pending)}")
+        except (ValueError, OSError) as e:
+            print(f"⚠️ Не удалось прочитать {self.state_file}, будет полная сверка: {e}")
+            self.headers = []
+
+    def _save_state(self):
+        if not (self._owns_state and leader_lease.is_leader):
+            return
+        state = {
+            'headers': self.headers,
+            'last_row': self.last_row,
+            'pending': {str(row): values for row, values in self._pending.items()}
+        }
+        tmp_file = f"{self.state_file}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_file, self.state_file)
+        except OSError as e:
+            print(f"⚠️ Не удалось сохранить курсор Tilda: {e}")
+
+
+# Глобальный курсор Tilda
+tilda_feed = TildaFeed(tilda_worksheet)
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Как использовать:
+
+    from app.database.tilda_feed import tilda_feed
+
+    payments = tilda_feed.fetch_unprocessed()   # [Payment(row_number=...), ...]
+    ...
+    # перед пометкой processed: строки ещё на месте? (один batch_get)
+    payments = tilda_feed.verify(payments)
+    # после пометки processed в листе
+    tilda_feed.forget([p.row_number for p in payments])
+
+Стоимость проверки теперь зависит от числа новых оплат, а не от всей истории:
+обычная проверка - один get() по хвосту листа, полная сверка -
+раз в TILDA_FULL_RECONCILE_EVERY проверок.
+"""
@@ -3,12 +3,21 @@
 Все операции CRUD для таблицы users
 """
 
-import gspread
+import hashlib
+import json
 from datetime import datetime
 from typing import Optional, Tuple, List, Dict
 
-from app.database.connection import users_worksheet, config_worksheet
-from app.database.models import User, RoomLinks
+from gspread.utils import rowcol_to_a1
+
+from app.database.connection import users_worksheet, members_worksheet, main_spreadsheet
+from app.database.models import User, RoomLinks, StartContext
+from app.database.users_cache import users_cache
+from app.database.config_cache import config_cache, ConfigSnapshot, CONFIG_RANGE
+from app.database.single_flight import users_flight
+from app.database.membership import membership, normalize, VIP, DIAMOND, TEMP_VIP
+from app.database.write_buffer import write_buffer
+from app.database.votes import vote_aggregator
 
 
 # ============================================================================
@@ -19,6 +28,9 @@ def get_user(user_id: int) -> Optional[dict]:
     """
     Получить данные пользователя по user_id
 
+    Читает из снимка users в памяти (users_cache), в Sheets идёт
+    только если снимок устарел или пользователя в нём нет.
+
     Args:
         user_id: Telegram ID пользователя
 
@@ -26,12 +38,7 @@ def get_user(user_id: int) -> Optional[dict]:
         dict: Словарь с данными пользователя или None
     """
     try:
-        cell = users_worksheet.find(str(user_id))
-        if cell:
-            row = users_worksheet.row_values(cell.row)
-            headers = users_worksheet.row_values(1)
-            return dict(zip(headers, row))
-        return None
+        return users_cache.get(user_id)
     except Exception as e:
         print(f"❌ Ошибка получения пользователя {user_id}: {e}")
         return None
@@ -47,7 +54,7 @@ def get_all_users() -> List[dict]:
     print("📥 Загрузка пользователей из БД...")
 
     try:
-        all_data = users_worksheet.get_all_records()
+        all_data = _all_records()
 
         users = []
         for row in all_data:
@@ -71,11 +78,16 @@ def get_all_users() -> List[dict]:
         return []
 
 
+def _all_records() -> List[dict]:
+    """Весь лист users (одновременные вызовы делят один get_all_records)"""
+    return users_flight.do('get_all_records', users_worksheet.get_all_records)
+
+
 # ============================================================================
 # СОЗДАНИЕ И ОБНОВЛЕНИЕ ПОЛЬЗОВАТЕЛЕЙ
 # ============================================================================
 
-def add_user(user_id: int, username: str, first_name: str) -> bool:
+def add_user(user_id: int, username: str, first_name: str, checked: bool = False) -> bool:
     """
     Добавить нового пользователя в БД
 
@@ -83,6 +95,8 @@ def add_user(user_id: int, username: str, first_name: str) -> bool:
         user_id: Telegram ID
         username: Username в Telegram
         first_name: Имя пользователя
+        checked: Отсутствие пользователя уже проверено по свежим данным листа
+                 (повторная проверка не нужна)
 
     Returns:
         bool: True если успешно, False если ошибка (или уже существует)
@@ -94,9 +108,9 @@ def add_user(user_id: int, username: str, first_name: str) -> bool:
     """
     try:
         # Защита от дублей: проверяем существование прямо перед добавлением
-        existing = users_worksheet.find(str(user_id))
-        if existing:
-            print(f"ℹ️ Пользователь {user_id} уже существует (строка {existing.row})")
+        existing_row = None if checked else users_cache.get_row_number(user_id)
+        if existing_row:
+            print(f"ℹ️ Пользователь {user_id} уже существует (строка {existing_row})")
             return False
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         # Все 14 колонок в правильном порядке
@@ -116,7 +130,8 @@ def add_user(user_id: int, username: str, first_name: str) -> bool:
             '',              # M: email
             ''               # N: Ручное примечание
         ]
-        users_worksheet.append_row(new_row)
+        response = users_worksheet.append_row(new_row)
+        users_cache.put_row(new_row, users_cache.row_number_from_append(response))
         print(f"✅ Пользователь {user_id} добавлен в БД")
         return True
     except Exception as e:
@@ -135,13 +150,14 @@ def add_user_with_subscription(user_data: dict) -> bool:
         bool: True если успешно
     """
     try:
-        headers = users_worksheet.row_values(1)
+        users_cache.ensure_loaded()
         new_row = []
-        for header in headers:
+        for header in users_cache.headers:
             value = user_data.get(header, '')
             new_row.append(str(value))
 
-        users_worksheet.append_row(new_row)
+        response = users_worksheet.append_row(new_row)
+        users_cache.put_row(new_row, users_cache.row_number_from_append(response))
         print(f"✅ Пользователь {user_data.get('username', '')} добавлен с подпиской")
         return True
     except Exception as e:
@@ -153,12 +169,15 @@ def update_user_batch(user_id: int, update_dict: dict) -> bool:
     """
     Пакетное обновление полей пользователя
 
+    Изменения попадают в буфер отложенной записи (write_buffer) и сразу
+    видны через get_user(); в лист users они уходят общим batch_update.
+
     Args:
         user_id: ID пользователя
         update_dict: Словарь {название_поля: новое_значение}
 
     Returns:
-        bool: True если успешно
+        bool: True если пользователь найден и изменения приняты
 
     Example:
         update_user_batch(123, {
@@ -167,29 +186,14 @@ def update_user_batch(user_id: int, update_dict: dict) -> bool:
         })
     """
     try:
-        cell = users_worksheet.find(str(user_id))
-        if not cell:
+        if not users_cache.get_row_number(user_id):
             print(f"❌ Пользователь {user_id} не найден")
             return False
 
-        headers = users_worksheet.row_values(1)
-        update_data = []
-
-        for field_name, new_value in update_dict.items():
-            if field_name in headers:
-                col_index = headers.index(field_name) + 1
-                cell_range = gspread.utils.rowcol_to_a1(cell.row, col_index)
-
-                update_data.append({
-                    'range': cell_range,
-                    'values': [[str(new_value)]]
-                })
-            else:
-                print(f"⚠️ Столбец '{field_name}' не найден")
-
-        if update_data:
-            users_worksheet.batch_update(update_data)
-            print(f"✅ Пакетное обновление для {user_id}: {list(update_dict.keys())}")
+        known_fields = _known_fields(update_dict)
+        if known_fields:
+            write_buffer.put(user_id, known_fields)
+            print(f"✅ Пакетное обновление для {user_id}: {list(known_fields.keys())}")
             return True
         else:
             print("⚠️ Нет данных для обновления")
@@ -200,6 +204,59 @@ def update_user_batch(user_id: int, update_dict: dict) -> bool:
         return False
 
 
+def update_users_batch(updates: Dict[int, dict]) -> List[int]:
+    """
+    Обновить поля сразу у многих пользователей
+
+    Все изменения складываются в буфер отложенной записи и уходят
+    в лист users одним batch_update при следующем сбросе.
+
+    Args:
+        updates: Словарь {user_id: {название_поля: новое_значение}}
+
+    Returns:
+        list: user_id, которые были обновлены
+
+    Example:
+        update_users_batch({
+            123: {'is_sub_active': 'False'},
+            456: {'is_sub_active': 'False', 'is_diamond': 'False'}
+        })
+    """
+    try:
+        updated_ids = []
+
+        for user_id, update_dict in updates.items():
+            if not users_cache.get_row_number(user_id):
+                print(f"❌ Пользователь {user_id} не найден")
+                continue
+
+            known_fields = _known_fields(update_dict)
+            if known_fields:
+                write_buffer.put(user_id, known_fields)
+                updated_ids.append(user_id)
+
+        if updated_ids:
+            print(f"✅ Пакетное обновление {len(updated_ids)} пользователей поставлено в буфер")
+        return updated_ids
+
+    except Exception as e:
+        print(f"❌ Ошибка пакетного обновления пользователей: {e}")
+        return []
+
+
+def _known_fields(update_dict: dict) -> dict:
+    """Оставить только поля, для которых есть колонка в листе users"""
+    headers = users_cache.headers
+    known_fields = {}
+    for field_name, new_value in update_dict.items():
+        if field_name in headers:
+            known_fields[field_name] = new_value
+        else:
+            print(f"⚠️ Столбец '{field_name}' не найден")
+    return known_fields
+
+
 # ============================================================================
 # ПРИВИЛЕГИИ ПОЛЬЗОВАТЕЛЕЙ
 # ============================================================================
@@ -215,15 +272,8 @@ def get_user_privileges(user_id: int) -> Tuple[bool, bool]:
         tuple: (is_vip, is_diamond)
     """
     try:
-        user_id_str = str(user_id)
-
-        # Проверяем VIP список в config
-        vip_list = [
-            id.strip()
-            for id in (config_worksheet.acell('D2').value or "").split(',')
-            if id.strip()
-        ]
-        is_vip = user_id_str in vip_list
+        # Проверяем VIP список (индекс в памяти)
+        is_vip = membership.contains(VIP, user_id)
 
         # Проверяем Diamond в профиле пользователя
         user = get_user(user_id)
@@ -242,7 +292,7 @@ def get_user_privileges(user_id: int) -> Tuple[bool, bool]:
 
 def add_user_to_diamond_list(user_id: int) -> bool:
     """
-    Добавить пользователя в Diamond список (config E2)
+    Добавить пользователя в Diamond список (лист members)
 
     Args:
         user_id: Telegram ID
@@ -251,23 +301,11 @@ def add_user_to_diamond_list(user_id: int) -> bool:
         bool: True если успешно
     """
     try:
-        user_id_str = str(user_id)
-
-        diamond_list_str = config_worksheet.acell('E2').value or ""
-        diamond_list = [
-            id.strip()
-            for id in diamond_list_str.split(',')
-            if id.strip()
-        ]
-
-        if user_id_str not in diamond_list:
-            diamond_list.append(user_id_str)
-            config_worksheet.update('E2', [[','.join(diamond_list)]])
+        if membership.add(DIAMOND, [user_id]):
             print(f"✅ Пользователь {user_id} добавлен в Diamond список")
-            return True
         else:
             print(f"ℹ️ Пользователь {user_id} уже в Diamond списке")
-            return True
+        return True
 
     except Exception as e:
         print(f"❌ Ошибка добавления в Diamond список {user_id}: {e}")
@@ -286,15 +324,114 @@ def get_links() -> Tuple[str, str, str]:
         tuple: (main_link, vip_link, diamond_link)
     """
     try:
-        main_link = config_worksheet.acell('A2').value or ""
-        vip_link = config_worksheet.acell('B2').value or ""
-        diamond_link = config_worksheet.acell('C2').value or ""
-        return main_link, vip_link, diamond_link
+        links = config_cache.get().links
+        return links.main, links.vip, links.diamond
     except Exception as e:
         print(f"❌ Ошибка получения ссылок: {e}")
         return "", "", ""
 
 
+# ============================================================================
+# ГЛАВНОЕ МЕНЮ (/start и "Назад")
+# ============================================================================
+
+def load_start_context(user_id: int) -> StartContext:
+    """
+    Данные для главного меню: пользователь, привилегии и ссылки
+
+    - снимок users свежий и пользователь в нём: 0 API-вызовов
+      (config и списки members из памяти, устаревшие обновляются в фоне)
+    - иначе один values_batch_get: config A2:F2 + лист users целиком
+      (снимок устарел) или только колонка user_id (пользователя нет в снимке)
+
+    Args:
+        user_id: Telegram ID
+
+    Returns:
+        StartContext: user=None, если пользователя нет в БД;
+                      loaded=False, если прочитать не удалось (квота, сеть)
+    """
+    try:
+        user = users_cache.peek(user_id) if users_cache.is_fresh else None
+        if user is None:
+            user = users_flight.do(('start_context', user_id), _batch_load_start, str(user_id))
+        return _build_start_context(user_id, user, config_cache.get())
+
+    except Exception as e:
+        print(f"❌ Ошибка загрузки главного меню {user_id}: {e}")
+        # Ссылки - из последнего загруженного config, если он есть
+        config = config_cache.peek()
+        return StartContext(
+            user=None,
+            is_vip=False,
+            is_diamond=False,
+            links=config.links if config else RoomLinks('', '', ''),
+            loaded=False
+        )
+
+
+def prepare_start(user_id: int, username: str, first_name: str) -> StartContext:
+    """
+    Всё для /start: контекст меню, миграция временного VIP и регистрация нового пользователя
+
+    Args:
+        user_id: Telegram ID
+        username: Username в Telegram
+        first_name: Имя пользователя
+
+    Returns:
+        StartContext: Контекст с уже учтённой миграцией
+    """
+    context = load_start_context(user_id)
+
+    if is_temporarily_vip_user(username) and migrate_single_user(username, user_id):
+        print(f"✅ VIP пользователь {username} мигрирован.")
+        context.is_vip = True
+
+    if context.user is None:
+        if context.loaded:
+            # Лист только что прочитан и пользователя в нём нет: повторная проверка не нужна
+            add_user(user_id, username, first_name, checked=True)
+        else:
+            # Чтение не удалось - отсутствие не доказано, add_user проверит дубль сам
+            add_user(user_id, username, first_name)
+
+    return context
+
+
+def _batch_load_start(key: str) -> Optional[dict]:
+    """Прочитать config и users одним values_batch_get, обновить кэши, вернуть пользователя"""
+    if main_spreadsheet is None:
+        # Локальное хранилище (STORAGE_BACKEND=sqlite): чтения без сети
+        return users_cache.get(key)
+
+    snapshot_fresh = users_cache.is_fresh
+    response = main_spreadsheet.values_batch_get([
+        f"config!{CONFIG_RANGE}",
+        'users!A:A' if snapshot_fresh else 'users',
+    ])
+    config_values, users_values = [item.get('values', []) for item in response['valueRanges']]
+    config_cache.load_row(config_values[0] if config_values else [])
+
+    if not snapshot_fresh:
+        users_cache.load_values(users_values)
+        return users_cache.peek(key)
+
+    # Снимок свежий, но пользователя в нём нет: проверяем колонку user_id
+    if any(row and str(row[0]).strip() == key for row in users_values[1:]):
+        return users_cache.get(key)   # добавлен в таблицу вручную
+    return None
+
+
+def _build_start_context(user_id: int, user: Optional[dict], config: ConfigSnapshot) -> StartContext:
+    return StartContext(
+        user=user,
+        is_vip=membership.contains(VIP, user_id),
+        is_diamond=bool(user) and user.get('is_diamond', 'False') == 'True',
+        links=config.links,
+    )
+
+
 # ============================================================================
 # МИГРАЦИЯ VIP ПОЛЬЗОВАТЕЛЕЙ (username → user_id)
 # ============================================================================
@@ -310,15 +447,7 @@ def is_temporarily_vip_user(username: str) -> bool:
         bool: True если в списке
     """
     try:
-        temp_vip_str = config_worksheet.acell('F2').value or ""
-        temp_vip_list = [
-            name.strip().lower()
-            for name in temp_vip_str.split(',')
-            if name.strip()
-        ]
-
-        user_username = (username or "").lower().lstrip('@')
-        return user_username in temp_vip_list
+        return membership.contains(TEMP_VIP, username)
 
     except Exception as e:
         print(f"❌ Ошибка проверки временного VIP {username}: {e}")
@@ -337,36 +466,53 @@ def migrate_single_user(username: str, user_id: int) -> bool:
         bool: True если успешно перенесён
     """
     try:
-        # Получаем списки
-        vip_list_str = config_worksheet.acell('D2').value or ""
-        vip_list = [id.strip() for id in vip_list_str.split(',') if id.strip()]
+        if not membership.contains(TEMP_VIP, username):
+            return False
 
-        temp_vip_str = config_worksheet.acell('F2').value or ""
-        temp_vip = [name.strip().lower() for name in temp_vip_str.split(',') if name.strip()]
+        # Добавляем в основной список, затем убираем из временного
+        membership.add(VIP, [user_id])
+        membership.remove(TEMP_VIP, [username])
 
-        user_username = username.lower().lstrip('@')
+        print(f"✅ Пользователь {username} ({user_id}) мигрирован в VIP")
+        return True
 
-        if user_username in temp_vip:
-            user_id_str = str(user_id)
+    except Exception as e:
+        print(f"❌ Ошибка миграции {username}: {e}")
+        return False
+
+
+def sync_vip_status(force: bool = False) -> bool:
+    """
+    Миграция временных VIP и синхронизация is_vip по одному чтению
 
-            # Добавляем в основной список
-            if user_id_str not in vip_list:
-                vip_list.append(user_id_str)
+    Читает одним values_batch_get только нужные колонки users (user_id,
+    username ... is_vip) и лист members. Если отпечаток этих данных
+    не изменился с прошлого запуска, больше ничего не делается.
 
-            # Удаляем из временного
-            temp_vip.remove(user_username)
+    Args:
+        force: Пересчитать, даже если данные не менялись
 
-            # Обновляем в Sheets
-            config_worksheet.update('D2', [[','.join(vip_list)]])
-            config_worksheet.update('F2', [[','.join(temp_vip)]])
+    Returns:
+        bool: True если успешно
+    """
+    global _last_vip_fingerprint
 
-            print(f"✅ Пользователь {username} ({user_id}) мигрирован в VIP")
+    try:
+        snapshot = _read_vip_snapshot()
+        if not force and snapshot.fingerprint == _last_vip_fingerprint:
+            print("ℹ️ Списки VIP и пользователи не менялись")
             return True
 
-        return False
+        membership.load_values(snapshot.members_values)
+        changed = _migrate_temp_vip(snapshot) > 0
+        changed = _sync_is_vip(snapshot) > 0 or changed
+
+        # После своих записей данные изменились - следующий запуск перепроверит их
+        _last_vip_fingerprint = None if changed else snapshot.fingerprint
+        return True
 
     except Exception as e:
-        print(f"❌ Ошибка миграции {username}: {e}")
+        print(f"❌ Ошибка синхронизации VIP: {e}")
         return False
 
 
@@ -378,47 +524,7 @@ def migrate_many_users() -> bool:
         bool: True если успешно
     """
     try:
-        all_users = users_worksheet.get_all_records()
-
-        vip_list_str = config_worksheet.acell('D2').value or ""
-        vip_list = [id.strip() for id in vip_list_str.split(',') if id.strip()]
-
-        temp_vip_str = config_worksheet.acell('F2').value or ""
-        temp_vip = [name.strip().lower() for name in temp_vip_str.split(',') if name.strip()]
-
-        migrated_count = 0
-        updated_vip = vip_list.copy()
-        updated_temp = temp_vip.copy()
-
-        for user in all_users:
-            user_id = user.get('user_id')
-            if not user_id:
-                continue
-
-            username = (user.get('username', '') or '').lstrip('@').lower()
-
-            if username in updated_temp:
-                user_id_str = str(user_id)
-
-                if user_id_str not in updated_vip:
-                    updated_vip.append(user_id_str)
-                    migrated_count += 1
-
-                updated_temp.remove(username)
-
-        if migrated_count > 0:
-            config_worksheet.update('D2', [[','.join(updated_vip)]])
-            config_worksheet.update('F2', [[','.join(updated_temp)]])
-
-        if migrated_count == 1:
-            print(f'✅ Мигрирован {migrated_count} пользователь')
-        elif 2 <= migrated_count <= 4:
-            print(f'✅ Мигрировано {migrated_count} пользователя')
-        elif migrated_count >= 5:
-            print(f'✅ Мигрировано {migrated_count} пользователей')
-        else:
-            print('ℹ️ Нет пользователей для миграции')
-
+        _migrate_temp_vip(_read_vip_snapshot())
         return True
 
     except Exception as e:
@@ -428,39 +534,15 @@ def migrate_many_users() -> bool:
 
 def sync_is_vip_for_all_users() -> bool:
     """
-    Синхронизировать is_vip колонку со списком в config
+    Синхронизировать is_vip колонку со списком VIP (лист members)
 
     Returns:
         bool: True если успешно
     """
     try:
-        vip_list_str = config_worksheet.acell('D2').value or ""
-        vip_list = [id.strip() for id in vip_list_str.split(',') if id.strip()]
-
-        all_users = users_worksheet.get_all_records()
-
-        updates = []
-        synced_count = 0
-
-        for idx, user in enumerate(all_users, start=2):
-            user_id = str(user.get('user_id', ''))
-            current_is_vip = user.get('is_vip', '')
-
-            should_be_vip = 'True' if user_id in vip_list else 'False'
-
-            if current_is_vip != should_be_vip:
-                updates.append({
-                    'range': f'F{idx}',  # Столбец F - is_vip
-                    'values': [[should_be_vip]]
-                })
-                synced_count += 1
-
-        if updates:
-            users_worksheet.batch_update(updates)
-            print(f"✅ Синхронизировано is_vip для {synced_count} пользователей")
-        else:
-            print("ℹ️ is_vip актуален для всех пользователей")
-
+        snapshot = _read_vip_snapshot()
+        membership.load_values(snapshot.members_values)
+        _sync_is_vip(snapshot)
         return True
 
     except Exception as e:
@@ -468,6 +550,109 @@ def sync_is_vip_for_all_users() -> bool:
         return False
 
 
+class _VipSnapshot:
+    """
+    Колонки users и лист members, прочитанные одним запросом
+
+    Атрибуты:
+        rows: (номер строки, user_id, username без @ в нижнем регистре, is_vip)
+        members_values: Значения листа members
+        is_vip_col: Номер колонки is_vip
+        fingerprint: Отпечаток прочитанных данных
+    """
+
+    def __init__(self, users_values: List[List[str]], members_values: List[List[str]]):
+        headers = list(users_values[0]) if users_values else []
+        id_index = headers.index('user_id') if 'user_id' in headers else 0
+        username_index = headers.index('username') if 'username' in headers else 1
+        vip_index = headers.index('is_vip') if 'is_vip' in headers else 5
+
+        self.rows: List[Tuple[int, str, str, str]] = []
+        for row_number, row in enumerate(users_values[1:], start=2):
+            row = list(row) + [''] * (vip_index + 1 - len(row))
+            user_id = str(row[id_index]).strip()
+            if user_id:
+                self.rows.append((row_number, user_id, normalize(TEMP_VIP, row[username_index]), row[vip_index]))
+
+        self.members_values = members_values
+        self.is_vip_col = vip_index + 1
+        self.fingerprint = hashlib.sha1(
+            json.dumps([users_values, members_values], ensure_ascii=False).encode()
+        ).hexdigest()
+
+
+# Отпечаток данных последней синхронизации, после которой ничего не пришлось менять
+_last_vip_fingerprint: Optional[str] = None
+
+
+def _read_vip_snapshot() -> _VipSnapshot:
+    """Прочитать колонки A..is_vip листа users и лист members (один запрос)"""
+    headers = users_cache.headers
+    vip_col = headers.index('is_vip') + 1 if 'is_vip' in headers else 6
+    users_range = f"A:{rowcol_to_a1(1, vip_col).rstrip('0123456789')}"
+
+    if main_spreadsheet is None:
+        # Локальное хранилище (STORAGE_BACKEND=sqlite): чтения без сети
+        return _VipSnapshot(users_worksheet.get(users_range), members_worksheet.get_all_values())
+
+    response = main_spreadsheet.values_batch_get([f"users!{users_range}", 'members!A:D'])
+    users_values, members_values = [item.get('values', []) for item in response['valueRanges']]
+    return _VipSnapshot(users_values, members_values)
+
+
+def _migrate_temp_vip(snapshot: _VipSnapshot) -> int:
+    """Перенести найденных по username временных VIP в VIP (пересечение множеств)"""
+    temp_vip = membership.members(TEMP_VIP)
+    user_ids: Dict[str, str] = {}
+    if temp_vip:
+        for _, user_id, username, _ in snapshot.rows:
+            if username:
+                user_ids.setdefault(username, user_id)
+
+    matched = temp_vip & user_ids.keys()
+    migrated_count = 0
+    if matched:
+        migrated_count = membership.add(VIP, [user_ids[username] for username in matched])
+        membership.remove(TEMP_VIP, matched)
+
+    if migrated_count == 1:
+        print(f'✅ Мигрирован {migrated_count} пользователь')
+    elif 2 <= migrated_count <= 4:
+        print(f'✅ Мигрировано {migrated_count} пользователя')
+    elif migrated_count >= 5:
+        print(f'✅ Мигрировано {migrated_count} пользователей')
+    else:
+        print('ℹ️ Нет пользователей для миграции')
+
+    return len(matched)
+
+
+def _sync_is_vip(snapshot: _VipSnapshot) -> int:
+    """Записать is_vip, расходящийся со списком VIP, одним batch_update"""
+    vip_ids = membership.members(VIP)
+    updates = []
+    changed = {}
+
+    for row_number, user_id, _, current_is_vip in snapshot.rows:
+        should_be_vip = 'True' if user_id in vip_ids else 'False'
+        if current_is_vip != should_be_vip:
+            updates.append({
+                'range': rowcol_to_a1(row_number, snapshot.is_vip_col),
+                'values': [[should_be_vip]]
+            })
+            changed[user_id] = should_be_vip
+
+    if updates:
+        users_worksheet.batch_update(updates)
+        for user_id, value in changed.items():
+            users_cache.apply_update(user_id, {'is_vip': value})
+        print(f"✅ Синхронизировано is_vip для {len(changed)} пользователей")
+    else:
+        print("ℹ️ is_vip актуален для всех пользователей")
+
+    return len(changed)
+
+
 # ============================================================================
 # ГОЛОСОВАНИЕ
 # ============================================================================
@@ -476,6 +661,9 @@ def save_vote(user_id: int, vote_value: str) -> bool:
     """
     Сохранить голос пользователя (заменяет предыдущий ответ если был)
 
+    Голос принимается в памяти и журнале (vote_aggregator),
+    в колонку vote_response он уходит пачкой при сбросе.
+
     Args:
         user_id: Telegram ID пользователя
         vote_value: Значение голоса ('1', '2', или '3')
@@ -484,16 +672,7 @@ def save_vote(user_id: int, vote_value: str) -> bool:
         bool: True если успешно
     """
     try:
-        headers = users_worksheet.row_values(1)
-
-        # Проверяем есть ли колонка vote_response
-        if 'vote_response' not in headers:
-            print("⚠️ Колонка 'vote_response' не найдена в таблице!")
-            print("   Добавьте колонку O: vote_response в Google Sheets")
-            return False
-
-        # Обновляем голос (заменяет старое значение)
-        return update_user_batch(user_id, {'vote_response': vote_value})
+        return vote_aggregator.record(user_id, vote_value)
 
     except Exception as e:
         print(f"❌ Ошибка сохранения голоса {user_id}: {e}")
@@ -502,33 +681,15 @@ def save_vote(user_id: int, vote_value: str) -> bool:
 
 def get_vote_stats() -> dict:
     """
-    Получить статистику голосования
+    Получить статистику голосования (счётчики в памяти, без чтения листа)
 
     Returns:
-        dict: {'1': count, '2': count, '3': count, 'total': count, 'not_voted': count}
+        dict: {'1': count, '2': count, '3': count, 'total': count, 'not_voted': count,
+               'pending': count}
     """
     try:
-        all_users = users_worksheet.get_all_records()
-
-        stats = {
-            '1': 0,
-            '2': 0,
-            '3': 0,
-            'total': 0,
-            'not_voted': 0
-        }
-
-        for user in all_users:
-            vote = str(user.get('vote_response', '')).strip()
-
-            if vote in ['1', '2', '3']:
-                stats[vote] += 1
-                stats['total'] += 1
-            else:
-                stats['not_voted'] += 1
-
-        return stats
+        return vote_aggregator.stats()
 
     except Exception as e:
         print(f"❌ Ошибка получения статистики голосов: {e}")
-        return {'1': 0, '2': 0, '3': 0, 'total': 0, 'not_voted': 0}
+        return {'1': 0, '2': 0, '3': 0, 'total': 0, 'not_voted': 0, 'pending': 0}
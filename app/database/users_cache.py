@@ -0,0 +1,318 @@
+"""
+Снимок таблицы users в памяти
+Индекс user_id → номер строки, чтобы обычные чтения не ходили в Google Sheets
+"""
+
+import re
+import time
+import threading
+from typing import Callable, Dict, List, Optional
+
+from app.config import USERS_CACHE_TTL_SECONDS
+from app.database.connection import users_worksheet
+from app.database.single_flight import SingleFlight
+from app.utils.formatters import clean_telegram_username
+
+
+class UsersCache:
+    """
+    Общий для процесса снимок листа users
+
+    Загружается одним вызовом get_all_values(), дальше чтения идут из памяти.
+    Записи (update_user_batch, add_user, ...) обновляют снимок сразу после
+    успешной записи в Sheets. Ручные правки в таблице подтягиваются
+    при следующей перезагрузке (раз в ttl секунд).
+
+    Рядом поддерживается индекс нормализованный username → user_id
+    для сопоставления оплат Tilda без полного чтения листа.
+
+    Атрибуты:
+        worksheet: Лист users
+        ttl: Время жизни снимка (сек)
+        headers: Заголовки колонок (строка 1)
+        overlay: Функция {user_id: {поле: значение}} с ещё не записанными
+                 изменениями - накладываются поверх перечитанных строк
+    """
+
+    def __init__(self, worksheet, ttl: float = USERS_CACHE_TTL_SECONDS):
+        self.worksheet = worksheet
+        self.ttl = ttl
+        self.headers: List[str] = []
+        self._rows: Dict[str, List[str]] = {}
+        self._row_numbers: Dict[str, int] = {}
+        self._by_username: Dict[str, str] = {}
+        self._username_of: Dict[str, str] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.RLock()
+        self.overlay: Optional[Callable[[], Dict[str, dict]]] = None
+        self._flight = SingleFlight('users_cache')
+
+    # ------------------------------------------------------------------------
+    # Загрузка
+    # ------------------------------------------------------------------------
+
+    def reload(self):
+        """Перечитать лист целиком (один API-вызов)"""
+        self.load_values(self.worksheet.get_all_values())
+
+    def load_values(self, values: List[List[str]]):
+        """
+        Загрузить снимок из уже прочитанных значений листа (со строкой заголовков)
+
+        Используется, когда лист users прочитан вместе с другими диапазонами
+        одним values_batch_get (см. load_start_context).
+        """
+        pending = self.overlay() if self.overlay else {}
+
+        with self._lock:
+            self.headers = list(values[0]) if values else []
+            self._rows = {}
+            self._row_numbers = {}
+            self._by_username = {}
+            self._username_of = {}
+
+            for row_number, row in enumerate(values[1:], start=2):
+                user_id = str(row[0]).strip() if row else ''
+                # Как и find(), при дублях берём первую строку
+                if user_id and user_id not in self._rows:
+                    self._rows[user_id] = self._pad(row)
+                    self._row_numbers[user_id] = row_number
+                    self._index_username(user_id)
+
+            for user_id, update_dict in pending.items():
+                self.apply_update(user_id, update_dict)
+
+            self._loaded_at = time.monotonic()
+
+        print(f"📥 Снимок users загружен: {len(self._rows)} пользователей")
+
+    def ensure_loaded(self):
+        """Загрузить снимок, если его нет или он устарел (одновременные вызовы ждут одну загрузку)"""
+        if not self.is_fresh:
+            self._flight.do('reload', self.reload)
+
+    @property
+    def is_fresh(self) -> bool:
+        """Снимок загружен и не старше ttl"""
+        with self._lock:
+            return (
+                self._loaded_at is not None
+                and time.monotonic() - self._loaded_at < self.ttl
+            )
+
+    @property
+    def loaded_at(self) -> Optional[float]:
+        """Момент последней загрузки (time.monotonic) или None"""
+        return self._loaded_at
+
+    def invalidate(self):
+        """Пометить снимок устаревшим (перечитается при следующем обращении)"""
+        with self._lock:
+            self._loaded_at = None
+
+    # ------------------------------------------------------------------------
+    # Чтение
+    # ------------------------------------------------------------------------
+
+    def get(self, user_id) -> Optional[dict]:
+        """
+        Данные пользователя по user_id
+
+        Если пользователя нет в снимке (добавлен вручную или другим процессом),
+        ищем его точечно в колонке user_id и добавляем в снимок.
+
+        Returns:
+            dict: {заголовок: значение} или None
+        """
+        self.ensure_loaded()
+        key = str(user_id).strip()
+
+        with self._lock:
+            row = self._rows.get(key)
+            if row is not None:
+                return dict(zip(self.headers, row))
+
+        if self._flight.do(('lookup', key), self._lookup_remote, key):
+            with self._lock:
+                # Между поиском и чтением снимок мог перезагрузиться без этой строки
+                row = self._rows.get(key)
+                return dict(zip(self.headers, row)) if row is not None else None
+        return None
+
+    def peek(self, user_id) -> Optional[dict]:
+        """Данные пользователя только из памяти (без загрузки и поиска в Sheets)"""
+        with self._lock:
+            row = self._rows.get(str(user_id).strip())
+            return dict(zip(self.headers, row)) if row is not None else None
+
+    def find_by_username(self, username: str) -> Optional[dict]:
+        """
+        Найти пользователя по нормализованному username (O(1), без API)
+
+        Args:
+            username: Username, уже очищенный clean_telegram_username()
+
+        Returns:
+            dict: Данные пользователя или None
+        """
+        self.ensure_loaded()
+        with self._lock:
+            user_id = self._by_username.get(username)
+            if user_id is None:
+                return None
+            return dict(zip(self.headers, self._rows[user_id]))
+
+    def records(self) -> List[dict]:
+        """
+        Все пользователи снимка в порядке строк листа
+
+        Returns:
+            list: Словари {заголовок: значение}, как в get_all_records()
+        """
+        self.ensure_loaded()
+        with self._lock:
+            ordered = sorted(self._row_numbers.items(), key=lambda item: item[1])
+            return [dict(zip(self.headers, self._rows[user_id])) for user_id, _ in ordered]
+
+    def __len__(self) -> int:
+        """Количество пользователей в снимке"""
+        with self._lock:
+            return len(self._rows)
+
+    def get_row_number(self, user_id) -> Optional[int]:
+        """Номер строки пользователя в листе (или None)"""
+        if self.get(user_id) is None:
+            return None
+        with self._lock:
+            return self._row_numbers.get(str(user_id).strip())
+
+    def _lookup_remote(self, key: str) -> bool:
+        """Найти пользователя в Sheets только по колонке A (user_id)"""
+        cell = self.worksheet.find(key, in_column=1)
+        if not cell:
+            return False
+
+        row = self.worksheet.row_values(cell.row)
+        self.put_row(row, cell.row)
+
+        pending = self.overlay() if self.overlay else {}
+        if key in pending:
+            self.apply_update(key, pending[key])
+        return True
+
+    # ------------------------------------------------------------------------
+    # Обновление после записи
+    # ------------------------------------------------------------------------
+
+    def apply_update(self, user_id, update_dict: dict):
+        """Применить к снимку поля, уже записанные в Sheets"""
+        key = str(user_id).strip()
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                return
+            for field_name, new_value in update_dict.items():
+                if field_name in self.headers:
+                    row[self.headers.index(field_name)] = str(new_value)
+            if 'username' in update_dict:
+                self._index_username(key)
+
+    def put_row(self, row: List, row_number: Optional[int]):
+        """
+        Добавить (или заменить) строку пользователя в снимке
+
+        Args:
+            row: Значения строки в порядке колонок
+            row_number: Номер строки в листе; None - перечитать снимок позже
+        """
+        if row_number is None:
+            self.invalidate()
+            return
+
+        key = str(row[0]).strip() if row else ''
+        if not key:
+            return
+
+        with self._lock:
+            self._rows[key] = self._pad([str(value) for value in row])
+            self._row_numbers[key] = row_number
+            self._index_username(key)
+
+    @staticmethod
+    def row_number_from_append(response) -> Optional[int]:
+        """
+        Номер строки из ответа append_row
+
+        Args:
+            response: Ответ API, например {'updates': {'updatedRange': "users!A15:N15"}}
+        """
+        try:
+            updated_range = response['updates']['updatedRange']
+            match = re.search(r'![A-Z]+(\d+)', updated_range)
+            return int(match.group(1)) if match else None
+        except (KeyError, TypeError):
+            return None
+
+    def _index_username(self, user_id: str):
+        """
+        Обновить индекс username для пользователя (вызывать под блокировкой)
+
+        _username_of хранит username каждого пользователя, _by_username -
+        одного владельца на username: как и find(), первую строку листа.
+        Если username освободился (сменился у владельца), индекс переходит
+        к следующему пользователю с тем же username.
+        """
+        if 'username' not in self.headers:
+            return
+
+        old_username = self._username_of.pop(user_id, None)
+        username = clean_telegram_username(self._rows[user_id][self.headers.index('username')])
+
+        if username:
+            self._username_of[user_id] = username
+            holder = self._by_username.get(username)
+            if holder is None or self._row_order(user_id) < self._row_order(holder):
+                self._by_username[username] = user_id
+
+        if old_username and old_username != username and self._by_username.get(old_username) == user_id:
+            others = [other for other, name in self._username_of.items() if name == old_username]
+            if others:
+                self._by_username[old_username] = min(others, key=self._row_order)
+            else:
+                del self._by_username[old_username]
+
+    def _row_order(self, user_id: str) -> float:
+        return self._row_numbers.get(user_id, float('inf'))
+
+    def _pad(self, row: List) -> List[str]:
+        """Дополнить строку пустыми значениями до числа колонок"""
+        row = list(row)
+        if len(row) < len(self.headers):
+            row.extend([''] * (len(self.headers) - len(row)))
+        return row
+
+
+# Глобальный снимок (загружается при первом обращении)
+users_cache = UsersCache(users_worksheet)
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Как использовать:
+
+    from app.database.users_cache import users_cache
+
+    user = users_cache.get(user_id)          # 0 API-вызовов при попадании
+    row = users_cache.get_row_number(user_id)
+
+После записи в лист users обязательно обновляйте снимок:
+    users_cache.apply_update(user_id, {'is_diamond': 'True'})
+    users_cache.put_row(new_row, row_number)
+
+Ограничение: если строки в таблице удаляют или сортируют вручную,
+номера строк в снимке актуальны только до следующей перезагрузки
+(USERS_CACHE_TTL_SECONDS). Для немедленного эффекта - users_cache.invalidate().
+"""
@@ -0,0 +1,418 @@
+"""
+Голосование: приём голосов из памяти и счётчики для /vote_stats
+Голоса пишутся в журнал на диске и уходят в колонку vote_response пачками
+"""
+
+import glob
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional
+
+import gspread
+
+from app.config import VOTE_JOURNAL_FILE, VOTE_FLUSH_MAX_PENDING
+from app.database.connection import users_worksheet
+from app.database.users_cache import users_cache
+from app.database.write_buffer import write_buffer
+from app.utils.leader_lease import leader_lease
+
+
+# Допустимые варианты ответа
+VOTE_OPTIONS = ('1', '2', '3')
+VOTE_COLUMN = 'vote_response'
+
+
+class VoteAggregator:
+    """
+    Приём голосов без API-вызова на каждый клик
+
+    - record() проверяет голос по памяти, дописывает его в журнал (fsync),
+      обновляет счётчики и снимок users и сразу отвечает
+    - повторный голос пользователя заменяет прежний (побеждает последний),
+      в лист уходит только последнее значение
+    - flush() отправляет накопленные голоса одним batch_update; вызывается
+      вместе со сбросом буфера записи, при переполнении и при остановке бота
+    - после успешной записи журнал переписывается: в нём остаются только
+      голоса, пришедшие во время записи
+
+    Журнал у каждого процесса свой (в имени - идентификатор процесса
+    leader_lease.owner), поэтому процессы не затирают голоса друг друга.
+    Журналы завершившихся процессов забирает ведущий (adopt_orphans):
+    их голоса ставятся в его очередь и попадают в лист при ближайшем flush().
+
+    Счётчики строятся по снимку users один раз (без API, снимок уже в памяти)
+    и дальше меняются на каждом голосе. После перезагрузки снимка (ручные
+    правки в таблице) они пересчитываются.
+
+    Атрибуты:
+        worksheet: Лист users
+        cache: Снимок users (номера строк, заголовки, read-your-writes)
+        journal_base: Базовое имя журналов (VOTE_JOURNAL_FILE)
+        journal_file: Журнал этого процесса (JSON Lines)
+        max_pending: Порог голосов для немедленного сброса
+    """
+
+    def __init__(
+        self,
+        worksheet,
+        cache,
+        journal_file: str = VOTE_JOURNAL_FILE,
+        max_pending: int = VOTE_FLUSH_MAX_PENDING,
+        owner: str = leader_lease.owner
+    ):
+        self.worksheet = worksheet
+        self.cache = cache
+        self.journal_base = journal_file
+        self.owner = owner
+        self.journal_file = self._journal_path(owner)
+        self.max_pending = max_pending
+        self._votes: Dict[str, str] = {}
+        self._counts: Dict[str, int] = {}
+        self._built_from: Optional[float] = None
+        self._pending: Dict[str, str] = {}
+        self._inflight: Dict[str, str] = {}
+        self._journal = None
+        self._adopted: List[str] = []
+        # _lock - состояние в памяти (короткие секции, без диска);
+        # _journal_lock - файлы журнала (запись, fsync, перезапись).
+        # Если нужны обе - сначала _journal_lock
+        self._lock = threading.RLock()
+        self._journal_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    # ------------------------------------------------------------------------
+    # Голоса
+    # ------------------------------------------------------------------------
+
+    def record(self, user_id, vote_value: str) -> bool:
+        """
+        Принять голос пользователя
+
+        Returns:
+            bool: True если голос принят (записан в журнал)
+        """
+        vote_value = str(vote_value).strip()
+        if vote_value not in VOTE_OPTIONS:
+            return False
+
+        self._ensure_counts()
+        if VOTE_COLUMN not in self.cache.headers:
+            print(f"⚠️ Колонка '{VOTE_COLUMN}' не найдена в таблице!")
+            print(f"   Добавьте колонку O: {VOTE_COLUMN} в Google Sheets")
+            return False
+
+        key = str(user_id).strip()
+        if self.cache.get(key) is None:
+            print(f"❌ Пользователь {key} не найден, голос не принят")
+            return False
+
+        with self._journal_lock:
+            with self._lock:
+                if self._votes.get(key) == vote_value:
+                    return True
+            # fsync - без _lock: stats() и снимок users не ждут диска
+            self._append_journal(key, vote_value)
+            with self._lock:
+                self._apply(key, vote_value)
+                size = len(self._pending)
+
+        self.cache.apply_update(key, {VOTE_COLUMN: vote_value})
+
+        if size >= self.max_pending:
+            self.flush()
+        return True
+
+    def _apply(self, key: str, vote_value: str) -> bool:
+        """Поставить голос в очередь и поправить счётчики (под _lock)"""
+        previous = self._votes.get(key)
+        if previous == vote_value:
+            return False
+        if previous in self._counts:
+            self._counts[previous] -= 1
+        self._counts[vote_value] = self._counts.get(vote_value, 0) + 1
+        self._votes[key] = vote_value
+        self._pending[key] = vote_value
+        return True
+
+    def stats(self) -> dict:
+        """
+        Текущие итоги голосования (из памяти)
+
+        Returns:
+            dict: {'1': count, '2': count, '3': count, 'total': count,
+                   'not_voted': count, 'pending': count}
+        """
+        self._ensure_counts()
+        with self._lock:
+            stats = {option: self._counts.get(option, 0) for option in VOTE_OPTIONS}
+            stats['total'] = sum(stats.values())
+            stats['not_voted'] = max(len(self.cache) - stats['total'], 0)
+            stats['pending'] = len(self._pending) + len(self._inflight)
+            return stats
+
+    def pending(self) -> Dict[str, str]:
+        """Ещё не записанные голоса (включая отправляемые прямо сейчас)"""
+        with self._lock:
+            merged = dict(self._inflight)
+            merged.update(self._pending)
+            return merged
+
+    def overlay(self, base: Optional[Callable[[], Dict[str, dict]]] = None) -> Callable[[], Dict[str, dict]]:
+        """
+        Функция для users_cache.overlay: незаписанные голоса поверх base()
+
+        Голоса не пропадают из снимка, если он перечитан до flush().
+        """
+        def merged() -> Dict[str, dict]:
+            result = base() if base else {}
+            for key, vote_value in self.pending().items():
+                result.setdefault(key, {})[VOTE_COLUMN] = vote_value
+            return result
+        return merged
+
+    def _ensure_counts(self):
+        """Пересчитать счётчики, если снимок users загружен заново"""
+        self.cache.ensure_loaded()
+        if self._built_from == self.cache.loaded_at:
+            return
+
+        with self._lock:
+            # Снимок уже содержит незаписанные голоса (overlay)
+            votes = {}
+            for record in self.cache.records():
+                vote_value = str(record.get(VOTE_COLUMN, '')).strip()
+                if vote_value in VOTE_OPTIONS:
+                    votes[str(record.get('user_id', '')).strip()] = vote_value
+            votes.update(self._inflight)
+            votes.update(self._pending)
+
+            counts = {option: 0 for option in VOTE_OPTIONS}
+            for vote_value in votes.values():
+                counts[vote_value] += 1
+
+            self._votes = votes
+            self._counts = counts
+            self._built_from = self.cache.loaded_at
+
+    # ------------------------------------------------------------------------
+    # Запись в лист
+    # ------------------------------------------------------------------------
+
+    def flush(self) -> bool:
+        """
+        Записать накопленные голоса в колонку vote_response одним batch_update
+
+        Returns:
+            bool: True если очередь пуста или успешно записана
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+            if not batch:
+                return True
+
+            try:
+                update_data = self._build_ranges(batch)
+                if update_data:
+                    self.worksheet.batch_update(update_data)
+                print(f"🗳 Голоса записаны: {len(update_data)} ячеек")
+            except Exception as e:
+                print(f"❌ Ошибка записи голосов ({len(batch)}), повтор позже: {e}")
+                with self._lock:
+                    for key, vote_value in batch.items():
+                        self._pending.setdefault(key, vote_value)
+                    self._inflight = {}
+                return False
+
+            with self._journal_lock:
+                with self._lock:
+                    self._inflight = {}
+                    remaining = dict(self._pending)
+                self._rewrite_journal(remaining)
+            return True
+
+    def _build_ranges(self, batch: Dict[str, str]) -> list:
+        headers = self.cache.headers
+        if VOTE_COLUMN not in headers:
+            print(f"⚠️ Столбец '{VOTE_COLUMN}' не найден, голоса отброшены")
+            return []
+
+        col = headers.index(VOTE_COLUMN) + 1
+        update_data = []
+        for key, vote_value in batch.items():
+            row_number = self.cache.get_row_number(key)
+            if not row_number:
+                print(f"❌ Пользователь {key} не найден, голос отброшен")
+                continue
+            update_data.append({
+                'range': gspread.utils.rowcol_to_a1(row_number, col),
+                'values': [[vote_value]]
+            })
+        return update_data
+
+    def __len__(self) -> int:
+        """Голосов в очереди"""
+        with self._lock:
+            return len(self._pending)
+
+    # ------------------------------------------------------------------------
+    # Журнал
+    # ------------------------------------------------------------------------
+
+    def _journal_path(self, owner: str, suffix: str = '') -> str:
+        """data/votes_journal.jsonl → data/votes_journal.<процесс>[.suffix].jsonl"""
+        stem, ext = os.path.splitext(self.journal_base)
+        safe_owner = re.sub(r'[^A-Za-z0-9_-]', '_', owner)
+        return f"{stem}.{safe_owner}{'.' + suffix if suffix else ''}{ext}"
+
+    def adopt_orphans(self, alive_owners: Iterable[str]) -> int:
+        """
+        Забрать голоса из журналов завершившихся процессов
+
+        Вызывает ведущий (задача recover_orphans). Чужой журнал сначала
+        переименовывается в журнал этого процесса (rename атомарен - файл
+        достанется одному процессу), голоса ставятся в очередь, а файл
+        удаляется после ближайшей успешной записи в лист. Журнал старого
+        формата (общий VOTE_JOURNAL_FILE) забирается так же.
+
+        Args:
+            alive_owners: Живые процессы (leader_lease.alive_owners())
+
+        Returns:
+            int: Сколько голосов поставлено в очередь
+        """
+        stem, ext = os.path.splitext(self.journal_base)
+        alive_prefixes = tuple(self._journal_path(owner)[:-len(ext) or None] for owner in alive_owners)
+        own_prefix = self._journal_path(self.owner)[:-len(ext) or None]
+
+        orphans = [self.journal_base] if os.path.exists(self.journal_base) else []
+        for path in glob.glob(f"{glob.escape(stem)}.*{ext}"):
+            # Файл процесса X: <stem>.<X><ext> или <stem>.<X>.<что-то><ext>
+            base = path[:-len(ext) or None]
+            if any(base == prefix or base.startswith(prefix + '.') for prefix in alive_prefixes):
+                continue
+            if base == own_prefix or base.startswith(own_prefix + '.'):
+                continue
+            orphans.append(path)
+
+        adopted = 0
+        for path in orphans:
+            claimed = self._journal_path(self.owner, f"adopted-{uuid.uuid4().hex[:6]}")
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                # Забрал другой процесс
+                continue
+            except OSError as e:
+                print(f"⚠️ Не удалось забрать журнал голосов {path}: {e}")
+                continue
+
+            applied = {}
+            with self._journal_lock:
+                with self._lock:
+                    for key, vote_value in self._read_journal(claimed).items():
+                        # Голос, принятый этим процессом позже, не перетираем
+                        if key in self._pending or key in self._inflight:
+                            continue
+                        if self._apply(key, vote_value):
+                            applied[key] = vote_value
+                self._adopted.append(claimed)
+
+            for key, vote_value in applied.items():
+                self.cache.apply_update(key, {VOTE_COLUMN: vote_value})
+            adopted += len(applied)
+
+        if adopted:
+            print(f"🗳 Из журналов завершившихся процессов восстановлено голосов: {adopted}")
+        return adopted
+
+    def _read_journal(self, path: str) -> Dict[str, str]:
+        entries: Dict[str, str] = {}
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Недописанная последняя строка (падение во время записи)
+                        continue
+                    entries[str(entry['user_id'])] = str(entry['vote'])
+        except (OSError, KeyError) as e:
+            print(f"⚠️ Не удалось прочитать журнал голосов {path}: {e}")
+        return entries
+
+    def _append_journal(self, key: str, vote_value: str):
+        """Дописать голос в журнал (до ответа пользователю; под _journal_lock)"""
+        if self._journal is None:
+            os.makedirs(os.path.dirname(self.journal_file) or '.', exist_ok=True)
+            self._journal = open(self.journal_file, 'a', encoding='utf-8')
+
+        entry = {'user_id': key, 'vote': vote_value, 'at': int(time.time())}
+        self._journal.write(json.dumps(entry) + '\n')
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def _rewrite_journal(self, remaining: Dict[str, str]):
+        """
+        Оставить в журнале только ещё не записанные голоса (под _journal_lock)
+
+        Трогает только свой журнал и забранные журналы завершившихся процессов.
+        """
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+        try:
+            if not remaining:
+                if os.path.exists(self.journal_file):
+                    os.remove(self.journal_file)
+            else:
+                tmp_file = self.journal_file + '.tmp'
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    for key, vote_value in remaining.items():
+                        f.write(json.dumps({'user_id': key, 'vote': vote_value, 'at': int(time.time())}) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.journal_file)
+
+            # Голоса забранных журналов теперь в листе или в своём журнале
+            for path in self._adopted:
+                os.remove(path)
+            self._adopted = []
+        except OSError as e:
+            # Журналы остаются полными - лишние голоса при восстановлении просто перезапишутся
+            print(f"⚠️ Не удалось обновить журнал голосов: {e}")
+
+
+# Глобальный агрегатор; его голоса накладываются на снимок users вместе с буфером записи
+vote_aggregator = VoteAggregator(users_worksheet, users_cache)
+users_cache.overlay = vote_aggregator.overlay(write_buffer.pending)
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Как использовать:
+
+    from app.database.votes import vote_aggregator
+
+    vote_aggregator.record(user_id, '2')   # без API-вызова, голос в журнале
+    vote_aggregator.stats()                # {'1': .., '2': .., '3': .., 'total': .., ...}
+    vote_aggregator.flush()                # один batch_update по колонке vote_response
+
+save_vote() и get_vote_stats() из app.database работают через агрегатор.
+Сброс идёт каждые WRITE_BUFFER_FLUSH_INTERVAL_SECONDS вместе с буфером записи
+и сразу, если в очереди VOTE_FLUSH_MAX_PENDING голосов.
+
+Журнал - одна строка JSON на голос, у каждого процесса свой файл:
+data/votes_journal.<процесс>.jsonl. Если процесс упал до записи в лист,
+его журнал забирает ведущий (задача recover_orphans, vote_aggregator.adopt_orphans)
+и записывает голоса при ближайшем сбросе.
+"""
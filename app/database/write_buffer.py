@@ -0,0 +1,148 @@
+"""
+Отложенная запись изменений пользователей
+Изменения копятся в памяти и уходят в лист users одним batch_update
+"""
+
+import threading
+from typing import Dict
+
+import gspread
+
+from app.config import WRITE_BUFFER_MAX_CELLS
+from app.database.connection import users_worksheet
+from app.database.users_cache import users_cache
+
+
+class UserWriteBuffer:
+    """
+    Буфер изменений строк users (write-behind)
+
+    - put() сразу применяет изменения к снимку users_cache (читатели
+      в процессе видят свои записи) и складывает их в буфер
+    - повторная запись того же поля заменяет прежнее значение (побеждает последняя)
+    - flush() отправляет все накопленные ячейки одним batch_update; вызывается
+      планировщиком каждые WRITE_BUFFER_FLUSH_INTERVAL_SECONDS, при переполнении
+      буфера и при остановке бота
+    - если запись не удалась, изменения возвращаются в буфер (новые значения,
+      пришедшие за это время, не затираются)
+
+    Атрибуты:
+        worksheet: Лист users
+        cache: Снимок users (номера строк, заголовки, read-your-writes)
+        max_cells: Порог ячеек для немедленного сброса
+    """
+
+    def __init__(self, worksheet, cache, max_cells: int = WRITE_BUFFER_MAX_CELLS):
+        self.worksheet = worksheet
+        self.cache = cache
+        self.max_cells = max_cells
+        self._pending: Dict[str, Dict[str, str]] = {}
+        self._inflight: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def put(self, user_id, update_dict: dict):
+        """Добавить изменения пользователя в буфер"""
+        key = str(user_id).strip()
+        with self._lock:
+            fields = self._pending.setdefault(key, {})
+            fields.update({name: str(value) for name, value in update_dict.items()})
+            size = sum(len(fields) for fields in self._pending.values())
+
+        # Снимок обновляем вне блокировки буфера (у снимка своя блокировка)
+        self.cache.apply_update(key, update_dict)
+
+        if size >= self.max_cells:
+            self.flush()
+
+    def pending(self) -> Dict[str, dict]:
+        """Все ещё не записанные изменения (включая отправляемые прямо сейчас)"""
+        with self._lock:
+            merged = {key: dict(fields) for key, fields in self._inflight.items()}
+            for key, fields in self._pending.items():
+                merged.setdefault(key, {}).update(fields)
+            return merged
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(fields) for fields in self._pending.values())
+
+    def flush(self) -> bool:
+        """
+        Записать буфер в лист users одним batch_update
+
+        Returns:
+            bool: True если буфер пуст или успешно записан
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+            if not batch:
+                return True
+
+            try:
+                update_data = self._build_ranges(batch)
+                if update_data:
+                    self.worksheet.batch_update(update_data)
+                print(f"💾 Буфер записи: {len(batch)} пользователей, {len(update_data)} ячеек")
+                return True
+            except Exception as e:
+                print(f"❌ Ошибка записи буфера ({len(batch)} пользователей), повтор позже: {e}")
+                with self._lock:
+                    for key, fields in batch.items():
+                        newer = self._pending.setdefault(key, {})
+                        for name, value in fields.items():
+                            newer.setdefault(name, value)
+                return False
+            finally:
+                with self._lock:
+                    self._inflight = {}
+
+    def _build_ranges(self, batch: Dict[str, Dict[str, str]]) -> list:
+        headers = self.cache.headers
+        update_data = []
+
+        for key, fields in batch.items():
+            row_number = self.cache.get_row_number(key)
+            if not row_number:
+                print(f"❌ Пользователь {key} не найден, изменения отброшены")
+                continue
+
+            for field_name, value in fields.items():
+                if field_name not in headers:
+                    print(f"⚠️ Столбец '{field_name}' не найден")
+                    continue
+                update_data.append({
+                    'range': gspread.utils.rowcol_to_a1(row_number, headers.index(field_name) + 1),
+                    'values': [[value]]
+                })
+
+        return update_data
+
+
+# Глобальный буфер; снимок users накладывает его поверх перечитанных данных
+write_buffer = UserWriteBuffer(users_worksheet, users_cache)
+users_cache.overlay = write_buffer.pending
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Как использовать:
+
+    from app.database.write_buffer import write_buffer
+
+    write_buffer.put(user_id, {'is_sub_active': 'False'})   # без API-вызова
+    users_cache.get(user_id)['is_sub_active']                # уже 'False'
+    write_buffer.flush()                                     # один batch_update
+
+update_user_batch() и update_users_batch() пишут через буфер. Перед действиями,
+которые должны идти строго после записи (пометка оплаты Tilda как обработанной),
+вызывайте write_buffer.flush() и проверяйте результат.
+
+Функции, читающие лист users напрямую (get_all_records), видят изменения
+только после сброса буфера.
+"""
@@ -0,0 +1,187 @@
+"""
+Хранилище состояний FSM в SQLite
+Состояния и данные (например, черновик рассылки) переживают перезапуск бота
+"""
+
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from app.config import FSM_STORAGE_DB, FSM_CACHE_SIZE, FSM_STATE_TTL_SECONDS
+
+
+# Как часто удалять брошенные состояния (в секундах)
+CLEANUP_INTERVAL_SECONDS = 60 * 60
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    FSM-хранилище aiogram на SQLite (режим WAL)
+
+    - Запись сквозная: сначала в память, сразу же в SQLite
+    - Чтение из LRU-кэша в памяти, при промахе - из SQLite
+    - Ключи без изменений дольше state_ttl удаляются (раз в час при записи)
+
+    Кэш - на процесс. Если бот запущен в нескольких процессах на одном файле,
+    ставьте cache_size=0, чтобы каждый процесс читал актуальное состояние из SQLite.
+
+    Атрибуты:
+        path: Путь к файлу базы
+        cache_size: Размер LRU-кэша (ключей)
+        state_ttl: Время жизни неизменяемого состояния (сек)
+    """
+
+    def __init__(
+        self,
+        path: str = FSM_STORAGE_DB,
+        cache_size: int = FSM_CACHE_SIZE,
+        state_ttl: float = FSM_STATE_TTL_SECONDS
+    ):
+        self.path = path
+        self.cache_size = cache_size
+        self.state_ttl = state_ttl
+        # ключ → (state, data, updated_at)
+        self._cache: OrderedDict[str, Tuple[Optional[str], Dict[str, Any], float]] = OrderedDict()
+        self._last_cleanup = 0.0
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS fsm (
+                key TEXT PRIMARY KEY,
+                state TEXT,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    # ------------------------------------------------------------------------
+    # BaseStorage
+    # ------------------------------------------------------------------------
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        _, data, _ = self._load(self._key(key))
+        self._save(self._key(key), state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _, _ = self._load(self._key(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        state, _, _ = self._load(self._key(key))
+        self._save(self._key(key), state, dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data, _ = self._load(self._key(key))
+        return data.copy()
+
+    async def close(self) -> None:
+        self._cache.clear()
+        self._conn.close()
+
+    # ------------------------------------------------------------------------
+    # Кэш и SQLite
+    # ------------------------------------------------------------------------
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return ':'.join(str(part or '') for part in (
+            key.bot_id, key.chat_id, key.user_id,
+            key.thread_id, key.business_connection_id, key.destiny
+        ))
+
+    def _expired(self, updated_at: float) -> bool:
+        return time.time() - updated_at > self.state_ttl
+
+    def _load(self, key: str) -> Tuple[Optional[str], Dict[str, Any], float]:
+        """Состояние и данные ключа: из кэша, иначе из SQLite"""
+        entry = self._cache.get(key)
+        if entry is not None:
+            self._cache.move_to_end(key)
+        else:
+            row = self._conn.execute(
+                "SELECT state, data, updated_at FROM fsm WHERE key = ?", (key,)
+            ).fetchone()
+            entry = (row[0], json.loads(row[1]), row[2]) if row else (None, {}, time.time())
+            self._remember(key, entry)
+
+        if self._expired(entry[2]):
+            return None, {}, time.time()
+        return entry
+
+    def _save(self, key: str, state: Optional[str], data: Dict[str, Any]):
+        """Сквозная запись: кэш + SQLite (пустое состояние удаляется)"""
+        now = time.time()
+        self._remember(key, (state, data, now))
+
+        with self._conn:
+            if state is None and not data:
+                self._conn.execute("DELETE FROM fsm WHERE key = ?", (key,))
+            else:
+                self._conn.execute(
+                    "INSERT INTO fsm (key, state, data, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET state = excluded.state, "
+                    "data = excluded.data, updated_at = excluded.updated_at",
+                    (key, state, json.dumps(data, ensure_ascii=False), now)
+                )
+
+        if now - self._last_cleanup > CLEANUP_INTERVAL_SECONDS:
+            self.cleanup()
+
+    def _remember(self, key: str, entry: Tuple):
+        if self.cache_size <= 0:
+            return
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def cleanup(self) -> int:
+        """
+        Удалить брошенные состояния (без изменений дольше state_ttl)
+
+        Returns:
+            int: Сколько ключей удалено
+        """
+        self._last_cleanup = time.time()
+        cutoff = self._last_cleanup - self.state_ttl
+
+        with self._conn:
+            deleted = self._conn.execute("DELETE FROM fsm WHERE updated_at < ?", (cutoff,)).rowcount
+
+        for key in [key for key, entry in self._cache.items() if entry[2] < cutoff]:
+            del self._cache[key]
+
+        if deleted:
+            print(f"🧹 FSM: удалено брошенных состояний: {deleted}")
+        return deleted
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Как использовать:
+
+В run.py (по умолчанию FSM_STORAGE=sqlite):
+    from app.fsm_storage import SQLiteStorage
+
+    dp = Dispatcher(storage=SQLiteStorage())
+
+Вернуть хранение в памяти: FSM_STORAGE=memory в .env.
+
+Теперь черновик рассылки (BroadcastStates + message_id/chat_id)
+не теряется при перезапуске бота между превью и подтверждением.
+Данные состояния должны сериализоваться в JSON.
+"""
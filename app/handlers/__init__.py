@@ -6,6 +6,7 @@ Handlers модуль - обработчики команд и сообщени
 from aiogram import Router
 
 from app.handlers import user, admin
+from app.middlewares import ApiScopeMiddleware
 
 
 # Главный роутер, объединяющий все обработчики
@@ -15,5 +16,9 @@ router = Router()
 router.include_router(user.router)
 router.include_router(admin.router)
 
+# Учёт вызовов Google Sheets по обработчикам (действует и на вложенные роутеры)
+router.message.middleware(ApiScopeMiddleware())
+router.callback_query.middleware(ApiScopeMiddleware())
+
 
 __all__ = ['router']
@@ -1,15 +1,23 @@
-import asyncio
+from typing import Optional
+
 from aiogram import F, Router
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
-from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
 
-import app.keyboards as kb
 from app.states import BroadcastStates
-from app.database import get_all_users, get_vote_stats
+from app.database.aio import run_sync, get_all_users, get_vote_stats
+from app.database.membership import membership
 from app.filters import IsAdmin
 from app.config import ADMIN_ID
+from app.services.broadcast_jobs import (
+    broadcast_jobs, job_keyboard, KIND_COPY, KIND_VOTE, STATUS_TITLES
+)
+from app.utils.api_stats import api_stats, format_report
+from app.utils.sheets_quota import sheets_quota
+from app.utils.loop_monitor import loop_monitor
+from app.utils.job_stats import job_stats, format_report as format_jobs_report
+from app.utils.leader_lease import leader_lease
 
 
 router = Router()
@@ -138,85 +146,39 @@ async def callback_broadcast_confirm(callback: CallbackQuery, state: FSMContext)
         await state.clear()
         return
     
-    await callback.message.edit_text("🚀 Начинаю рассылку...")
     await callback.answer()
     
     # Получаем всех пользователей
-    from app.database import get_all_users
-    users = get_all_users()
+    users = await get_all_users()
     
     if not users:
         await callback.message.edit_text("❌ Не найдено пользователей для рассылки.")
         await state.clear()
         return
-    
-    total = len(users)
-    success = 0
-    blocked = 0
-    errors = 0
-    
-    # РАССЫЛКА через copy_message
-    for i, user in enumerate(users, 1):
-        try:
-            user_id = user['user_id']
-            
-            # Копируем сообщение целиком (с фото/видео/документами)
-            await callback.bot.copy_message(
-                chat_id=user_id,
-                from_chat_id=chat_id,
-                message_id=message_id
-            )
-            success += 1
-            
-            # Обновление прогресса каждые 50 пользователей
-            if i % 50 == 0:
-                try:
-                    await callback.message.edit_text(
-                        f"🚀 **Рассылка в процессе...**\n\n"
-                        f"📊 Прогресс: {i}/{total} ({int(i/total*100)}%)\n"
-                        f"✅ Отправлено: {success}\n"
-                        f"🚫 Заблокировали: {blocked}\n"
-                        f"⚠️ Ошибки: {errors}",
-                        parse_mode="Markdown"
-                    )
-                except:
-                    pass
-            
-            # Задержка против бана
-            await asyncio.sleep(0.10)
-            
-        except TelegramForbiddenError:
-            blocked += 1
-            print(f"🚫 Пользователь {user_id} заблокировал бота")
-        except TelegramBadRequest as e:
-            errors += 1
-            # 👇 ДОБАВЬ ДЕТАЛЬНОЕ ЛОГИРОВАНИЕ!
-            print(f"⚠️ BadRequest для {user_id}: {e}")
-            print(f"   from_chat_id={chat_id}, message_id={message_id}")
-        except Exception as e:
-            errors += 1
-            # 👇 ЛОГИРУЕМ ТИП ОШИБКИ!
-            print(f"❌ Неизвестная ошибка {user_id}: {type(e).__name__}: {e}")
-    
-    # Финальный отчёт
-    await callback.message.edit_text(
-        f"✅ **Рассылка завершена!**\n\n"
-        f"📊 **Статистика:**\n"
-        f"• Всего пользователей: {total}\n"
-        f"• ✅ Успешно: {success}\n"
-        f"• 🚫 Заблокировали бота: {blocked}\n"
-        f"• ⚠️ Ошибки: {errors}\n\n"
-        f"📈 Успешность: {int(success/total*100) if total > 0 else 0}%",
-        parse_mode="Markdown"
+
+    # Рассылка идёт в фоне как сохраняемое задание (copy_message),
+    # прогресс показывается в этом же сообщении
+    job_id = broadcast_jobs.submit(
+        KIND_COPY,
+        {'from_chat_id': chat_id, 'message_id': message_id},
+        (user['user_id'] for user in users if user.get('user_id')),
+        chat_id=callback.message.chat.id,
+        progress_message_id=callback.message.message_id
     )
 
+    # job.total - получатели без дублей и пустых user_id
+    job = broadcast_jobs.store.get_job(job_id)
+    await callback.message.edit_text(
+        f"🚀 Рассылка #{job_id} запущена для {job.total} пользователей...",
+        reply_markup=job_keyboard(job)
+    )
     await state.clear()
 
 
 @router.message(Command("vote_stats"), IsAdmin())
 async def cmd_vote_stats(message: Message):
     """Показать статистику голосования (только для админа)"""
-    stats = get_vote_stats()
+    stats = await get_vote_stats()
 
     text = (
         "📊 <b>Статистика голосования (Декабрь 2025)</b>\n\n"
@@ -229,6 +191,8 @@ async def cmd_vote_stats(message: Message):
         f"📈 <b>Всего проголосовало:</b> {stats['total']}\n"
         f"⏳ <b>Не проголосовали:</b> {stats['not_voted']}"
     )
+    if stats.get('pending'):
+        text += f"\n💾 <i>Ещё не записано в таблицу: {stats['pending']}</i>"
 
     await message.answer(text, parse_mode="HTML")
 
@@ -268,62 +232,174 @@ async def cmd_send_vote(message: Message):
 
 🌿 Я рядом."""
 
-    await message.answer("🚀 Начинаю рассылку голосования...")
-
     # Получаем всех пользователей
-    users = get_all_users()
+    users = await get_all_users()
 
     if not users:
         await message.answer("❌ Не найдено пользователей для рассылки.")
         return
 
-    total = len(users)
-    success = 0
-    blocked = 0
-    errors = 0
-
-    # РАССЫЛКА
-    for i, user in enumerate(users, 1):
-        try:
-            user_id = user['user_id']
-
-            await message.bot.send_message(
-                chat_id=user_id,
-                text=vote_text,
-                reply_markup=kb.vote_menu
-            )
-            success += 1
-
-            # Обновление прогресса каждые 50 пользователей
-            if i % 50 == 0:
-                try:
-                    await message.answer(
-                        f"🚀 Прогресс: {i}/{total} ({int(i/total*100)}%)\n"
-                        f"✅ Отправлено: {success}\n"
-                        f"🚫 Заблокировали: {blocked}\n"
-                        f"⚠️ Ошибки: {errors}"
-                    )
-                except:
-                    pass
-
-            # Задержка против бана
-            await asyncio.sleep(0.10)
-
-        except TelegramForbiddenError:
-            blocked += 1
-            print(f"🚫 Пользователь {user_id} заблокировал бота")
-        except Exception as e:
-            errors += 1
-            print(f"❌ Ошибка для {user_id}: {type(e).__name__}: {e}")
-
-    # Финальный отчёт
-    await message.answer(
-        f"✅ <b>Рассылка завершена!</b>\n\n"
-        f"📊 <b>Статистика:</b>\n"
-        f"• Всего пользователей: {total}\n"
-        f"• ✅ Успешно: {success}\n"
-        f"• 🚫 Заблокировали бота: {blocked}\n"
-        f"• ⚠️ Ошибки: {errors}\n\n"
-        f"📈 Успешность: {int(success/total*100) if total > 0 else 0}%",
-        parse_mode="HTML"
+    progress_message = await message.answer("🚀 Начинаю рассылку голосования...")
+
+    job_id = broadcast_jobs.submit(
+        KIND_VOTE,
+        {'text': vote_text},
+        (user['user_id'] for user in users if user.get('user_id')),
+        chat_id=message.chat.id,
+        progress_message_id=progress_message.message_id
     )
+
+    job = broadcast_jobs.store.get_job(job_id)
+    await progress_message.edit_text(
+        f"🚀 Рассылка голосования #{job_id} запущена для {job.total} пользователей...",
+        reply_markup=job_keyboard(job)
+    )
+
+
+@router.message(Command("broadcasts"), IsAdmin())
+async def cmd_broadcasts(message: Message):
+    """Последние рассылки и их прогресс (только для админа)"""
+    jobs = broadcast_jobs.store.list_jobs(limit=10)
+
+    if not jobs:
+        await message.answer("📭 Рассылок ещё не было.")
+        return
+
+    lines = ["📢 <b>Последние рассылки</b>\n"]
+    for job in jobs:
+        counts = broadcast_jobs.store.counts(job.id)
+        processed = job.total - counts['pending']
+        lines.append(
+            f"#{job.id} {job.created_at} — {STATUS_TITLES[job.status]}, "
+            f"{processed}/{job.total} (✅ {counts['sent']}, 🚫 {counts['blocked']}, ⚠️ {counts['error']})"
+        )
+    lines.append("\nУправление: /broadcast_pause N, /broadcast_resume N, /broadcast_cancel N")
+
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+def _job_id_from_args(text: Optional[str]) -> Optional[int]:
+    """Номер задания из текста команды (/broadcast_pause 12)"""
+    parts = (text or '').split()
+    if len(parts) < 2 or not parts[1].lstrip('#').isdigit():
+        return None
+    return int(parts[1].lstrip('#'))
+
+
+# действие → (метод менеджера, текст при успехе, глагол для ошибки)
+JOB_ACTIONS = {
+    'pause': (broadcast_jobs.pause, "⏸ Рассылка #{} поставлена на паузу.", "поставить на паузу"),
+    'resume': (broadcast_jobs.resume, "▶️ Рассылка #{} продолжена.", "продолжить"),
+    'cancel': (broadcast_jobs.cancel, "❌ Рассылка #{} отменена.", "отменить"),
+}
+
+
+@router.message(Command("broadcast_pause", "broadcast_resume", "broadcast_cancel"), IsAdmin())
+async def cmd_broadcast_job_action(message: Message):
+    """Пауза / продолжение / отмена рассылки по номеру (только для админа)"""
+    action = message.text.split()[0].lstrip('/').split('@')[0].removeprefix('broadcast_')
+    job_id = _job_id_from_args(message.text)
+    if job_id is None:
+        await message.answer(f"Укажи номер рассылки, например: /broadcast_{action} 1")
+        return
+
+    handler, done_text, verb = JOB_ACTIONS[action]
+    if handler(job_id):
+        await message.answer(done_text.format(job_id))
+    else:
+        await message.answer(f"⚠️ Рассылку #{job_id} нельзя {verb} (нет такой или уже завершена).")
+
+
+@router.callback_query(F.data.regexp(r'^bjob_(pause|resume|cancel):\d+$'), IsAdmin())
+async def callback_broadcast_job_action(callback: CallbackQuery):
+    """Кнопки под сообщением прогресса рассылки"""
+    action, job_id = callback.data.removeprefix('bjob_').split(':')
+    handler, done_text, _ = JOB_ACTIONS[action]
+
+    if handler(int(job_id)):
+        await callback.answer(done_text.format(job_id))
+    else:
+        await callback.answer("⚠️ Действие недоступно для этой рассылки", show_alert=True)
+
+
+@router.message(Command("loop_stats"), IsAdmin())
+async def cmd_loop_stats(message: Message):
+    """Показать задержки event loop (только для админа). /loop_stats reset - сбросить"""
+    if message.text and message.text.split()[-1] == 'reset':
+        loop_monitor.reset()
+        await message.answer("🔄 Статистика event loop сброшена.")
+        return
+
+    stats = loop_monitor.stats()
+
+    text = (
+        "⏱ <b>Задержки event loop</b>\n\n"
+        f"• Замеров: {stats['samples']}\n"
+        f"• Среднее: {stats['avg_ms']:.1f} мс\n"
+        f"• p95: {stats['p95_ms']:.1f} мс\n"
+        f"• Максимум: {stats['max_ms']:.1f} мс\n"
+        f"• Блокировок выше порога: {stats['blocked']}"
+    )
+
+    await message.answer(text, parse_mode="HTML")
+
+
+@router.message(Command("api_stats"), IsAdmin())
+async def cmd_api_stats(message: Message):
+    """Показать расход Google Sheets API (только для админа). /api_stats reset - сбросить"""
+    if message.text and message.text.split()[-1] == 'reset':
+        api_stats.reset()
+        await message.answer("🔄 Статистика вызовов API сброшена.")
+        return
+
+    quota = sheets_quota.stats()
+    lines = format_report()
+    lines.append(
+        f"\n<b>Квота</b>: {quota['tokens']:.1f}/{quota['capacity']} токенов, "
+        f"{quota['per_minute']:.0f}/мин, ответов 429: {quota['throttled']}"
+    )
+    for lane, stats in quota['lanes'].items():
+        lines.append(
+            f"• {lane}: {stats['calls']} вызовов, ждали {stats['waited']} "
+            f"(всего {stats['wait_seconds']:.1f} с, максимум {stats['max_wait']:.1f} с)"
+        )
+
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(Command("jobs"), IsAdmin())
+async def cmd_jobs(message: Message):
+    """Показать статистику фоновых задач (только для админа). /jobs reset - сбросить"""
+    if message.text and message.text.split()[-1] == 'reset':
+        job_stats.reset()
+        await message.answer("🔄 Статистика задач сброшена.")
+        return
+
+    lines = format_jobs_report()
+    if leader_lease.is_leader:
+        lines.append(f"\n👑 Этот процесс ведущий ({leader_lease.owner})")
+    else:
+        holder = leader_lease.holder()
+        lines.append(
+            f"\n💤 Этот процесс в резерве, ведущий: {holder['owner'] if holder else 'нет'}"
+        )
+
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(Command("migrate_members"), IsAdmin())
+async def cmd_migrate_members(message: Message):
+    """Разовая миграция списков: лист members + перенос config D2/E2/F2 (только для админа)"""
+    await message.answer("🚚 Переношу списки в лист members...")
+    try:
+        added = await run_sync(membership.migrate)
+    except Exception as e:
+        print(f"❌ Ошибка миграции списков: {e}")
+        await message.answer(f"❌ Миграция не выполнена: {e}")
+        return
+
+    if added:
+        lines = [f"• {list_name}: {count}" for list_name, count in added.items()]
+        await message.answer("✅ Списки перенесены, ячейки config очищены:\n" + "\n".join(lines))
+    else:
+        await message.answer("✅ Лист members на месте, переносить нечего.")
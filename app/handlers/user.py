@@ -10,13 +10,11 @@ from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
 import app.keyboards as kb
 import app.texts as txt
 
-from app.database import (
+from app.database.aio import (
     get_user,
-    add_user,
-    get_user_privileges,
     get_links,
-    is_temporarily_vip_user,
-    migrate_single_user,
+    load_start_context,
+    prepare_start,
     sync_user_subscription,
     get_subscription_status,
     get_all_users,
@@ -39,22 +37,14 @@ async def cmd_start(message: Message):
         
         user = message.from_user
         
-        if is_temporarily_vip_user(user.username):
-            if migrate_single_user(user.username, user.id):
-                print(f"✅ VIP пользователь {user.username} мигрирован.")
-            if not get_user(user.id):
-                add_user(user.id, user.username, user.first_name)
-        else:
-            if not get_user(user.id):
-                add_user(user.id, user.username, user.first_name)
-        
+        # Пользователь, привилегии и ссылки - одним пакетным чтением (или из кэша)
+        context = await prepare_start(user.id, user.username, user.first_name)
         print("✅ Пользователь добавлен/проверен в БД")
         
-        is_vip, is_diamond = get_user_privileges(user.id)
+        is_vip, is_diamond = context.is_vip, context.is_diamond
         print(f"✅ Привилегии: vip={is_vip}, diamond={is_diamond}")
         
-        main_link, vip_link, diamond_link = get_links()
-        print(f"✅ Ссылки получены")
+        main_link, vip_link, diamond_link = context.links.main, context.links.vip, context.links.diamond
         
         if is_vip and is_diamond:
             text = '<b>Ты в Тихой Комнате.</b>\nЗдесь можно не спешить.\nВозвращайся в любой момент в ту Комнату, что откликается сейчас.\n\nВсё уже настроено и ждёт тебя.'
@@ -95,7 +85,7 @@ async def callback_room_entrance(callback: CallbackQuery):
     user_id = callback.from_user.id
     
     # Получаем данные пользователя
-    user = get_user(user_id)
+    user = await get_user(user_id)
     if not user:
         await callback.answer("❌ Ошибка: пользователь не найден", show_alert=True)
         return
@@ -109,7 +99,7 @@ async def callback_room_entrance(callback: CallbackQuery):
         return
     
     # Получаем ссылку для Diamond комнаты
-    _, _, diamond_link = get_links()
+    _, _, diamond_link = await get_links()
     
     text = txt.get_room_entrance_text(diamond_link)
     menu = kb.get_diamond_room_entrance_menu(diamond_link)
@@ -147,8 +137,9 @@ async def back_to_main(callback: CallbackQuery):
     await callback.answer(txt.NOTIFY_BACK)
     
     user = callback.from_user
-    is_vip, is_diamond = get_user_privileges(user.id)
-    main_link, vip_link, diamond_link = get_links()
+    context = await load_start_context(user.id)
+    is_vip, is_diamond = context.is_vip, context.is_diamond
+    main_link, vip_link, diamond_link = context.links.main, context.links.vip, context.links.diamond
     
     if is_vip and is_diamond:
         text = f'<b>Ты в Тихой Комнате.</b>\nЗдесь можно не спешить.\nВозвращайся в любой момент в ту Комнату, что откликается сейчас.\n\nВсё уже настроено и ждёт тебя.'
@@ -188,7 +179,7 @@ async def check_subscription(callback: CallbackQuery):
     
     user_id = callback.from_user.id
     
-    sub_info = get_subscription_status(user_id)
+    sub_info = await get_subscription_status(user_id)
     
     if sub_info['status'] == 'active':
         # ✅ Подписка активна
@@ -242,7 +233,7 @@ async def verify_payment(callback: CallbackQuery):
     # 3. Делаем синхронизацию с таблицей Тильды
     user_id = callback.from_user.id
     username = callback.from_user.username
-    success, message, end_date = sync_user_subscription(user_id, username)
+    success, message, end_date = await sync_user_subscription(user_id, username)
     
     # 4. Формируем текст результата
     if success:
@@ -273,7 +264,7 @@ async def handle_vote(callback: CallbackQuery):
     vote_value = callback.data.split('_')[1]  # Получаем '1', '2' или '3'
 
     # Сохраняем голос в БД
-    success = save_vote(user_id, vote_value)
+    success = await save_vote(user_id, vote_value)
 
     if success:
         await callback.answer()
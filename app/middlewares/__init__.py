@@ -0,0 +1,8 @@
+"""
+Middleware бота
+"""
+
+from app.middlewares.api_scope import ApiScopeMiddleware
+from app.middlewares.concurrency import ConcurrencyLimitMiddleware
+
+__all__ = ['ApiScopeMiddleware', 'ConcurrencyLimitMiddleware']
@@ -0,0 +1,49 @@
+"""
+Middleware учёта вызовов API по обработчикам
+Все вызовы Google Sheets внутри обработчика попадают в статистику под его именем
+"""
+
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.utils.api_stats import api_scope
+
+
+class ApiScopeMiddleware(BaseMiddleware):
+    """
+    Inner-middleware: выставляет api_scope = "handler:<имя функции>"
+
+    Регистрируется на главном роутере и действует на все вложенные роутеры.
+    Scope копируется в потоки run_sync вместе с контекстом, поэтому вызовы
+    gspread из executor тоже учитываются за обработчиком.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get('handler')
+        name = handler_object.callback.__name__ if handler_object else type(event).__name__
+
+        token = api_scope.set(f"handler:{name}")
+        try:
+            return await handler(event, data)
+        finally:
+            api_scope.reset(token)
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Подключение (app/handlers/__init__.py):
+    router.message.middleware(ApiScopeMiddleware())
+    router.callback_query.middleware(ApiScopeMiddleware())
+
+Отчёт по обработчикам: /api_stats (см. app/utils/api_stats.py).
+"""
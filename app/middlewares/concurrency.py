@@ -0,0 +1,86 @@
+"""
+Ограничение числа одновременно обрабатываемых апдейтов
+В режиме webhook aiogram отвечает Telegram сразу и обрабатывает апдейт в фоне -
+без ограничения всплеск (рассылка голосования) превратится в тысячи задач
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    """
+    Outer-middleware на dp.update: не больше limit апдейтов в обработке,
+    остальные ждут своей очереди (семафор)
+
+    Атрибуты:
+        limit: Максимум апдейтов в обработке одновременно
+        in_flight: Апдейтов в обработке сейчас
+        waiting: Апдейтов в очереди сейчас
+        peak: Наибольшее число апдейтов в обработке
+        handled: Обработано апдейтов всего
+        max_wait: Наибольшее ожидание в очереди (сек)
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak = 0
+        self.handled = 0
+        self.max_wait = 0.0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if self._semaphore is None:
+            # Создаём в работающем event loop
+            self._semaphore = asyncio.Semaphore(self.limit)
+
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.max_wait = max(self.max_wait, time.perf_counter() - started)
+
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            return await handler(event, data)
+        finally:
+            self.in_flight -= 1
+            self.handled += 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            'limit': self.limit,
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'peak': self.peak,
+            'handled': self.handled,
+            'max_wait_ms': self.max_wait * 1000,
+        }
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Подключение (app/webhook.py):
+    dp.update.outer_middleware(ConcurrencyLimitMiddleware(UPDATE_CONCURRENCY_LIMIT))
+
+В режиме polling тот же лимит задаётся через
+dp.start_polling(bot, tasks_concurrency_limit=UPDATE_CONCURRENCY_LIMIT).
+"""
@@ -5,6 +5,9 @@ Services модуль - бизнес-логика приложения
 
 # Subscription service
 from app.services.subscription import (
+    classify_subscriptions,
+    scan_subscriptions,
+    expire_subscriptions,
     check_and_expire_subscriptions,
     check_expiring_soon_subscriptions,
     check_expired_subscriptions_for_reminders,
@@ -13,7 +16,11 @@ from app.services.subscription import (
 
 # Notifications service
 from app.services.notifications import (
+    NotificationJob,
+    dispatch_notifications,
     notify_payment_processed,
+    notify_payments_processed,
+    notify_subscription_reminders,
     notify_multiple_users,
     notify_expiring_3_days,
     notify_expiring_today,
@@ -24,13 +31,20 @@ from app.services.notifications import (
 
 __all__ = [
     # Subscription
+    'classify_subscriptions',
+    'scan_subscriptions',
+    'expire_subscriptions',
     'check_and_expire_subscriptions',
     'check_expiring_soon_subscriptions',
     'check_expired_subscriptions_for_reminders',
     'get_subscription_info_text',
 
     # Notifications
+    'NotificationJob',
+    'dispatch_notifications',
     'notify_payment_processed',
+    'notify_payments_processed',
+    'notify_subscription_reminders',
     'notify_multiple_users',
     'notify_expiring_3_days',
     'notify_expiring_today',
@@ -0,0 +1,230 @@
+"""
+Движок массовых рассылок
+Параллельная отправка с адаптивной скоростью, прогрессом и оценкой времени
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Iterable, Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+from app.config import (
+    BROADCAST_DELAY_SECONDS,
+    BROADCAST_CONCURRENCY,
+    BROADCAST_PROGRESS_UPDATE_INTERVAL,
+    TELEGRAM_MAX_MESSAGES_PER_SECOND
+)
+from app.utils.rate_limit import AdaptiveRateLimiter, telegram_rate_limiter
+
+
+# Сколько раз повторять сообщение одному пользователю после RetryAfter
+MAX_RETRIES_PER_USER = 5
+
+
+@dataclass
+class BroadcastStats:
+    """
+    Статистика рассылки
+
+    Атрибуты:
+        total: Всего получателей
+        processed: Обработано (успех + блок + ошибки)
+        success: Доставлено
+        blocked: Заблокировали бота
+        errors: Прочие ошибки
+        throttled: Сколько раз получили RetryAfter
+        rate: Текущая целевая скорость (сообщений/сек)
+    """
+    total: int
+    processed: int = 0
+    success: int = 0
+    blocked: int = 0
+    errors: int = 0
+    throttled: int = 0
+    rate: float = 0.0
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self) -> float:
+        """Сколько секунд идёт рассылка"""
+        return time.monotonic() - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """Фактическая скорость (сообщений/сек)"""
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        """Оценка оставшегося времени (сек) или None, пока скорость неизвестна"""
+        if self.throughput <= 0:
+            return None
+        return (self.total - self.processed) / self.throughput
+
+    @property
+    def percent(self) -> int:
+        return int(self.processed / self.total * 100) if self.total > 0 else 0
+
+    @property
+    def success_percent(self) -> int:
+        return int(self.success / self.total * 100) if self.total > 0 else 0
+
+
+def format_eta(seconds: Optional[float]) -> str:
+    """
+    Оценка времени в человекочитаемом виде
+
+    Examples:
+        >>> format_eta(75)
+        '1 мин 15 с'
+        >>> format_eta(None)
+        '—'
+    """
+    if seconds is None:
+        return '—'
+    seconds = int(seconds)
+    if seconds >= 60:
+        return f"{seconds // 60} мин {seconds % 60} с"
+    return f"{seconds} с"
+
+
+class BroadcastEngine:
+    """
+    Рассылка по списку user_id
+
+    - concurrency воркеров отправляют сообщения параллельно
+    - скорость задаёт AdaptiveRateLimiter: старт с 1/BROADCAST_DELAY_SECONDS,
+      разгон до max_rate, при TelegramRetryAfter - пауза всей рассылки и замедление
+    - дополнительно каждая отправка учитывается в общем telegram_rate_limiter,
+      чтобы рассылка и уведомления вместе не превышали лимит Telegram
+    - каждые progress_every получателей вызывается on_progress(stats)
+    - после каждого получателя вызывается on_result(user_id, status),
+      status: 'sent' | 'blocked' | 'error' (для сохранения прогресса)
+
+    Атрибуты:
+        send: Корутина send(user_id), отправляющая сообщение одному пользователю
+    """
+
+    def __init__(
+        self,
+        send: Callable[[int], Awaitable],
+        on_progress: Optional[Callable[[BroadcastStats], Awaitable]] = None,
+        on_result: Optional[Callable[[int, str], None]] = None,
+        concurrency: int = BROADCAST_CONCURRENCY,
+        initial_rate: float = 1 / BROADCAST_DELAY_SECONDS,
+        max_rate: float = TELEGRAM_MAX_MESSAGES_PER_SECOND,
+        progress_every: int = BROADCAST_PROGRESS_UPDATE_INTERVAL
+    ):
+        self.send = send
+        self.on_progress = on_progress
+        self.on_result = on_result
+        self.concurrency = concurrency
+        self.progress_every = progress_every
+        self.limiter = AdaptiveRateLimiter(rate=initial_rate, max_rate=max_rate)
+
+    async def run(self, user_ids: Iterable[int]) -> BroadcastStats:
+        """
+        Разослать сообщение всем user_ids
+
+        Returns:
+            BroadcastStats: Итоговая статистика
+        """
+        user_ids = list(user_ids)
+        stats = BroadcastStats(total=len(user_ids), rate=self.limiter.rate)
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for user_id in user_ids:
+            queue.put_nowait((user_id, 0))
+
+        async def worker():
+            while True:
+                try:
+                    user_id, attempt = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                status = await self._send_one(user_id, attempt, stats, queue)
+                if status is None:
+                    continue
+
+                if self.on_result:
+                    self.on_result(user_id, status)
+
+                stats.processed += 1
+                stats.rate = self.limiter.rate
+                if self.on_progress and stats.processed % self.progress_every == 0:
+                    await self._report(stats)
+
+        workers = max(1, min(self.concurrency, len(user_ids)))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        return stats
+
+    async def _send_one(self, user_id: int, attempt: int, stats: BroadcastStats, queue) -> Optional[str]:
+        """
+        Отправить одному пользователю
+
+        Returns:
+            str: 'sent' | 'blocked' | 'error', None - сообщение поставлено в очередь повторно
+        """
+        await self.limiter.acquire()
+        await telegram_rate_limiter.acquire()
+
+        try:
+            await self.send(user_id)
+            stats.success += 1
+            self.limiter.on_success()
+            return 'sent'
+        except TelegramRetryAfter as e:
+            stats.throttled += 1
+            self.limiter.on_retry_after(e.retry_after)
+            telegram_rate_limiter.pause(e.retry_after)
+            print(f"⏸ RetryAfter {e.retry_after} с, скорость снижена до {self.limiter.rate:.1f}/с")
+            if attempt < MAX_RETRIES_PER_USER:
+                queue.put_nowait((user_id, attempt + 1))
+                return None
+            stats.errors += 1
+        except TelegramForbiddenError:
+            stats.blocked += 1
+            print(f"🚫 Пользователь {user_id} заблокировал бота")
+            return 'blocked'
+        except TelegramBadRequest as e:
+            stats.errors += 1
+            print(f"⚠️ BadRequest для {user_id}: {e}")
+        except Exception as e:
+            stats.errors += 1
+            print(f"❌ Неизвестная ошибка {user_id}: {type(e).__name__}: {e}")
+
+        return 'error'
+
+    async def _report(self, stats: BroadcastStats):
+        try:
+            await self.on_progress(stats)
+        except Exception:
+            pass
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Как использовать:
+
+    from app.services.broadcast import BroadcastEngine
+
+    async def send(user_id):
+        await bot.copy_message(chat_id=user_id, from_chat_id=chat_id, message_id=message_id)
+
+    async def on_progress(stats):
+        await progress_message.edit_text(
+            f"{stats.processed}/{stats.total}, {stats.throughput:.1f}/с, "
+            f"осталось {format_eta(stats.eta_seconds)}"
+        )
+
+    stats = await BroadcastEngine(send, on_progress).run(user_ids)
+
+Раньше рассылка шла последовательно с фиксированной паузой 0.10 с (< 10 сообщений/с).
+Теперь скорость стартует с 1/BROADCAST_DELAY_SECONDS и подстраивается под ответы Telegram.
+"""
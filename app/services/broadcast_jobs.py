@@ -0,0 +1,598 @@
+"""
+Сохраняемые задания рассылок
+Рассылка живёт в SQLite, а не в обработчике: прогресс по каждому получателю
+сохраняется пачками, после перезапуска рассылка продолжается с места остановки
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+import app.keyboards as kb
+from app.config import BROADCAST_JOBS_DB, BROADCAST_CHECKPOINT_INTERVAL
+from app.services.broadcast import BroadcastEngine, BroadcastStats, format_eta
+from app.utils.leader_lease import leader_lease
+
+
+# Статусы задания
+JOB_RUNNING = 'running'
+JOB_PAUSED = 'paused'
+JOB_CANCELLED = 'cancelled'
+JOB_DONE = 'done'
+
+# Виды рассылок
+KIND_COPY = 'copy'    # копия сообщения админа (payload: from_chat_id, message_id)
+KIND_VOTE = 'vote'    # голосование (payload: text), клавиатура kb.vote_menu
+
+STATUS_TITLES = {
+    JOB_RUNNING: '🚀 идёт',
+    JOB_PAUSED: '⏸ на паузе',
+    JOB_CANCELLED: '❌ отменена',
+    JOB_DONE: '✅ завершена',
+}
+
+
+@dataclass
+class BroadcastJob:
+    """
+    Задание рассылки
+
+    Атрибуты:
+        id: Номер задания
+        kind: Вид рассылки (KIND_COPY / KIND_VOTE)
+        payload: Что рассылать (зависит от kind)
+        status: JOB_RUNNING / JOB_PAUSED / JOB_CANCELLED / JOB_DONE
+        chat_id: Чат админа для отчётов
+        progress_message_id: Сообщение с прогрессом (редактируется)
+        total: Всего получателей
+        created_at: Когда создано
+        owner: Процесс, который сейчас выполняет задание (None - никто)
+    """
+    id: int
+    kind: str
+    payload: dict
+    status: str
+    chat_id: int
+    progress_message_id: Optional[int]
+    total: int
+    created_at: str
+    owner: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row) -> 'BroadcastJob':
+        return cls(
+            id=row['id'],
+            kind=row['kind'],
+            payload=json.loads(row['payload']),
+            status=row['status'],
+            chat_id=row['chat_id'],
+            progress_message_id=row['progress_message_id'],
+            total=row['total'],
+            created_at=row['created_at'],
+            owner=row['owner']
+        )
+
+
+# ============================================================================
+# ХРАНИЛИЩЕ
+# ============================================================================
+
+class BroadcastJobStore:
+    """
+    Задания и статусы получателей в SQLite
+
+    Статус получателя: 'pending' → 'sent' | 'blocked' | 'error'.
+    Используется только из event loop (одно соединение, короткие транзакции).
+    Файл общий для всех процессов бота: задание выполняет тот процесс,
+    за которым оно закреплено (колонка owner, см. claim).
+
+    Атрибуты:
+        path: Путь к файлу базы
+    """
+
+    def __init__(self, path: str = BROADCAST_JOBS_DB):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS broadcast_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    chat_id INTEGER NOT NULL,
+                    progress_message_id INTEGER,
+                    total INTEGER NOT NULL,
+                    created_at TEXT NOT NULL,
+                    finished_at TEXT,
+                    owner TEXT
+                );
+                CREATE TABLE IF NOT EXISTS broadcast_recipients (
+                    job_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    PRIMARY KEY (job_id, user_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_recipients_status
+                    ON broadcast_recipients (job_id, status);
+            """)
+            columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(broadcast_jobs)')}
+            if 'owner' not in columns:
+                # База от версии без закрепления заданий за процессами
+                self._conn.execute('ALTER TABLE broadcast_jobs ADD COLUMN owner TEXT')
+        return self._conn
+
+    def create_job(
+        self,
+        kind: str,
+        payload: dict,
+        user_ids: Iterable[int],
+        chat_id: int,
+        progress_message_id: Optional[int] = None
+    ) -> int:
+        """
+        Создать задание со списком получателей
+
+        Returns:
+            int: Номер задания
+        """
+        user_ids = list(dict.fromkeys(int(user_id) for user_id in user_ids))
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO broadcast_jobs (kind, payload, status, chat_id, progress_message_id, total, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, json.dumps(payload, ensure_ascii=False), JOB_RUNNING, chat_id,
+                 progress_message_id, len(user_ids), datetime.now().strftime('%d.%m.%Y %H:%M'))
+            )
+            job_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO broadcast_recipients (job_id, user_id) VALUES (?, ?)",
+                ((job_id, user_id) for user_id in user_ids)
+            )
+        return job_id
+
+    def get_job(self, job_id: int) -> Optional[BroadcastJob]:
+        row = self.conn.execute("SELECT * FROM broadcast_jobs WHERE id = ?", (job_id,)).fetchone()
+        return BroadcastJob.from_row(row) if row else None
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 10) -> List[BroadcastJob]:
+        """Последние задания (опционально - только с нужным статусом)"""
+        if status:
+            rows = self.conn.execute(
+                "SELECT * FROM broadcast_jobs WHERE status = ? ORDER BY id DESC LIMIT ?", (status, limit)
+            )
+        else:
+            rows = self.conn.execute("SELECT * FROM broadcast_jobs ORDER BY id DESC LIMIT ?", (limit,))
+        return [BroadcastJob.from_row(row) for row in rows]
+
+    def get_status(self, job_id: int) -> Optional[str]:
+        """Текущий статус задания (общий для всех процессов)"""
+        row = self.conn.execute("SELECT status FROM broadcast_jobs WHERE id = ?", (job_id,)).fetchone()
+        return row['status'] if row else None
+
+    def set_status(self, job_id: int, status: str):
+        finished_at = datetime.now().strftime('%d.%m.%Y %H:%M') if status in (JOB_DONE, JOB_CANCELLED) else None
+        with self.conn:
+            self.conn.execute(
+                "UPDATE broadcast_jobs SET status = ?, finished_at = ? WHERE id = ?",
+                (status, finished_at, job_id)
+            )
+
+    def finish(self, job_id: int) -> bool:
+        """
+        Отметить задание завершённым, если его не поставили на паузу и не отменили
+
+        Returns:
+            bool: True если статус сменился с running на done
+        """
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE broadcast_jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (JOB_DONE, datetime.now().strftime('%d.%m.%Y %H:%M'), job_id, JOB_RUNNING)
+            )
+        return cursor.rowcount == 1
+
+    def claim(self, job_id: int, owner: str, stale_owner: Optional[str] = None) -> bool:
+        """
+        Закрепить задание за процессом owner
+
+        Одно UPDATE, поэтому из двух процессов задание получит только один.
+        Забрать можно ничьё задание, своё или задание stale_owner
+        (процесс, который завершился, не освободив его).
+
+        Returns:
+            bool: True если задание теперь за owner
+        """
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE broadcast_jobs SET owner = ? WHERE id = ? AND (owner IS NULL OR owner IN (?, ?))",
+                (owner, job_id, owner, stale_owner)
+            )
+        return cursor.rowcount == 1
+
+    def release(self, job_id: int, owner: str):
+        """Открепить задание (выполнение в этом процессе остановлено)"""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE broadcast_jobs SET owner = NULL WHERE id = ? AND owner = ?", (job_id, owner)
+            )
+
+    def pending_recipients(self, job_id: int) -> List[int]:
+        """Получатели, которым ещё не отправляли"""
+        rows = self.conn.execute(
+            "SELECT user_id FROM broadcast_recipients WHERE job_id = ? AND status = 'pending'", (job_id,)
+        )
+        return [row['user_id'] for row in rows]
+
+    def save_results(self, job_id: int, results: List[tuple]):
+        """
+        Сохранить пачку результатов (checkpoint)
+
+        Args:
+            results: [(user_id, status), ...]
+        """
+        if not results:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE broadcast_recipients SET status = ? WHERE job_id = ? AND user_id = ?",
+                ((status, job_id, user_id) for user_id, status in results)
+            )
+
+    def counts(self, job_id: int) -> Dict[str, int]:
+        """Число получателей по статусам: {'pending': ..., 'sent': ..., 'blocked': ..., 'error': ...}"""
+        counts = {'pending': 0, 'sent': 0, 'blocked': 0, 'error': 0}
+        rows = self.conn.execute(
+            "SELECT status, COUNT(*) AS n FROM broadcast_recipients WHERE job_id = ? GROUP BY status", (job_id,)
+        )
+        for row in rows:
+            counts[row['status']] = row['n']
+        return counts
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+# ============================================================================
+# ВЫПОЛНЕНИЕ
+# ============================================================================
+
+def job_keyboard(job: BroadcastJob) -> Optional[InlineKeyboardMarkup]:
+    """Кнопки управления заданием (пауза / продолжить / отмена)"""
+    if job.status == JOB_RUNNING:
+        first = InlineKeyboardButton(text="⏸ Пауза", callback_data=f"bjob_pause:{job.id}")
+    elif job.status == JOB_PAUSED:
+        first = InlineKeyboardButton(text="▶️ Продолжить", callback_data=f"bjob_resume:{job.id}")
+    else:
+        return None
+
+    return InlineKeyboardMarkup(inline_keyboard=[[
+        first,
+        InlineKeyboardButton(text="❌ Отменить", callback_data=f"bjob_cancel:{job.id}")
+    ]])
+
+
+class BroadcastJobManager:
+    """
+    Запуск заданий рассылки в фоне
+
+    Каждое задание выполняется отдельной asyncio-задачей через BroadcastEngine.
+    Результаты копятся в буфере и сохраняются в базу каждые checkpoint_every
+    получателей, при обновлении прогресса, паузе и остановке бота.
+
+    Доставка "хотя бы один раз": если процесс упал между отправкой и checkpoint,
+    эти получатели (не больше checkpoint_every) получат сообщение повторно.
+
+    Статус задания общий для всех процессов: на каждом checkpoint он
+    перечитывается из базы, поэтому пауза или отмена из другого процесса
+    останавливают рассылку не позже чем через checkpoint_every получателей.
+
+    Атрибуты:
+        store: Хранилище заданий
+        checkpoint_every: Размер пачки для сохранения прогресса
+    """
+
+    def __init__(self, store: BroadcastJobStore, checkpoint_every: int = BROADCAST_CHECKPOINT_INTERVAL):
+        self.store = store
+        self.checkpoint_every = checkpoint_every
+        self.bot: Optional[Bot] = None
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._stopping: Set[int] = set()
+        self._closing = False
+
+    def bind(self, bot: Bot):
+        """Привязать бота (вызывается при старте)"""
+        self.bot = bot
+
+    def is_active(self, job_id: int) -> bool:
+        task = self._tasks.get(job_id)
+        return task is not None and not task.done()
+
+    # ------------------------------------------------------------------------
+    # Управление
+    # ------------------------------------------------------------------------
+
+    def submit(
+        self,
+        kind: str,
+        payload: dict,
+        user_ids: Iterable[int],
+        chat_id: int,
+        progress_message_id: Optional[int] = None
+    ) -> int:
+        """
+        Создать задание и сразу запустить его в фоне
+
+        Returns:
+            int: Номер задания
+        """
+        job_id = self.store.create_job(kind, payload, user_ids, chat_id, progress_message_id)
+        self._start(job_id)
+        return job_id
+
+    def pause(self, job_id: int) -> bool:
+        job = self.store.get_job(job_id)
+        if not job or job.status != JOB_RUNNING:
+            return False
+        self.store.set_status(job_id, JOB_PAUSED)
+        self._stop(job_id)
+        return True
+
+    def resume(self, job_id: int) -> bool:
+        job = self.store.get_job(job_id)
+        if not job or job.status != JOB_PAUSED:
+            return False
+        self.store.set_status(job_id, JOB_RUNNING)
+        self._start(job_id)
+        return True
+
+    def cancel(self, job_id: int) -> bool:
+        job = self.store.get_job(job_id)
+        if not job or job.status not in (JOB_RUNNING, JOB_PAUSED):
+            return False
+        self.store.set_status(job_id, JOB_CANCELLED)
+        if not self._stop(job_id):
+            # Задание на паузе - задачи нет, обновим сообщение сами
+            asyncio.create_task(self._update_message(self.store.get_job(job_id)))
+        return True
+
+    async def resume_interrupted(self):
+        """
+        Продолжить задания, прерванные остановкой или падением процесса
+
+        Только в ведущем процессе (задача планировщика recover_orphans):
+        берутся задания ничьи (процесс остановился штатно и открепил их)
+        или закреплённые за процессом, которого больше нет в leader_lease.
+        Задания живых процессов не трогаем - иначе получатели получат дубли.
+        """
+        if not leader_lease.is_leader:
+            return
+        alive = leader_lease.alive_owners()
+        for job in self.store.list_jobs(status=JOB_RUNNING, limit=100):
+            if self.is_active(job.id) or job.owner in alive:
+                continue
+            print(f"🔁 Продолжаю рассылку #{job.id} после перезапуска")
+            self._start(job.id, stale_owner=job.owner)
+
+    async def shutdown(self):
+        """
+        Остановить выполнение при выключении бота
+
+        Статус заданий не меняется (остаётся running), поэтому
+        при следующем старте они продолжатся с последнего checkpoint.
+        """
+        self._closing = True
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.store.close()
+
+    def _start(self, job_id: int, stale_owner: Optional[str] = None):
+        if self.is_active(job_id):
+            if job_id in self._stopping:
+                # Пауза и сразу "продолжить": старая задача ещё завершается -
+                # запустим заново, когда она освободит задание
+                self._tasks[job_id].add_done_callback(lambda _: self._restart(job_id))
+            return
+        if not self.store.claim(job_id, leader_lease.owner, stale_owner):
+            print(f"ℹ️ Рассылку #{job_id} выполняет другой процесс")
+            return
+        self._tasks[job_id] = asyncio.create_task(self._run(job_id))
+
+    def _restart(self, job_id: int):
+        if not self._closing and self.store.get_status(job_id) == JOB_RUNNING:
+            self._start(job_id)
+
+    def _stop(self, job_id: int) -> bool:
+        task = self._tasks.get(job_id)
+        if task is None or task.done():
+            return False
+        self._stopping.add(job_id)
+        task.cancel()
+        return True
+
+    # ------------------------------------------------------------------------
+    # Выполнение задания
+    # ------------------------------------------------------------------------
+
+    async def _run(self, job_id: int):
+        job = self.store.get_job(job_id)
+        user_ids = self.store.pending_recipients(job_id)
+        buffer: List[tuple] = []
+
+        def checkpoint():
+            self.store.save_results(job_id, buffer)
+            buffer.clear()
+
+        def checkpoint_running() -> bool:
+            """Сохранить пачку и проверить, что задание не остановили (в том числе из другого процесса)"""
+            checkpoint()
+            if job_id not in self._stopping and self.store.get_status(job_id) != JOB_RUNNING:
+                self._stop(job_id)
+            return job_id not in self._stopping
+
+        def on_result(user_id: int, status: str):
+            buffer.append((user_id, status))
+            if len(buffer) >= self.checkpoint_every:
+                checkpoint_running()
+
+        async def on_progress(stats: BroadcastStats):
+            if checkpoint_running():
+                await self._update_message(job, stats)
+
+        send = self._sender(job)
+        print(f"🚀 Рассылка #{job_id}: осталось {len(user_ids)} из {job.total}")
+
+        try:
+            stats = await BroadcastEngine(send, on_progress, on_result).run(user_ids)
+        except asyncio.CancelledError:
+            checkpoint()
+            job = self.store.get_job(job_id)
+            print(f"⏸ Рассылка #{job_id} остановлена ({job.status})")
+            if job.status != JOB_RUNNING:
+                await self._update_message(job)
+            raise
+        finally:
+            self._tasks.pop(job_id, None)
+            self._stopping.discard(job_id)
+            # Остановка/перезапуск: задание снова ничьё, его подхватит ведущий
+            self.store.release(job_id, leader_lease.owner)
+
+        checkpoint()
+        # Пауза/отмена могли прийти после последнего checkpoint - не затираем их
+        finished = self.store.finish(job_id)
+        await self._update_message(self.store.get_job(job_id), stats)
+        if finished:
+            print(f"✅ Рассылка #{job_id} завершена")
+        else:
+            print(f"⏸ Рассылка #{job_id} остановлена в конце ({self.store.get_status(job_id)})")
+
+    def _sender(self, job: BroadcastJob):
+        """Функция отправки одному получателю для вида задания"""
+        payload = job.payload
+
+        if job.kind == KIND_COPY:
+            async def send(user_id):
+                # Копируем сообщение целиком (с фото/видео/документами)
+                await self.bot.copy_message(
+                    chat_id=user_id,
+                    from_chat_id=payload['from_chat_id'],
+                    message_id=payload['message_id']
+                )
+        elif job.kind == KIND_VOTE:
+            async def send(user_id):
+                await self.bot.send_message(
+                    chat_id=user_id,
+                    text=payload['text'],
+                    reply_markup=kb.vote_menu
+                )
+        else:
+            raise ValueError(f"Неизвестный вид рассылки: {job.kind}")
+
+        return send
+
+    def progress_text(self, job: BroadcastJob, stats: Optional[BroadcastStats] = None) -> str:
+        """Текст сообщения о прогрессе / итоге задания"""
+        counts = self.store.counts(job.id)
+        processed = job.total - counts['pending']
+        percent = int(processed / job.total * 100) if job.total else 0
+
+        if job.status == JOB_DONE:
+            success_percent = int(counts['sent'] / job.total * 100) if job.total else 0
+            text = (
+                f"✅ <b>Рассылка #{job.id} завершена!</b>\n\n"
+                f"📊 <b>Статистика:</b>\n"
+                f"• Всего пользователей: {job.total}\n"
+                f"• ✅ Успешно: {counts['sent']}\n"
+                f"• 🚫 Заблокировали бота: {counts['blocked']}\n"
+                f"• ⚠️ Ошибки: {counts['error']}\n\n"
+                f"📈 Успешность: {success_percent}%"
+            )
+            if stats:
+                text += f"\n⏱ Время: {format_eta(stats.elapsed)} ({stats.throughput:.1f} сообщ/с)"
+            return text
+
+        text = (
+            f"📢 <b>Рассылка #{job.id}</b> — {STATUS_TITLES[job.status]}\n\n"
+            f"📊 Прогресс: {processed}/{job.total} ({percent}%)\n"
+            f"✅ Отправлено: {counts['sent']}\n"
+            f"🚫 Заблокировали: {counts['blocked']}\n"
+            f"⚠️ Ошибки: {counts['error']}"
+        )
+        if stats and job.status == JOB_RUNNING:
+            text += (
+                f"\n⚡ Скорость: {stats.throughput:.1f} сообщ/с\n"
+                f"⏳ Осталось: {format_eta(stats.eta_seconds)}"
+            )
+        return text
+
+    async def _update_message(self, job: BroadcastJob, stats: Optional[BroadcastStats] = None):
+        """Обновить сообщение с прогрессом у админа (или отправить новое)"""
+        text = self.progress_text(job, stats)
+        keyboard = job_keyboard(job)
+        try:
+            if job.progress_message_id:
+                await self.bot.edit_message_text(
+                    text=text,
+                    chat_id=job.chat_id,
+                    message_id=job.progress_message_id,
+                    reply_markup=keyboard
+                )
+            else:
+                await self.bot.send_message(chat_id=job.chat_id, text=text, reply_markup=keyboard)
+        except Exception as e:
+            # "message is not modified" и т.п. не должны ломать рассылку
+            print(f"⚠️ Не удалось обновить прогресс рассылки #{job.id}: {e}")
+
+
+# Глобальный менеджер заданий
+broadcast_jobs = BroadcastJobManager(BroadcastJobStore())
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Как использовать:
+
+При старте бота:
+    broadcast_jobs.bind(bot)
+    await broadcast_jobs.resume_interrupted()
+
+В обработчике (возвращается сразу, рассылка идёт в фоне):
+    job_id = broadcast_jobs.submit(
+        KIND_COPY,
+        {'from_chat_id': chat_id, 'message_id': message_id},
+        user_ids,
+        chat_id=admin_chat_id,
+        progress_message_id=progress_message.message_id
+    )
+
+Управление: broadcast_jobs.pause(job_id) / resume(job_id) / cancel(job_id),
+кнопки под сообщением прогресса и команда /broadcasts.
+
+При остановке бота:
+    await broadcast_jobs.shutdown()
+
+База - BROADCAST_JOBS_DB (data/broadcasts.db), прогресс сохраняется
+каждые BROADCAST_CHECKPOINT_INTERVAL получателей.
+"""
@@ -3,11 +3,17 @@
 Централизованная отправка всех уведомлений бота
 """
 
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
 from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from typing import List
 
 import app.texts as txt
+from app.config import NOTIFICATION_CONCURRENCY, NOTIFICATION_MAX_RETRIES
+from app.utils.rate_limit import telegram_rate_limiter
 
 
 # ============================================================================
@@ -101,6 +107,104 @@ def get_expired_7_days_keyboard():
     ])
 
 
+# Тексты и клавиатуры напоминаний по группам из scan_subscriptions()
+SUBSCRIPTION_REMINDERS = {
+    'expiring_3_days': (EXPIRING_3_DAYS_TEXT, get_expiring_3_days_keyboard),
+    'expiring_today': (EXPIRING_TODAY_TEXT, get_expiring_today_keyboard),
+    'expired_3_days': (EXPIRED_3_DAYS_TEXT, get_expired_3_days_keyboard),
+    'expired_7_days': (EXPIRED_7_DAYS_TEXT, get_expired_7_days_keyboard),
+}
+
+
+# ============================================================================
+# ДИСПЕТЧЕР МАССОВЫХ УВЕДОМЛЕНИЙ
+# ============================================================================
+
+@dataclass
+class NotificationJob:
+    """
+    Одно уведомление для диспетчера
+
+    Атрибуты:
+        user_id: Кому отправить
+        text: Текст сообщения
+        reply_markup: Клавиатура (опционально)
+    """
+    user_id: int
+    text: str
+    reply_markup: Optional[InlineKeyboardMarkup] = None
+
+
+async def dispatch_notifications(
+    bot: Bot,
+    jobs: List[NotificationJob],
+    concurrency: int = NOTIFICATION_CONCURRENCY,
+    max_retries: int = NOTIFICATION_MAX_RETRIES
+) -> Dict[str, int]:
+    """
+    Отправить пачку уведомлений параллельно под общим лимитом Telegram
+
+    - concurrency воркеров забирают задания из очереди
+    - каждая отправка берёт токен из telegram_rate_limiter (~30 сообщений/сек)
+    - TelegramRetryAfter ставит на паузу весь лимитер, задание повторяется
+
+    Args:
+        bot: Экземпляр бота
+        jobs: Список уведомлений
+        concurrency: Число параллельных отправок
+        max_retries: Сколько раз повторять после RetryAfter
+
+    Returns:
+        dict: {'success': n, 'blocked': n, 'failed': n, 'retried': n}
+    """
+    counts = {'success': 0, 'blocked': 0, 'failed': 0, 'retried': 0}
+    if not jobs:
+        return counts
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait((job, 0))
+
+    async def worker():
+        while True:
+            try:
+                job, attempt = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            await telegram_rate_limiter.acquire()
+            try:
+                await bot.send_message(
+                    chat_id=job.user_id,
+                    text=job.text,
+                    reply_markup=job.reply_markup
+                )
+                counts['success'] += 1
+            except TelegramRetryAfter as e:
+                telegram_rate_limiter.pause(e.retry_after)
+                if attempt < max_retries:
+                    counts['retried'] += 1
+                    queue.put_nowait((job, attempt + 1))
+                else:
+                    counts['failed'] += 1
+                    print(f"❌ Лимит Telegram: уведомление {job.user_id} не отправлено")
+            except TelegramForbiddenError:
+                counts['blocked'] += 1
+                print(f"🚫 Пользователь {job.user_id} заблокировал бота")
+            except Exception as e:
+                counts['failed'] += 1
+                print(f"❌ Ошибка отправки пользователю {job.user_id}: {type(e).__name__}: {e}")
+
+    workers = min(concurrency, len(jobs))
+    await asyncio.gather(*(worker() for _ in range(workers)))
+
+    print(
+        f"📊 Уведомления: успешно {counts['success']}, заблокировали {counts['blocked']}, "
+        f"ошибок {counts['failed']}, повторов {counts['retried']}"
+    )
+    return counts
+
+
 # ============================================================================
 # УВЕДОМЛЕНИЯ О ПЛАТЕЖАХ
 # ============================================================================
@@ -121,29 +225,47 @@ async def notify_payment_processed(bot: Bot, user_id: int) -> bool:
         return False
 
 
-async def notify_multiple_users(bot: Bot, user_ids: List[int], text: str) -> dict:
+async def notify_payments_processed(bot: Bot, user_ids: List[int]) -> dict:
     """
-    Отправить одинаковое уведомление нескольким пользователям
+    Уведомить нескольких пользователей об обработке оплаты (через диспетчер)
     """
-    success = 0
-    failed = 0
+    return await notify_multiple_users(bot, user_ids, txt.PAYMENT_PROCESSED_NOTIFICATION)
 
-    for user_id in user_ids:
-        try:
-            await bot.send_message(chat_id=user_id, text=text)
-            success += 1
-        except Exception as e:
-            print(f"❌ Ошибка отправки пользователю {user_id}: {e}")
-            failed += 1
 
-    print(f"📊 Уведомления: успешно {success}, ошибок {failed}")
-    return {'success': success, 'failed': failed}
+async def notify_multiple_users(bot: Bot, user_ids: List[int], text: str) -> dict:
+    """
+    Отправить одинаковое уведомление нескольким пользователям (через диспетчер)
+    """
+    jobs = [NotificationJob(user_id=user_id, text=text) for user_id in user_ids]
+    return await dispatch_notifications(bot, jobs)
 
 
 # ============================================================================
 # УВЕДОМЛЕНИЯ О ПОДПИСКАХ
 # ============================================================================
 
+async def notify_subscription_reminders(bot: Bot, kind: str, user_ids: List[int]) -> dict:
+    """
+    Разослать напоминания о подписке одной группе пользователей
+
+    Args:
+        bot: Экземпляр бота
+        kind: Группа из SUBSCRIPTION_REMINDERS ('expiring_3_days', 'expiring_today', ...)
+        user_ids: Получатели
+
+    Returns:
+        dict: Счётчики dispatch_notifications()
+    """
+    text, get_keyboard = SUBSCRIPTION_REMINDERS[kind]
+    jobs = [
+        NotificationJob(user_id=user_id, text=text, reply_markup=get_keyboard())
+        for user_id in user_ids
+    ]
+    if jobs:
+        print(f"📨 Напоминания '{kind}': {len(jobs)}")
+    return await dispatch_notifications(bot, jobs)
+
+
 async def notify_expiring_3_days(bot: Bot, user_id: int) -> bool:
     """Уведомление за 3 дня до окончания подписки"""
     try:
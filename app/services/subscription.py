@@ -4,82 +4,160 @@
 """
 
 from datetime import datetime
-from typing import List, Tuple
+from typing import Dict, List, Optional
 
-from app.database import (
-    get_all_users,
-    get_user,
-    update_user_batch,
-    get_subscription_status
-)
-from app.database.connection import users_worksheet
+from app.database import get_subscription_status, update_users_batch
+from app.database.aio import run_sync
+from app.database.users_cache import users_cache
+
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 
 
 # ============================================================================
-# ПРОВЕРКА ИСТЕКШИХ ПОДПИСОК
+# ЕДИНЫЙ ПРОХОД ПО ПОДПИСКАМ
 # ============================================================================
 
-async def check_and_expire_subscriptions() -> List[int]:
+def classify_subscriptions(records: List[dict], now: Optional[datetime] = None) -> Dict[str, List[int]]:
     """
-    Проверить все активные подписки и деактивировать истекшие
+    Разложить пользователей по группам уведомлений за один проход (без API)
+
+    Группы:
+    - expiring_3_days: активна, до окончания ровно 3 дня
+    - expiring_today: активна, сегодня последний день
+    - to_expire: активна, но sub_end уже прошёл (нужно деактивировать)
+    - expired_3_days / expired_7_days: неактивна (или деактивируется сейчас),
+      с окончания прошло ровно 3 / 7 дней
+
+    Args:
+        records: Строки листа users (словари, как в get_all_records())
+        now: Текущее время (для тестов), по умолчанию datetime.now()
 
     Returns:
-        list: Список user_id пользователей с деактивированными подписками
+        dict: {название_группы: [user_id, ...]}
     """
-    print("🔍 Проверка истекших подписок...")
+    now = now or datetime.now()
+    today = now.date()
+
+    groups = {
+        'expiring_3_days': [],
+        'expiring_today': [],
+        'to_expire': [],
+        'expired_3_days': [],
+        'expired_7_days': []
+    }
+
+    for user in records:
+        try:
+            user_id = int(user.get('user_id'))
+        except (TypeError, ValueError):
+            continue
+
+        sub_end_str = user.get('sub_end', '')
+        if not sub_end_str:
+            continue
+
+        try:
+            sub_end = datetime.strptime(sub_end_str, DATE_FORMAT)
+        except ValueError as e:
+            print(f"⚠️ Ошибка парсинга даты {sub_end_str} для {user_id}: {e}")
+            continue
+
+        is_active = user.get('is_sub_active', 'False') == 'True'
+
+        if is_active:
+            days_left = (sub_end.date() - today).days
+
+            # Уведомления до окончания (пока подписка ещё активна)
+            if days_left == 3:
+                groups['expiring_3_days'].append(user_id)
+            elif days_left == 0:
+                groups['expiring_today'].append(user_id)
 
-    try:
-        all_users = get_all_users()
-        current_time = datetime.now()
-        expired_users = []
+            if sub_end < now:
+                groups['to_expire'].append(user_id)
+                is_active = False
 
-        for user_data in all_users:
-            user_id = user_data.get('user_id')
-            if not user_id:
-                continue
+        # Напоминания после окончания (включая тех, кого деактивируем сейчас)
+        if not is_active:
+            days_since_expired = (today - sub_end.date()).days
+            if days_since_expired == 3:
+                groups['expired_3_days'].append(user_id)
+            elif days_since_expired == 7:
+                groups['expired_7_days'].append(user_id)
 
-            user = get_user(user_id)
-            if not user:
-                continue
+    return groups
 
-            is_sub_active = user.get('is_sub_active', 'False')
-            if is_sub_active != 'True':
-                continue
 
-            sub_end_str = user.get('sub_end', '')
-            if not sub_end_str:
-                continue
+def scan_subscriptions(now: Optional[datetime] = None) -> Dict[str, List[int]]:
+    """
+    Загрузить лист users один раз и классифицировать все подписки
 
-            try:
-                sub_end = datetime.strptime(sub_end_str, '%Y-%m-%d %H:%M:%S')
+    Returns:
+        dict: Группы из classify_subscriptions()
+    """
+    print("🔍 Проверка подписок (единый проход)...")
 
-                if sub_end < current_time:
-                    update_data = {
-                        'is_sub_active': 'False',
-                        'is_diamond': 'False',
-                        'last_updated_info': current_time.strftime('%Y-%m-%d %H:%M:%S')
-                    }
+    try:
+        users_cache.reload()
+        groups = classify_subscriptions(users_cache.records(), now)
+    except Exception as e:
+        print(f"❌ Ошибка проверки подписок: {e}")
+        groups = classify_subscriptions([], now)
 
-                    success = update_user_batch(user_id, update_data)
-                    if success:
-                        expired_users.append(user_id)
-                        print(f"⏰ Подписка деактивирована для пользователя {user_id}")
+    print(
+        f"📊 Истекают через 3 дня: {len(groups['expiring_3_days'])}, "
+        f"сегодня: {len(groups['expiring_today'])}, "
+        f"деактивировать: {len(groups['to_expire'])}, "
+        f"3 дня после: {len(groups['expired_3_days'])}, "
+        f"7 дней после: {len(groups['expired_7_days'])}"
+    )
+    return groups
 
-            except ValueError as e:
-                print(f"⚠️ Ошибка парсинга даты {sub_end_str} для {user_id}: {e}")
-                continue
 
-        if expired_users:
-            print(f"✅ Деактивировано подписок: {len(expired_users)}")
-        else:
-            print("ℹ️ Истекших подписок не найдено")
+def expire_subscriptions(user_ids: List[int], now: Optional[datetime] = None) -> List[int]:
+    """
+    Деактивировать подписки одним batch_update
 
-        return expired_users
+    Args:
+        user_ids: Пользователи из группы to_expire
 
-    except Exception as e:
-        print(f"❌ Ошибка проверки подписок: {e}")
+    Returns:
+        list: user_id с деактивированными подписками
+    """
+    if not user_ids:
+        print("ℹ️ Истекших подписок не найдено")
         return []
 
+    current_time_str = (now or datetime.now()).strftime(DATE_FORMAT)
+    update_data = {
+        'is_sub_active': 'False',
+        'is_diamond': 'False',
+        'last_updated_info': current_time_str
+    }
+
+    expired_users = update_users_batch({user_id: dict(update_data) for user_id in user_ids})
+    for user_id in expired_users:
+        print(f"⏰ Подписка деактивирована для пользователя {user_id}")
+
+    print(f"✅ Деактивировано подписок: {len(expired_users)}")
+    return expired_users
+
+
+# ============================================================================
+# ПРОВЕРКА ИСТЕКШИХ ПОДПИСОК
+# ============================================================================
+
+async def check_and_expire_subscriptions() -> List[int]:
+    """
+    Проверить все активные подписки и деактивировать истекшие
+
+    Returns:
+        list: Список user_id пользователей с деактивированными подписками
+    """
+    groups = await run_sync(scan_subscriptions)
+    return await run_sync(expire_subscriptions, groups['to_expire'])
+
 
 # ============================================================================
 # ПРОВЕРКА СКОРО ИСТЕКАЮЩИХ ПОДПИСОК (до истечения)
@@ -89,59 +167,17 @@ async def check_expiring_soon_subscriptions() -> dict:
     """
     Проверить подписки, которые скоро истекут
 
-    Возвращает:
-    - За 3 дня до истечения
-    - В последний день (0 дней)
-
     Returns:
         dict: {
             'expiring_3_days': [user_id1, user_id2, ...],
             'expiring_today': [user_id3, user_id4, ...]
         }
     """
-    print("🔍 Проверка скоро истекающих подписок...")
-
-    try:
-        all_users = get_all_users()
-        expiring_3_days = []
-        expiring_today = []
-
-        for user_data in all_users:
-            user_id = user_data.get('user_id')
-            if not user_id:
-                continue
-
-            sub_info = get_subscription_status(user_id)
-
-            # Проверяем только активные подписки
-            if sub_info['status'] != 'active' and sub_info['status'] != 'expiring_soon':
-                continue
-
-            days_left = sub_info.get('days_left', 0)
-
-            # За 3 дня до истечения
-            if days_left == 3:
-                expiring_3_days.append(user_id)
-                print(f"⚠️ Подписка истекает через 3 дня: {user_id}")
-
-            # Последний день (сегодня)
-            elif days_left == 0:
-                expiring_today.append(user_id)
-                print(f"⚠️ Подписка истекает сегодня: {user_id}")
-
-        print(f"📊 Истекают через 3 дня: {len(expiring_3_days)}, сегодня: {len(expiring_today)}")
-
-        return {
-            'expiring_3_days': expiring_3_days,
-            'expiring_today': expiring_today
-        }
-
-    except Exception as e:
-        print(f"❌ Ошибка проверки истекающих подписок: {e}")
-        return {
-            'expiring_3_days': [],
-            'expiring_today': []
-        }
+    groups = await run_sync(scan_subscriptions)
+    return {
+        'expiring_3_days': groups['expiring_3_days'],
+        'expiring_today': groups['expiring_today']
+    }
 
 
 # ============================================================================
@@ -152,74 +188,17 @@ async def check_expired_subscriptions_for_reminders() -> dict:
     """
     Проверить истёкшие подписки для напоминаний
 
-    Возвращает пользователей, у которых подписка истекла:
-    - Ровно 3 дня назад
-    - Ровно 7 дней назад
-
     Returns:
         dict: {
             'expired_3_days': [user_id1, user_id2, ...],
             'expired_7_days': [user_id3, user_id4, ...]
         }
     """
-    print("🔍 Проверка истёкших подписок для напоминаний...")
-
-    try:
-        # Получаем все записи напрямую из таблицы
-        all_records = users_worksheet.get_all_records()
-        current_date = datetime.now().date()
-
-        expired_3_days = []
-        expired_7_days = []
-
-        for user in all_records:
-            user_id = user.get('user_id')
-            if not user_id:
-                continue
-
-            # Проверяем только НЕактивные подписки (уже истекли)
-            is_sub_active = user.get('is_sub_active', 'False')
-            if is_sub_active == 'True':
-                continue
-
-            sub_end_str = user.get('sub_end', '')
-            if not sub_end_str:
-                continue
-
-            try:
-                sub_end = datetime.strptime(sub_end_str, '%Y-%m-%d %H:%M:%S')
-                sub_end_date = sub_end.date()
-
-                # Сколько дней прошло с момента истечения
-                days_since_expired = (current_date - sub_end_date).days
-
-                # Ровно 3 дня назад
-                if days_since_expired == 3:
-                    expired_3_days.append(int(user_id))
-                    print(f"📨 3 дня после истечения: {user_id}")
-
-                # Ровно 7 дней назад
-                elif days_since_expired == 7:
-                    expired_7_days.append(int(user_id))
-                    print(f"📨 7 дней после истечения: {user_id}")
-
-            except ValueError as e:
-                print(f"⚠️ Ошибка парсинга даты {sub_end_str} для {user_id}: {e}")
-                continue
-
-        print(f"📊 3 дня после: {len(expired_3_days)}, 7 дней после: {len(expired_7_days)}")
-
-        return {
-            'expired_3_days': expired_3_days,
-            'expired_7_days': expired_7_days
-        }
-
-    except Exception as e:
-        print(f"❌ Ошибка проверки истёкших подписок: {e}")
-        return {
-            'expired_3_days': [],
-            'expired_7_days': []
-        }
+    groups = await run_sync(scan_subscriptions)
+    return {
+        'expired_3_days': groups['expired_3_days'],
+        'expired_7_days': groups['expired_7_days']
+    }
 
 
 # ============================================================================
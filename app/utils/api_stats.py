@@ -0,0 +1,348 @@
+"""
+Учёт вызовов Google Sheets API
+Сколько вызовов, какой задержкой и каким объёмом тратит каждый обработчик
+и каждая фоновая задача
+"""
+
+import bisect
+import contextvars
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+
+# Обработчик или фоновая задача, от имени которой идут вызовы API.
+# Копируется в поток вместе с контекстом (см. app.database.aio.run_sync).
+api_scope: contextvars.ContextVar[str] = contextvars.ContextVar('api_scope', default='')
+
+# Границы корзин гистограммы задержек (мс)
+LATENCY_BUCKETS_MS = [50, 100, 200, 400, 800, 1600, 3200, 6400]
+
+# Методы gspread, которые ходят в API
+API_METHODS = {
+    'get_all_values', 'get_all_records', 'get', 'batch_get', 'get_values',
+    'row_values', 'col_values', 'acell', 'cell', 'find', 'findall',
+    'update', 'update_acell', 'batch_update', 'append_row', 'append_rows',
+    'values_batch_get', 'values_get', 'values_update', 'values_append',
+}
+
+# Методы, возвращающие одну строку/ячейку (объём = 1 строка)
+_SINGLE_ROW_METHODS = {'row_values', 'acell', 'cell', 'find', 'update_acell'}
+
+_THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+_APP_DIR = os.path.dirname(_THIS_DIR)
+
+
+class MethodStats:
+    """Счётчики одного метода (лист.метод)"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_seconds = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def add(self, seconds: float, rows: int, error: bool):
+        self.calls += 1
+        self.errors += int(error)
+        self.rows += rows
+        self.total_seconds += seconds
+        self.histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+
+    def percentile_ms(self, share: float) -> float:
+        """Оценка перцентиля по гистограмме (верхняя граница корзины)"""
+        target = self.calls * share
+        seen = 0
+        for index, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= target:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else float('inf')
+        return 0.0
+
+
+class ApiStats:
+    """
+    Сборщик статистики вызовов API (потокобезопасный)
+
+    - по методам: число вызовов, ошибки, строки, гистограмма задержек
+    - по scope (обработчик / задача) и по вызывающей функции
+    - расход квоты: вызовы за последние 60 секунд и поминутная история
+    """
+
+    def __init__(self, history_minutes: int = 60):
+        self.methods: Dict[str, MethodStats] = defaultdict(MethodStats)
+        self.by_scope: Counter = Counter()
+        self.by_caller: Counter = Counter()
+        self.scope_methods: Dict[str, Counter] = defaultdict(Counter)
+        self.started_at = time.time()
+        self._last_minute: deque = deque()
+        self._minutes: deque = deque(maxlen=history_minutes)
+        self._lock = threading.Lock()
+
+    def record(self, sheet: str, method: str, seconds: float, rows: int = 0, error: bool = False):
+        """Учесть один вызов API"""
+        name = f"{sheet}.{method}"
+        scope = api_scope.get() or 'other'
+        caller = _find_caller()
+        now = time.time()
+
+        with self._lock:
+            self.methods[name].add(seconds, rows, error)
+            self.by_scope[scope] += 1
+            self.by_caller[caller] += 1
+            self.scope_methods[scope][name] += 1
+
+            self._last_minute.append(now)
+            while self._last_minute and now - self._last_minute[0] > 60:
+                self._last_minute.popleft()
+
+            minute = int(now // 60)
+            if self._minutes and self._minutes[-1][0] == minute:
+                self._minutes[-1][1] += 1
+            else:
+                self._minutes.append([minute, 1])
+
+    @contextmanager
+    def track(self, sheet: str, method: str):
+        """Замерить блок кода как один вызов API"""
+        started = time.perf_counter()
+        error = False
+        try:
+            yield
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.record(sheet, method, time.perf_counter() - started, error=error)
+
+    def burn_rate(self) -> dict:
+        """
+        Расход квоты
+
+        Returns:
+            dict: {'last_60s': вызовов за минуту, 'avg_per_minute': среднее
+                   по завершённым минутам истории, 'peak_per_minute': максимум}
+        """
+        with self._lock:
+            now = time.time()
+            last_60s = sum(1 for ts in self._last_minute if now - ts <= 60)
+            current_minute = int(now // 60)
+            finished = [count for minute, count in self._minutes if minute != current_minute]
+
+        return {
+            'last_60s': last_60s,
+            'avg_per_minute': sum(finished) / len(finished) if finished else float(last_60s),
+            'peak_per_minute': max(finished + [last_60s]),
+        }
+
+    def snapshot(self) -> dict:
+        """Копия счётчиков для отчёта"""
+        with self._lock:
+            methods = {
+                name: {
+                    'calls': stats.calls,
+                    'errors': stats.errors,
+                    'rows': stats.rows,
+                    'avg_ms': stats.total_seconds / stats.calls * 1000 if stats.calls else 0.0,
+                    'p50_ms': stats.percentile_ms(0.5),
+                    'p95_ms': stats.percentile_ms(0.95),
+                    'histogram': list(stats.histogram),
+                }
+                for name, stats in self.methods.items()
+            }
+            return {
+                'total': sum(stats.calls for stats in self.methods.values()),
+                'methods': methods,
+                'by_scope': dict(self.by_scope),
+                'by_caller': dict(self.by_caller),
+                'scope_methods': {scope: dict(counter) for scope, counter in self.scope_methods.items()},
+                'uptime_seconds': time.time() - self.started_at,
+            }
+
+    def scope_calls(self, scope: str) -> int:
+        """Сколько вызовов учтено под scope (для подсчёта вызовов за запуск задачи)"""
+        with self._lock:
+            return self.by_scope.get(scope, 0)
+
+    def reset(self):
+        with self._lock:
+            self.methods.clear()
+            self.by_scope.clear()
+            self.by_caller.clear()
+            self.scope_methods.clear()
+            self._last_minute.clear()
+            self._minutes.clear()
+            self.started_at = time.time()
+
+
+def _find_caller() -> str:
+    """Ближайшая функция приложения выше слоя инструментирования: 'users.get_user'"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(_APP_DIR) and not filename.startswith(_THIS_DIR):
+            module = os.path.splitext(os.path.basename(filename))[0]
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return 'unknown'
+
+
+def _payload_rows(method: str, args: tuple, kwargs: dict, result) -> int:
+    """Сколько строк передано в вызове (прочитано или записано)"""
+    if method in _SINGLE_ROW_METHODS:
+        return 1
+    if method == 'batch_update' and args:
+        return sum(len(item.get('values', [])) for item in args[0])
+    if method in ('update', 'append_rows'):
+        values = kwargs.get('values') or next((arg for arg in args if isinstance(arg, list)), [])
+        return len(values)
+    if method == 'append_row':
+        return 1
+    if isinstance(result, dict) and 'valueRanges' in result:
+        return sum(len(item.get('values', [])) for item in result['valueRanges'])
+    if isinstance(result, list):
+        return len(result)
+    return 0
+
+
+class InstrumentedWorksheet:
+    """
+    Прокси листа (или таблицы), который учитывает каждый вызов API
+
+    Методы из API_METHODS замеряются, остальные атрибуты отдаются как есть.
+
+    Атрибуты:
+        name: Имя листа в отчётах
+    """
+
+    def __init__(self, target, name: str, stats: Optional[ApiStats] = None):
+        self._target = target
+        self._name = name
+        self._stats = stats or api_stats
+
+    def __getattr__(self, attr):
+        value = getattr(self._target, attr)
+        if attr not in API_METHODS or not callable(value):
+            return value
+
+        @functools.wraps(value)
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = value(*args, **kwargs)
+            except Exception:
+                self._stats.record(self._name, attr, time.perf_counter() - started, error=True)
+                raise
+            rows = _payload_rows(attr, args, kwargs, result)
+            self._stats.record(self._name, attr, time.perf_counter() - started, rows)
+            return result
+
+        return call
+
+    def __repr__(self) -> str:
+        return f"<InstrumentedWorksheet {self._name}: {self._target!r}>"
+
+
+def scoped(name: str):
+    """
+    Декоратор для корутины: все вызовы API внутри учитываются под именем name
+
+    Example:
+        @scoped('job:check_payments')
+        async def check_payments_task(bot): ...
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            token = api_scope.set(name)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                api_scope.reset(token)
+        # По нему app.utils.job_stats считает вызовы API за запуск задачи
+        wrapper.api_scope_name = name
+        return wrapper
+    return decorator
+
+
+def start_thread(name: str, target: Callable, *args) -> threading.Thread:
+    """
+    Запустить target в фоновом потоке под api_scope name
+
+    Поток получает копию контекста (как run_sync), но со своим scope:
+    обновление кэша, запущенное из обработчика, учитывается отдельно
+    и не занимает приоритетную полосу квоты.
+
+    Example:
+        start_thread('refresh:config', self._background_refresh)
+    """
+    context = contextvars.copy_context()
+    context.run(api_scope.set, name)
+    thread = threading.Thread(target=context.run, args=(target, *args), daemon=True)
+    thread.start()
+    return thread
+
+
+# Глобальный сборщик
+api_stats = ApiStats()
+
+
+def format_report(top: int = 8) -> List[str]:
+    """Строки отчёта для админа (HTML)"""
+    snapshot = api_stats.snapshot()
+    burn = api_stats.burn_rate()
+
+    lines = [
+        "📈 <b>Вызовы Google Sheets API</b>\n",
+        f"• Всего: {snapshot['total']} за {snapshot['uptime_seconds'] / 60:.0f} мин",
+        f"• За последние 60 с: {burn['last_60s']}",
+        f"• В среднем в минуту: {burn['avg_per_minute']:.1f}, пик: {burn['peak_per_minute']}\n",
+        "<b>Методы</b> (вызовы, p50/p95, строк, ошибок):",
+    ]
+    methods = sorted(snapshot['methods'].items(), key=lambda item: -item[1]['calls'])[:top]
+    for name, stats in methods:
+        lines.append(
+            f"• {name}: {stats['calls']}, {stats['p50_ms']:.0f}/{stats['p95_ms']:.0f} мс, "
+            f"{stats['rows']} строк, {stats['errors']} ош."
+        )
+
+    lines.append("\n<b>Кто тратит</b> (обработчик / задача):")
+    for scope, calls in Counter(snapshot['by_scope']).most_common(top):
+        detail = ', '.join(
+            f"{name} {count}" for name, count in Counter(snapshot['scope_methods'][scope]).most_common(3)
+        )
+        lines.append(f"• {scope}: {calls} ({detail})")
+
+    lines.append("\n<b>Функции</b>:")
+    for caller, calls in Counter(snapshot['by_caller']).most_common(top):
+        lines.append(f"• {caller}: {calls}")
+
+    return lines
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Как использовать:
+
+Листы в app/database/connection.py уже обёрнуты в InstrumentedWorksheet,
+обработчики получают scope через ApiScopeMiddleware ("handler:cmd_start"),
+фоновые задачи - через декоратор @scoped("job:check_payments"),
+фоновые потоки обновления кэшей - через start_thread("refresh:config", ...).
+
+Отчёт: команда /api_stats (админ), сброс: /api_stats reset.
+
+Из кода:
+    from app.utils.api_stats import api_stats
+
+    api_stats.snapshot()['by_scope']   # {'handler:cmd_start': 3, 'job:check_payments': 120, ...}
+    api_stats.burn_rate()              # {'last_60s': 42, 'avg_per_minute': 35.0, 'peak_per_minute': 61}
+"""
@@ -0,0 +1,250 @@
+"""
+Телеметрия задач планировщика
+Сколько длится каждый запуск, сколько запусков пропущено из-за наложения
+или опоздания и сколько вызовов Google Sheets API тратит один запуск
+"""
+
+import html
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from apscheduler.events import (
+    EVENT_JOB_ADDED,
+    EVENT_JOB_SUBMITTED,
+    EVENT_JOB_EXECUTED,
+    EVENT_JOB_ERROR,
+    EVENT_JOB_MISSED,
+    EVENT_JOB_MAX_INSTANCES
+)
+
+from app.utils.api_stats import api_stats
+
+
+class JobRecord:
+    """
+    Счётчики одной задачи (по id задачи планировщика)
+
+    Атрибуты:
+        name: Название задачи
+        scope: Scope вызовов API задачи (см. app.utils.api_stats.scoped)
+        runs: Завершённых запусков
+        errors: Запусков с исключением
+        skipped: Пропущено - предыдущий запуск ещё идёт (max_instances)
+        missed: Пропущено - опоздание больше misfire_grace_time
+        durations: Длительности последних запусков (сек)
+        api_calls: Вызовы API последних запусков
+    """
+
+    def __init__(self, name: str, scope: str, history: int):
+        self.name = name
+        self.scope = scope
+        self.runs = 0
+        self.errors = 0
+        self.skipped = 0
+        self.missed = 0
+        self.durations = deque(maxlen=history)
+        self.api_calls = deque(maxlen=history)
+        self.max_lag = 0.0
+        self.last_started_at: Optional[float] = None
+        self.last_finished_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.running_since: Optional[float] = None
+        self._api_before = 0
+
+    def percentile(self, share: float) -> float:
+        if not self.durations:
+            return 0.0
+        ordered = sorted(self.durations)
+        return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+class JobStats:
+    """
+    Сборщик статистики задач по событиям APScheduler
+
+    Подключается к планировщику слушателем, задачи менять не нужно:
+    - SUBMITTED / EXECUTED / ERROR - начало, конец, длительность, вызовы API
+      (разница счётчика api_stats по scope задачи до и после запуска)
+    - MAX_INSTANCES - запуск пропущен, потому что предыдущий ещё идёт
+    - MISSED - запуск опоздал больше misfire_grace_time и не выполнялся
+
+    События приходят в event loop, поэтому блокировки не нужны.
+
+    Атрибуты:
+        history: Сколько последних запусков хранить для перцентилей
+        jobs: Счётчики по id задачи
+    """
+
+    def __init__(self, history: int = 200):
+        self.history = history
+        self.jobs: Dict[str, JobRecord] = {}
+        self.started_at = time.time()
+        self._scheduler = None
+
+    def attach(self, scheduler):
+        """Подписаться на события планировщика (до добавления задач)"""
+        self._scheduler = scheduler
+        scheduler.add_listener(self._on_added, EVENT_JOB_ADDED)
+        scheduler.add_listener(self._on_submitted, EVENT_JOB_SUBMITTED)
+        scheduler.add_listener(self._on_finished, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+        scheduler.add_listener(self._on_skipped, EVENT_JOB_MAX_INSTANCES)
+        scheduler.add_listener(self._on_missed, EVENT_JOB_MISSED)
+
+    def reset(self):
+        """Сбросить счётчики (задачи и их scope остаются)"""
+        for job_id, record in list(self.jobs.items()):
+            fresh = JobRecord(record.name, record.scope, self.history)
+            fresh.running_since = record.running_since
+            fresh._api_before = record._api_before
+            self.jobs[job_id] = fresh
+        self.started_at = time.time()
+
+    # ------------------------------------------------------------------------
+    # События
+    # ------------------------------------------------------------------------
+
+    def _record(self, job_id: str) -> JobRecord:
+        record = self.jobs.get(job_id)
+        if record is None:
+            record = self.jobs[job_id] = JobRecord(job_id, f"job:{job_id}", self.history)
+        return record
+
+    def _on_added(self, event):
+        job = self._scheduler.get_job(event.job_id) if self._scheduler else None
+        record = self._record(event.job_id)
+        if job is not None:
+            record.name = job.name
+            record.scope = getattr(job.func, 'api_scope_name', record.scope)
+
+    def _on_submitted(self, event):
+        record = self._record(event.job_id)
+        now = time.time()
+        record.running_since = time.perf_counter()
+        record.last_started_at = now
+        record._api_before = api_stats.scope_calls(record.scope)
+        if event.scheduled_run_times:
+            lag = now - event.scheduled_run_times[-1].timestamp()
+            record.max_lag = max(record.max_lag, lag)
+
+    def _on_finished(self, event):
+        record = self._record(event.job_id)
+        if record.running_since is None:
+            return
+
+        record.runs += 1
+        record.durations.append(time.perf_counter() - record.running_since)
+        record.api_calls.append(max(api_stats.scope_calls(record.scope) - record._api_before, 0))
+        record.running_since = None
+        record.last_finished_at = time.time()
+        if event.exception is not None:
+            record.errors += 1
+            record.last_error = f"{type(event.exception).__name__}: {event.exception}"
+
+    def _on_skipped(self, event):
+        record = self._record(event.job_id)
+        record.skipped += 1
+        print(f"⏭ Задача '{record.name}' пропущена: предыдущий запуск ещё идёт")
+
+    def _on_missed(self, event):
+        record = self._record(event.job_id)
+        # Идущий запуск (если есть) не трогаем: он ещё закончится EXECUTED/ERROR
+        record.missed += 1
+        print(f"⏭ Задача '{record.name}' пропущена: опоздание больше допустимого")
+
+    # ------------------------------------------------------------------------
+    # Отчёт
+    # ------------------------------------------------------------------------
+
+    def snapshot(self) -> List[dict]:
+        """Статистика по задачам (в порядке добавления)"""
+        now = time.time()
+        result = []
+        for job_id, record in self.jobs.items():
+            job = self._scheduler.get_job(job_id) if self._scheduler else None
+            next_run = job.next_run_time if job is not None else None
+            result.append({
+                'id': job_id,
+                'name': record.name,
+                'runs': record.runs,
+                'errors': record.errors,
+                'skipped': record.skipped,
+                'missed': record.missed,
+                'p50_s': record.percentile(0.5),
+                'p95_s': record.percentile(0.95),
+                'max_s': max(record.durations, default=0.0),
+                'api_per_run': sum(record.api_calls) / len(record.api_calls) if record.api_calls else 0.0,
+                'max_lag_s': record.max_lag,
+                'running_s': time.perf_counter() - record.running_since if record.running_since else None,
+                'last_finished_ago_s': now - record.last_finished_at if record.last_finished_at else None,
+                'next_run_in_s': next_run.timestamp() - now if next_run else None,
+                'paused': job is not None and next_run is None,
+                'last_error': record.last_error,
+            })
+        return result
+
+
+def format_report() -> List[str]:
+    """Строки отчёта для админа (HTML)"""
+    lines = [
+        "🗓 <b>Задачи планировщика</b>",
+        f"<i>за {(time.time() - job_stats.started_at) / 60:.0f} мин; "
+        "длительность p50/p95/макс, вызовов API за запуск</i>\n",
+    ]
+    for job in job_stats.snapshot():
+        status = []
+        if job['running_s'] is not None:
+            status.append(f"идёт {_format_seconds(job['running_s'])}")
+        if job['paused']:
+            status.append("на паузе")
+        elif job['next_run_in_s'] is not None:
+            status.append(f"следующий через {_format_seconds(max(job['next_run_in_s'], 0))}")
+
+        lines.append(
+            f"• <b>{job['name']}</b>: {job['runs']} запусков, "
+            f"{job['p50_s']:.1f}/{job['p95_s']:.1f}/{job['max_s']:.1f} с, "
+            f"API {job['api_per_run']:.1f}"
+        )
+        if job['errors'] or job['skipped'] or job['missed']:
+            lines.append(
+                f"   ⚠️ ошибок {job['errors']}, наложений {job['skipped']}, опозданий {job['missed']}"
+            )
+        if status:
+            lines.append(f"   {', '.join(status)}")
+        if job['last_error']:
+            lines.append(f"   последняя ошибка: <code>{html.escape(job['last_error'][:200])}</code>")
+    return lines
+
+
+def _format_seconds(seconds: float) -> str:
+    if seconds < 120:
+        return f"{seconds:.0f} с"
+    if seconds < 2 * 60 * 60:
+        return f"{seconds / 60:.0f} мин"
+    return f"{seconds / 3600:.1f} ч"
+
+
+# Глобальный сборщик
+job_stats = JobStats()
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Как использовать:
+
+    from app.utils.job_stats import job_stats
+
+    scheduler = AsyncIOScheduler(job_defaults=JOB_DEFAULTS)
+    job_stats.attach(scheduler)        # до add_job
+    scheduler.add_job(...)
+
+Отчёт для админа: /jobs (/jobs reset - сбросить счётчики).
+
+Наложения: у всех задач max_instances=1 и coalesce=True (app/background_tasks.py).
+Если запуск ещё идёт, следующий пропускается и считается в «наложениях»;
+несколько пропущенных сроков подряд сливаются в один запуск.
+Вызовы API за запуск берутся из api_stats по scope задачи (@scoped).
+"""
@@ -0,0 +1,320 @@
+"""
+Выбор ведущего процесса для фоновых задач
+Аренда (lease) в SQLite: ведущий продлевает её каждые несколько секунд,
+если он упал - аренду по истечении срока забирает резервный процесс
+"""
+
+import asyncio
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from datetime import date
+from typing import Callable, List, Optional, Set
+
+from app.config import LEADER_LEASE_DB, LEADER_LEASE_TTL_SECONDS, LEADER_HEARTBEAT_SECONDS
+
+
+class LeaderLease:
+    """
+    Аренда роли ведущего на общем файле SQLite (процессы на одной машине)
+
+    - acquire() за одну транзакцию (BEGIN IMMEDIATE) берёт свободную или
+      истёкшую аренду либо продлевает свою
+    - фоновая задача повторяет acquire() каждые heartbeat секунд: ведущий
+      продлевает аренду, резервный ждёт её истечения
+    - is_leader ложно уже за heartbeat секунд до истечения аренды: если
+      продление задержалось, процесс перестаёт считать себя ведущим раньше,
+      чем аренду сможет забрать другой
+    - при остановке аренда освобождается - резервный забирает её
+      на ближайшем heartbeat, не дожидаясь ttl
+    - каждый heartbeat заодно отмечает процесс в таблице processes:
+      по ней ведущий узнаёт, чья работа осталась без хозяина (alive_owners)
+
+    Атрибуты:
+        name: Название аренды (одна строка таблицы)
+        path: Путь к файлу базы
+        ttl: Срок аренды без продления (сек)
+        heartbeat: Период продления / попыток захвата (сек)
+        owner: Идентификатор этого процесса (host:pid:случайная часть)
+    """
+
+    def __init__(
+        self,
+        name: str = 'scheduler',
+        path: str = LEADER_LEASE_DB,
+        ttl: float = LEADER_LEASE_TTL_SECONDS,
+        heartbeat: float = LEADER_HEARTBEAT_SECONDS
+    ):
+        self.name = name
+        self.path = path
+        self.ttl = ttl
+        self.heartbeat = heartbeat
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.elections = 0
+        self._expires_at = 0.0
+        self._leader = False
+        self._listeners: List[Callable[[bool], None]] = []
+        self._conn: Optional[sqlite3.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # isolation_level=None - транзакциями управляем сами (BEGIN IMMEDIATE)
+            self._conn = sqlite3.connect(self.path, timeout=1, isolation_level=None, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS leader_lease (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    acquired_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS processes (
+                    owner TEXT PRIMARY KEY,
+                    seen_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS daily_runs (
+                    task TEXT PRIMARY KEY,
+                    day TEXT NOT NULL,
+                    owner TEXT NOT NULL
+                )
+            """)
+        return self._conn
+
+    # ------------------------------------------------------------------------
+    # Аренда
+    # ------------------------------------------------------------------------
+
+    @property
+    def is_leader(self) -> bool:
+        """Этот процесс - ведущий и аренда гарантированно ещё действует"""
+        return self._leader and time.time() < self._expires_at - self.heartbeat
+
+    def acquire(self) -> bool:
+        """
+        Взять или продлить аренду
+
+        Returns:
+            bool: True если этот процесс ведущий
+        """
+        now = time.time()
+        try:
+            conn = self.conn
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute("""
+                    INSERT INTO processes (owner, seen_at) VALUES (?, ?)
+                    ON CONFLICT(owner) DO UPDATE SET seen_at = excluded.seen_at
+                """, (self.owner, now))
+                row = conn.execute(
+                    'SELECT owner, expires_at FROM leader_lease WHERE name = ?', (self.name,)
+                ).fetchone()
+
+                if row is None or row[0] == self.owner or row[1] <= now:
+                    acquired_at = now if row is None or row[0] != self.owner else None
+                    conn.execute("""
+                        INSERT INTO leader_lease (name, owner, expires_at, acquired_at)
+                        VALUES (?, ?, ?, ?)
+                        ON CONFLICT(name) DO UPDATE SET
+                            owner = excluded.owner,
+                            expires_at = excluded.expires_at,
+                            acquired_at = COALESCE(?, leader_lease.acquired_at)
+                    """, (self.name, self.owner, now + self.ttl, now, acquired_at))
+                    # Процессы без отметки дольше ttl завершились
+                    conn.execute('DELETE FROM processes WHERE seen_at < ?', (now - self.ttl,))
+                    conn.execute('COMMIT')
+                    self._expires_at = now + self.ttl
+                    self._set_leader(True)
+                    return True
+
+                conn.execute('COMMIT')
+                self._set_leader(False)
+                return False
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+        except sqlite3.Error as e:
+            # База занята/недоступна: остаёмся ведущим только до истечения своей аренды
+            print(f"⚠️ Аренда ведущего не продлена: {e}")
+            if not self.is_leader:
+                self._set_leader(False)
+            return self.is_leader
+
+    def release(self):
+        """Освободить аренду (при остановке бота)"""
+        if not self._leader:
+            return
+        try:
+            self.conn.execute(
+                'DELETE FROM leader_lease WHERE name = ? AND owner = ?', (self.name, self.owner)
+            )
+        except sqlite3.Error as e:
+            print(f"⚠️ Аренда ведущего не освобождена, истечёт через {self.ttl:.0f} с: {e}")
+        self._expires_at = 0.0
+        self._set_leader(False)
+
+    def holder(self) -> Optional[dict]:
+        """Текущий владелец аренды: {'owner', 'expires_in', 'held_for'} или None"""
+        try:
+            row = self.conn.execute(
+                'SELECT owner, expires_at, acquired_at FROM leader_lease WHERE name = ?', (self.name,)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        now = time.time()
+        return {'owner': row[0], 'expires_in': row[1] - now, 'held_for': now - row[2]}
+
+    def alive_owners(self) -> Set[str]:
+        """
+        Процессы, отмечавшиеся за последние ttl секунд (включая этот)
+
+        Работа, закреплённая за owner не из этого набора (рассылка, журнал
+        голосов), осталась от завершившегося процесса - её подхватывает ведущий.
+        """
+        # Ошибку базы не глотаем: пустой набор означал бы "все завершились"
+        rows = self.conn.execute(
+            'SELECT owner FROM processes WHERE seen_at >= ?', (time.time() - self.ttl,)
+        ).fetchall()
+        return {row[0] for row in rows} | {self.owner}
+
+    # ------------------------------------------------------------------------
+    # Задачи раз в день
+    # ------------------------------------------------------------------------
+
+    def claim_day(self, task: str) -> bool:
+        """
+        Отметить, что task выполняется сегодня (общая отметка для всех процессов)
+
+        Смена ведущего или перезапуск в тот же день не повторят задачу.
+
+        Returns:
+            bool: True если сегодня task ещё не выполнялась (отметка поставлена)
+        """
+        today = date.today().isoformat()
+        conn = self.conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT day FROM daily_runs WHERE task = ?', (task,)).fetchone()
+            if row is not None and row[0] == today:
+                conn.execute('COMMIT')
+                return False
+            conn.execute("""
+                INSERT INTO daily_runs (task, day, owner) VALUES (?, ?, ?)
+                ON CONFLICT(task) DO UPDATE SET day = excluded.day, owner = excluded.owner
+            """, (task, today, self.owner))
+            conn.execute('COMMIT')
+            return True
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def release_day(self, task: str):
+        """Снять сегодняшнюю отметку (задача упала - пусть повторится)"""
+        try:
+            self.conn.execute(
+                'DELETE FROM daily_runs WHERE task = ? AND day = ? AND owner = ?',
+                (task, date.today().isoformat(), self.owner)
+            )
+        except sqlite3.Error as e:
+            print(f"⚠️ Отметка задачи {task} не снята: {e}")
+
+    # ------------------------------------------------------------------------
+    # Смена роли
+    # ------------------------------------------------------------------------
+
+    def on_change(self, listener: Callable[[bool], None]):
+        """Подписаться на смену роли: listener(True) - стал ведущим, listener(False) - перестал"""
+        self._listeners.append(listener)
+
+    def _set_leader(self, leader: bool):
+        if leader == self._leader:
+            return
+        self._leader = leader
+        if leader:
+            self.elections += 1
+            print(f"👑 Процесс {self.owner} стал ведущим: фоновые задачи выполняются здесь")
+        else:
+            print(f"💤 Процесс {self.owner} в резерве: фоновые задачи выполняет другой процесс")
+
+        for listener in self._listeners:
+            try:
+                listener(leader)
+            except Exception as e:
+                print(f"❌ Ошибка обработчика смены ведущего: {e}")
+
+    # ------------------------------------------------------------------------
+    # Heartbeat
+    # ------------------------------------------------------------------------
+
+    def start(self):
+        """Сразу попробовать стать ведущим и запустить heartbeat в текущем event loop"""
+        if self._task is not None:
+            return
+        if not self.acquire():
+            holder = self.holder()
+            if holder:
+                print(f"💤 Ведущий - {holder['owner']}, ждём истечения аренды "
+                      f"(через {max(holder['expires_in'], 0):.0f} с)")
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        """Остановить heartbeat, освободить аренду и снять отметку процесса"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.release()
+        try:
+            self.conn.execute('DELETE FROM processes WHERE owner = ?', (self.owner,))
+        except sqlite3.Error as e:
+            print(f"⚠️ Отметка процесса не снята, истечёт через {self.ttl:.0f} с: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            # Одна короткая транзакция в локальном файле - без пула потоков,
+            # чтобы занятый запросами к Sheets пул не задержал продление
+            self.acquire()
+
+
+# Общая аренда для задач планировщика
+leader_lease = LeaderLease()
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Как использовать:
+
+    from app.utils.leader_lease import leader_lease
+
+    leader_lease.on_change(lambda leader: print('ведущий' if leader else 'резерв'))
+    leader_lease.start()          # в startup (нужен работающий event loop)
+
+    if leader_lease.is_leader:
+        ...                       # работа, которую должен делать один процесс
+
+    leader_lease.stop()           # в shutdown - резервный заберёт аренду сразу
+
+Все процессы бота должны видеть один файл LEADER_LEASE_DB (одна машина
+или общий том). Резервный процесс становится ведущим не позже чем через
+LEADER_LEASE_TTL_SECONDS + LEADER_HEARTBEAT_SECONDS после падения ведущего.
+
+Подключено в app/background_tasks.py: проверка оплат, синхронизация
+пользователей и проверка подписок идут только в ведущем процессе
+(напоминания о подписке - не чаще раза в день, см. claim_day), он же продолжает
+рассылки и записывает голоса завершившихся процессов (alive_owners); сброс буферов записи
+и голосов - в каждом процессе.
+"""
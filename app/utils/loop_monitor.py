@@ -0,0 +1,112 @@
+"""
+Мониторинг блокировок event loop
+Измеряет, насколько позже запланированного просыпается корутина
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+
+from app.config import (
+    LOOP_LAG_CHECK_INTERVAL_SECONDS,
+    LOOP_LAG_WARNING_THRESHOLD_SECONDS
+)
+
+
+class LoopLagMonitor:
+    """
+    Фоновая задача, которая раз в interval секунд засыпает и замеряет,
+    на сколько опоздало пробуждение. Любой синхронный вызов в event loop
+    (например, gspread из обработчика) проявляется как рост задержки.
+
+    Атрибуты:
+        interval: Период замера (сек)
+        threshold: Порог задержки для предупреждения в лог (сек)
+        samples: Последние замеры задержки (сек)
+    """
+
+    def __init__(
+        self,
+        interval: float = LOOP_LAG_CHECK_INTERVAL_SECONDS,
+        threshold: float = LOOP_LAG_WARNING_THRESHOLD_SECONDS,
+        history: int = 1000
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.samples = deque(maxlen=history)
+        self.max_lag = 0.0
+        self.blocked_count = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Запустить мониторинг в текущем event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        """Остановить мониторинг"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def reset(self):
+        """Сбросить накопленную статистику (для замеров «до/после»)"""
+        self.samples.clear()
+        self.max_lag = 0.0
+        self.blocked_count = 0
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+            if lag >= self.threshold:
+                self.blocked_count += 1
+                print(f"⚠️ Event loop заблокирован на {lag * 1000:.0f} мс")
+
+    def stats(self) -> dict:
+        """
+        Статистика задержек
+
+        Returns:
+            dict: {'samples', 'avg_ms', 'p95_ms', 'max_ms', 'blocked'}
+        """
+        if not self.samples:
+            return {'samples': 0, 'avg_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0, 'blocked': 0}
+
+        ordered = sorted(self.samples)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+        return {
+            'samples': len(ordered),
+            'avg_ms': sum(ordered) / len(ordered) * 1000,
+            'p95_ms': p95 * 1000,
+            'max_ms': self.max_lag * 1000,
+            'blocked': self.blocked_count
+        }
+
+
+# Глобальный монитор (запускается в startup)
+loop_monitor = LoopLagMonitor()
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Как замерить блокировки «до/после»:
+
+1. Запустить бота, выполнить /loop_stats reset (админ)
+2. Погонять нагрузку (/start, проверка подписки, фоновые задачи)
+3. Выполнить /loop_stats — max/p95 задержки event loop
+
+Пока вызовы gspread выполнялись прямо в обработчиках, max_ms был равен
+длительности самого медленного запроса к Sheets. С app.database.aio
+задержка остаётся на уровне единиц миллисекунд.
+"""
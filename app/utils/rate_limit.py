@@ -0,0 +1,135 @@
+"""
+Ограничение частоты отправки сообщений
+Token bucket, общий для всех отправок бота в Telegram
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+from app.config import TELEGRAM_MAX_MESSAGES_PER_SECOND
+
+
+class TokenBucket:
+    """
+    Асинхронный token bucket
+
+    Каждая отправка забирает один токен, токены пополняются со скоростью rate в секунду.
+    pause() останавливает выдачу токенов для всех отправителей сразу -
+    так обрабатывается RetryAfter от Telegram (лимит общий, а не на одну задачу).
+
+    Атрибуты:
+        rate: Токенов в секунду
+        capacity: Максимальный запас токенов (размер всплеска)
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Дождаться и забрать один токен"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """
+        Приостановить выдачу токенов (например, после TelegramRetryAfter)
+
+        Args:
+            seconds: На сколько секунд остановиться
+        """
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+    @property
+    def paused(self) -> bool:
+        """Стоит ли сейчас пауза"""
+        return time.monotonic() < self._paused_until
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """
+    Token bucket с подстройкой скорости (AIMD)
+
+    - после increase_every успешных отправок скорость растёт на step (до max_rate)
+    - RetryAfter делит скорость пополам (до min_rate) и ставит паузу
+
+    Атрибуты:
+        min_rate: Нижняя граница скорости
+        max_rate: Верхняя граница скорости
+        step: Прирост скорости (сообщений/сек)
+        increase_every: Через сколько успехов повышать скорость
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        min_rate: float = 1.0,
+        max_rate: float = TELEGRAM_MAX_MESSAGES_PER_SECOND,
+        step: float = 2.0,
+        increase_every: int = 10
+    ):
+        super().__init__(rate, capacity=1)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.step = step
+        self.increase_every = increase_every
+        self._successes = 0
+
+    def on_success(self):
+        """Учесть успешную отправку (аддитивное ускорение)"""
+        self._successes += 1
+        if self._successes >= self.increase_every:
+            self._successes = 0
+            self.rate = min(self.max_rate, self.rate + self.step)
+
+    def on_retry_after(self, seconds: float):
+        """Учесть RetryAfter: пауза и мультипликативное замедление"""
+        self._successes = 0
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.pause(seconds)
+
+
+# Общий лимитер для всех сообщений бота
+telegram_rate_limiter = TokenBucket(TELEGRAM_MAX_MESSAGES_PER_SECOND)
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Как использовать:
+
+    from app.utils.rate_limit import telegram_rate_limiter
+
+    await telegram_rate_limiter.acquire()
+    try:
+        await bot.send_message(chat_id=user_id, text=text)
+    except TelegramRetryAfter as e:
+        telegram_rate_limiter.pause(e.retry_after)
+
+Лимит задаётся в app/config.py (TELEGRAM_MAX_MESSAGES_PER_SECOND).
+"""
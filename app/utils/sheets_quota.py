@@ -0,0 +1,202 @@
+"""
+Квота Google Sheets API
+Общий token bucket для всех вызовов листов с приоритетом обработчиков
+над фоновыми задачами
+"""
+
+import functools
+import threading
+import time
+from collections import defaultdict
+
+from gspread.exceptions import APIError
+
+from app.config import (
+    SHEETS_QUOTA_PER_MINUTE,
+    SHEETS_QUOTA_BURST,
+    SHEETS_QUOTA_INTERACTIVE_RESERVE,
+    SHEETS_QUOTA_BACKOFF_SECONDS
+)
+from app.utils.api_stats import API_METHODS, api_scope
+
+
+# Полосы приоритета
+LANE_INTERACTIVE = 'interactive'
+LANE_BACKGROUND = 'background'
+
+
+def current_lane() -> str:
+    """Полоса текущего вызова: фоновые задачи, обновление кэшей и прогрев - background, остальное - interactive"""
+    scope = api_scope.get()
+    if scope.startswith(('job:', 'refresh:', 'startup:')):
+        return LANE_BACKGROUND
+    return LANE_INTERACTIVE
+
+
+class SheetsQuota:
+    """
+    Потокобезопасный token bucket для вызовов Google Sheets
+
+    Вызовы gspread выполняются в потоках executor, поэтому acquire()
+    блокирующий (в отличие от асинхронного TokenBucket для Telegram).
+
+    - interactive (обработчики) забирают любой доступный токен
+    - background (задачи планировщика) не опускают запас ниже reserve токенов
+      и ждут, пока есть ожидающие interactive-вызовы - при нехватке бюджета
+      фоновые задачи идут со скоростью пополнения, а обработчики не ждут
+    - ответ 429 ставит паузу для всех и вызов повторяется один раз
+
+    Атрибуты:
+        rate: Токенов в секунду (квота в минуту / 60)
+        capacity: Максимальный запас токенов
+        reserve: Сколько токенов запаса доступно только interactive
+        backoff: Пауза после 429 (в секундах)
+    """
+
+    def __init__(
+        self,
+        per_minute: int = SHEETS_QUOTA_PER_MINUTE,
+        burst: int = SHEETS_QUOTA_BURST,
+        reserve_share: float = SHEETS_QUOTA_INTERACTIVE_RESERVE,
+        backoff: float = SHEETS_QUOTA_BACKOFF_SECONDS
+    ):
+        self.rate = per_minute / 60
+        self.capacity = burst
+        self.reserve = burst * reserve_share
+        self.backoff = backoff
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiting = defaultdict(int)
+        self._cond = threading.Condition()
+        self._stats = defaultdict(lambda: {'calls': 0, 'waited': 0, 'wait_seconds': 0.0, 'max_wait': 0.0})
+        self.throttled = 0
+
+    def acquire(self, lane: str = LANE_INTERACTIVE) -> float:
+        """
+        Дождаться и забрать один токен
+
+        Returns:
+            float: Сколько секунд пришлось ждать
+        """
+        started = time.monotonic()
+        floor = 1 if lane == LANE_INTERACTIVE else 1 + self.reserve
+
+        with self._cond:
+            self._waiting[lane] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    if now < self._paused_until:
+                        self._cond.wait(self._paused_until - now)
+                        continue
+
+                    self._refill(now)
+                    yield_to_interactive = lane == LANE_BACKGROUND and self._waiting[LANE_INTERACTIVE]
+                    if self._tokens >= floor and not yield_to_interactive:
+                        self._tokens -= 1
+                        break
+
+                    missing = floor - self._tokens
+                    self._cond.wait((missing if missing > 0 else 1) / self.rate)
+            finally:
+                self._waiting[lane] -= 1
+                self._cond.notify_all()
+
+            waited = time.monotonic() - started
+            stats = self._stats[lane]
+            stats['calls'] += 1
+            if waited > 0.01:
+                stats['waited'] += 1
+                stats['wait_seconds'] += waited
+                stats['max_wait'] = max(stats['max_wait'], waited)
+        return waited
+
+    def pause(self, seconds: float):
+        """Остановить выдачу токенов (после ответа 429)"""
+        with self._cond:
+            self.throttled += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+    def call(self, func, *args, **kwargs):
+        """Выполнить вызов API под квотой (с одним повтором после 429)"""
+        lane = current_lane()
+        for attempt in range(2):
+            self.acquire(lane)
+            try:
+                return func(*args, **kwargs)
+            except APIError as e:
+                if getattr(e, 'code', None) != 429 or attempt:
+                    raise
+                print(f"⏳ Квота Google Sheets исчерпана, пауза {self.backoff:.0f} с и повтор")
+                self.pause(self.backoff)
+
+    def stats(self) -> dict:
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                'tokens': self._tokens,
+                'capacity': self.capacity,
+                'per_minute': self.rate * 60,
+                'throttled': self.throttled,
+                'lanes': {lane: dict(stats) for lane, stats in self._stats.items()},
+            }
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+
+class QuotaWorksheet:
+    """
+    Прокси листа: каждый вызов API проходит через SheetsQuota
+
+    Атрибуты:
+        quota: Общая квота
+    """
+
+    def __init__(self, target, quota: SheetsQuota = None):
+        self._target = target
+        self._quota = quota or sheets_quota
+
+    def __getattr__(self, attr):
+        value = getattr(self._target, attr)
+        if attr not in API_METHODS or not callable(value):
+            return value
+
+        @functools.wraps(value)
+        def call(*args, **kwargs):
+            return self._quota.call(value, *args, **kwargs)
+
+        return call
+
+    def __repr__(self) -> str:
+        return f"<QuotaWorksheet {self._target!r}>"
+
+
+# Общая квота для всех листов Google Sheets
+sheets_quota = SheetsQuota()
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Как использовать:
+
+Листы Google Sheets в app/database/connection.py уже обёрнуты в QuotaWorksheet,
+отдельно ничего вызывать не нужно. Полоса определяется по api_scope
+(см. app/utils/api_stats.py): задачи с @scoped('job:...') и фоновые
+обновления кэшей (start_thread('refresh:...')) идут фоном, обработчики -
+в приоритетной полосе.
+
+Разовый вызов вне листов:
+    from app.utils.sheets_quota import sheets_quota
+
+    sheets_quota.call(spreadsheet.values_batch_get, ranges)
+
+Параметры квоты - app/config.py (SHEETS_QUOTA_*). Состояние - /api_stats.
+"""
@@ -0,0 +1,145 @@
+"""
+Режим webhook: апдейты приходят POST-запросами на встроенный aiohttp-сервер
+Telegram получает ответ сразу, апдейт обрабатывается в фоне
+"""
+
+import asyncio
+import secrets
+import signal
+from typing import Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from app.config import (
+    WEBHOOK_PATH,
+    WEBHOOK_DEFAULT_HOST,
+    WEBHOOK_DEFAULT_PORT,
+    UPDATE_CONCURRENCY_LIMIT
+)
+from app.middlewares import ConcurrencyLimitMiddleware
+
+
+def build_webhook_app(
+    dp: Dispatcher,
+    bot: Bot,
+    secret_token: str,
+    path: str = WEBHOOK_PATH,
+    limit: int = UPDATE_CONCURRENCY_LIMIT
+) -> web.Application:
+    """
+    aiohttp-приложение для приёма апдейтов
+
+    - запрос без заголовка X-Telegram-Bot-Api-Secret-Token с нашим секретом
+      отклоняется (401) до разбора апдейта
+    - ответ 200 уходит сразу, обработка идёт в фоновой задаче
+    - одновременно обрабатывается не больше limit апдейтов
+
+    Запуск/остановка приложения вызывают startup/shutdown диспетчера.
+
+    Args:
+        dp: Диспетчер с подключёнными роутерами
+        bot: Бот
+        secret_token: Секрет, переданный в setWebhook
+        path: Путь приёма апдейтов
+        limit: Максимум апдейтов в обработке одновременно
+
+    Returns:
+        web.Application: Приложение (limiter - в app['update_limiter'])
+    """
+    limiter = ConcurrencyLimitMiddleware(limit)
+    dp.update.outer_middleware(limiter)
+
+    app = web.Application()
+    app['update_limiter'] = limiter
+    # Сначала shutdown диспетчера (сброс буферов), потом закрытие сессии бота
+    setup_application(app, dp, bot=bot)
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=secret_token,
+        handle_in_background=True
+    ).register(app, path=path)
+    return app
+
+
+async def run_webhook(
+    dp: Dispatcher,
+    bot: Bot,
+    url: str,
+    secret_token: Optional[str] = None,
+    host: str = WEBHOOK_DEFAULT_HOST,
+    port: int = WEBHOOK_DEFAULT_PORT
+):
+    """
+    Запустить сервер, зарегистрировать webhook и работать до SIGINT/SIGTERM
+
+    Args:
+        dp: Диспетчер
+        bot: Бот
+        url: Внешний адрес бота (https://...), к нему добавляется WEBHOOK_PATH
+        secret_token: Секрет webhook; если не задан - случайный на каждый запуск
+        host: Адрес сервера
+        port: Порт сервера
+    """
+    # Webhook регистрируется при каждом запуске, поэтому случайный секрет безопасен
+    secret_token = secret_token or secrets.token_urlsafe(32)
+    app = build_webhook_app(dp, bot, secret_token)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows: остановка через KeyboardInterrupt
+            pass
+
+    try:
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+
+        webhook_url = url.rstrip('/') + WEBHOOK_PATH
+        await bot.set_webhook(
+            webhook_url,
+            secret_token=secret_token,
+            allowed_updates=dp.resolve_used_update_types(),
+            drop_pending_updates=False
+        )
+        print(f"🌐 Webhook: {webhook_url} (сервер {host}:{port}, "
+              f"одновременно до {app['update_limiter'].limit} апдейтов)")
+
+        await stop.wait()
+    finally:
+        # Webhook не снимаем: пока бот перезапускается, Telegram копит апдейты
+        await runner.cleanup()
+
+
+async def run_polling(dp: Dispatcher, bot: Bot):
+    """Polling (режим по умолчанию): снять webhook, если он остался, и читать getUpdates"""
+    await bot.delete_webhook(drop_pending_updates=False)
+    await dp.start_polling(bot, tasks_concurrency_limit=UPDATE_CONCURRENCY_LIMIT)
+
+
+# ============================================================================
+# ПРИМЕЧАНИЯ ПО ИСПОЛЬЗОВАНИЮ
+# ============================================================================
+
+"""
+Включение (.env):
+    WEBHOOK_URL = 'https://bot.example.com'   # без него - polling
+    WEBHOOK_SECRET = 'длинная_случайная_строка' # необязательно
+    WEBHOOK_PORT = 8080                        # необязательно
+
+Telegram шлёт апдейты на WEBHOOK_URL + WEBHOOK_PATH (по умолчанию /webhook).
+Сервер слушает WEBHOOK_HOST:WEBHOOK_PORT - перед ним нужен HTTPS
+(nginx/Caddy или туннель), Telegram не ходит на голый HTTP.
+
+Чтобы вернуться на polling, уберите WEBHOOK_URL: при старте webhook снимается.
+
+Замер пропускной способности webhook против polling без Telegram:
+    python bench_webhook.py --updates 2000 --handler-ms 20
+"""
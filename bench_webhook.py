@@ -0,0 +1,194 @@
+"""
+Замер пропускной способности: webhook против polling
+Без Telegram и Google Sheets: синтетические апдейты и обработчик-заглушка
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from typing import List, Optional
+
+import aiohttp
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetMe, GetUpdates
+from aiogram.types import Chat, Message, Update, User
+from aiohttp import web
+
+from app.webhook import build_webhook_app
+
+
+BENCH_TOKEN = '123456:' + 'A' * 35
+BENCH_SECRET = 'bench-secret'
+
+
+class BenchSession(BaseSession):
+    """
+    Сессия бота без сети: getUpdates отдаёт заранее подготовленные апдейты
+    пачками по 100 с задержкой rtt (как ответ Telegram), остальное - True
+
+    Атрибуты:
+        updates: Апдейты для polling
+        rtt: Задержка ответа getUpdates (сек)
+    """
+
+    def __init__(self, updates: Optional[List[Update]] = None, rtt: float = 0.0):
+        super().__init__()
+        self.updates = list(updates or [])
+        self.rtt = rtt
+
+    async def make_request(self, bot, method, timeout=None):
+        if isinstance(method, GetMe):
+            return User(id=1, is_bot=True, first_name='bench', username='bench_bot')
+        if isinstance(method, GetUpdates):
+            await asyncio.sleep(self.rtt)
+            offset = method.offset or 0
+            pending = [update for update in self.updates if update.update_id >= offset]
+            if not pending:
+                # Очередь пуста: long-poll ждёт новых апдейтов
+                await asyncio.sleep(1)
+            return pending[:method.limit or 100]
+        return True
+
+    async def stream_content(self, *args, **kwargs):
+        yield b''
+
+    async def close(self):
+        pass
+
+
+def make_updates(count: int) -> List[Update]:
+    """Синтетические сообщения /ping от count разных пользователей"""
+    now = datetime.now()
+    return [
+        Update(
+            update_id=index + 1,
+            message=Message(
+                message_id=index + 1,
+                date=now,
+                chat=Chat(id=100000000 + index, type='private'),
+                from_user=User(id=100000000 + index, is_bot=False, first_name='Bench'),
+                text='/ping'
+            )
+        )
+        for index in range(count)
+    ]
+
+
+def make_dispatcher(total: int, handler_ms: float, done: asyncio.Event) -> Dispatcher:
+    """Диспетчер с обработчиком, имитирующим ожидание I/O (Sheets, Telegram)"""
+    router = Router()
+    handled = {'count': 0}
+
+    @router.message()
+    async def handle(message: Message):
+        await asyncio.sleep(handler_ms / 1000)
+        handled['count'] += 1
+        if handled['count'] >= total:
+            done.set()
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def bench_polling(updates: List[Update], handler_ms: float, limit: int, rtt_ms: float) -> float:
+    done = asyncio.Event()
+    dp = make_dispatcher(len(updates), handler_ms, done)
+    bot = Bot(BENCH_TOKEN, session=BenchSession(updates, rtt=rtt_ms / 1000))
+
+    started = time.perf_counter()
+    polling = asyncio.create_task(dp.start_polling(
+        bot, handle_signals=False, close_bot_session=False, tasks_concurrency_limit=limit
+    ))
+    await done.wait()
+    elapsed = time.perf_counter() - started
+
+    await dp.stop_polling()
+    await polling
+    return elapsed
+
+
+async def bench_webhook(updates: List[Update], handler_ms: float, limit: int, connections: int, port: int) -> dict:
+    done = asyncio.Event()
+    dp = make_dispatcher(len(updates), handler_ms, done)
+    bot = Bot(BENCH_TOKEN, session=BenchSession())
+    app = build_webhook_app(dp, bot, BENCH_SECRET, limit=limit)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+    url = f"http://127.0.0.1:{port}/webhook"
+    bodies = [update.model_dump_json(exclude_none=True) for update in updates]
+    response_times = []
+
+    try:
+        async with aiohttp.ClientSession(headers={'Content-Type': 'application/json'}) as client:
+            # Чужой запрос без секрета должен быть отклонён
+            async with client.post(url, data=bodies[0]) as response:
+                rejected_status = response.status
+
+            queue = asyncio.Queue()
+            for body in bodies:
+                queue.put_nowait(body)
+
+            async def sender():
+                headers = {'X-Telegram-Bot-Api-Secret-Token': BENCH_SECRET}
+                while not queue.empty():
+                    body = queue.get_nowait()
+                    sent = time.perf_counter()
+                    async with client.post(url, data=body, headers=headers) as response:
+                        await response.read()
+                    response_times.append(time.perf_counter() - sent)
+
+            # Telegram держит до max_connections (по умолчанию 40) параллельных запросов
+            started = time.perf_counter()
+            await asyncio.gather(*(sender() for _ in range(connections)))
+            await done.wait()
+            elapsed = time.perf_counter() - started
+    finally:
+        limiter_stats = app['update_limiter'].stats()
+        await runner.cleanup()
+
+    response_times.sort()
+    return {
+        'elapsed': elapsed,
+        'rejected_status': rejected_status,
+        'response_p50_ms': response_times[len(response_times) // 2] * 1000,
+        'response_p99_ms': response_times[int(len(response_times) * 0.99) - 1] * 1000,
+        'limiter': limiter_stats,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--updates', type=int, default=2000, help='Сколько апдейтов прогнать')
+    parser.add_argument('--handler-ms', type=float, default=20, help='Время обработчика (мс)')
+    parser.add_argument('--limit', type=int, default=32, help='Апдейтов в обработке одновременно')
+    parser.add_argument('--rtt-ms', type=float, default=60, help='Задержка ответа getUpdates (мс)')
+    parser.add_argument('--connections', type=int, default=40, help='Параллельных POST в webhook')
+    parser.add_argument('--port', type=int, default=8089, help='Порт тестового сервера')
+    args = parser.parse_args()
+
+    updates = make_updates(args.updates)
+    print(f"🧪 {args.updates} апдейтов, обработчик {args.handler_ms:.0f} мс, "
+          f"одновременно {args.limit}\n")
+
+    polling = await bench_polling(updates, args.handler_ms, args.limit, args.rtt_ms)
+    print(f"📥 Polling (getUpdates {args.rtt_ms:.0f} мс, пачки по 100): "
+          f"{polling:.2f} с, {args.updates / polling:.0f} апдейтов/с")
+
+    webhook = await bench_webhook(updates, args.handler_ms, args.limit, args.connections, args.port)
+    limiter = webhook['limiter']
+    print(f"🌐 Webhook ({args.connections} соединений): "
+          f"{webhook['elapsed']:.2f} с, {args.updates / webhook['elapsed']:.0f} апдейтов/с")
+    print(f"   ответ Telegram: p50 {webhook['response_p50_ms']:.1f} мс, "
+          f"p99 {webhook['response_p99_ms']:.1f} мс")
+    print(f"   очередь: пик в обработке {limiter['peak']}/{limiter['limit']}, "
+          f"макс. ожидание {limiter['max_wait_ms']:.0f} мс")
+    print(f"   запрос без секрета: HTTP {webhook['rejected_status']}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -9,7 +9,20 @@ from aiogram.fsm.storage.memory import MemoryStorage
 
 from dotenv import load_dotenv
 from app.handlers import router
+from app.fsm_storage import SQLiteStorage
 from app.background_tasks import setup_scheduler
+from app.config import WEBHOOK_DEFAULT_HOST, WEBHOOK_DEFAULT_PORT, FSM_CACHE_SIZE
+from app.database.aio import run_sync, shutdown_executor
+from app.database.connection import warmup_worksheets
+from app.database.membership import membership
+from app.database.replicator import replicator
+from app.database.write_buffer import write_buffer
+from app.database.votes import vote_aggregator
+from app.services.broadcast_jobs import broadcast_jobs
+from app.utils.api_stats import scoped
+from app.utils.leader_lease import leader_lease
+from app.utils.loop_monitor import loop_monitor
+from app.webhook import run_webhook, run_polling
 
 
 async def main():
@@ -19,7 +32,10 @@ async def main():
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
     
-    storage = MemoryStorage()
+    storage = create_storage(
+        os.getenv('FSM_STORAGE', 'sqlite'),
+        processes=int(os.getenv('BOT_PROCESSES', '1'))
+    )
     dp = Dispatcher(storage=storage)
     dp['bot'] = bot
     
@@ -27,15 +43,82 @@ async def main():
     dp.shutdown.register(shutdown)
     
     dp.include_router(router)
-    await dp.start_polling(bot)
+
+    # Задан WEBHOOK_URL - webhook через встроенный aiohttp-сервер, иначе polling
+    webhook_url = os.getenv('WEBHOOK_URL')
+    if webhook_url:
+        await run_webhook(
+            dp, bot, webhook_url,
+            secret_token=os.getenv('WEBHOOK_SECRET'),
+            host=os.getenv('WEBHOOK_HOST', WEBHOOK_DEFAULT_HOST),
+            port=int(os.getenv('WEBHOOK_PORT', WEBHOOK_DEFAULT_PORT))
+        )
+    else:
+        await run_polling(dp, bot)
+
+
+def create_storage(kind: str, processes: int = 1):
+    """
+    Хранилище состояний FSM: sqlite (переживает перезапуск) или memory
+
+    При нескольких процессах (BOT_PROCESSES > 1) кэш в памяти отключается:
+    апдейты одного пользователя могут прийти в разные процессы, и каждый
+    должен читать актуальное состояние из общего файла.
+    """
+    if kind == 'memory':
+        if processes > 1:
+            print("⚠️ FSM_STORAGE=memory при нескольких процессах: состояния не общие")
+        return MemoryStorage()
+    return SQLiteStorage(cache_size=0 if processes > 1 else FSM_CACHE_SIZE)
+
+
+@scoped('startup:warmup')
+async def warmup():
+    """Параллельное подключение листов (+ первичная загрузка локальной базы)"""
+    await run_sync(warmup_worksheets)
+    if replicator:
+        await run_sync(replicator.bootstrap)
+    if os.getenv('MIGRATE_MEMBERS') == '1':
+        # Разовый шаг: лист members + перенос config D2/E2/F2 (один процесс - ведущий)
+        if leader_lease.is_leader:
+            await run_sync(membership.migrate)
+        else:
+            print("ℹ️ MIGRATE_MEMBERS=1: миграцию списков выполняет ведущий процесс")
+    try:
+        # Списки VIP/Diamond в память
+        await run_sync(membership.refresh)
+        if await run_sync(membership.legacy_pending):
+            print("⚠️ В config D2/E2/F2 остались старые списки: они не учитываются, "
+                  "перенесите их (MIGRATE_MEMBERS=1 или /migrate_members)")
+    except Exception as e:
+        print(f"⚠️ Списки не загружены, загрузятся при первом обращении: {e}")
 
 
 async def startup(dispatcher: Dispatcher):
     print('Bot started.')
     bot = dispatcher['bot']
+    loop_monitor.start()
+    # Прерванные рассылки продолжает ведущий (задача recover_orphans в планировщике)
+    broadcast_jobs.bind(bot)
+    # Подключение к Google Sheets идёт в фоне, бот начинает принимать сообщения сразу
+    dispatcher['warmup_task'] = asyncio.create_task(warmup())
     setup_scheduler(bot)
 
 async def shutdown(dispatcher: Dispatcher):
+    loop_monitor.stop()
+    # Рассылки открепляются от процесса - ведущий продолжит их
+    await broadcast_jobs.shutdown()
+    await dispatcher.storage.close()
+    # Отложенные изменения пользователей - в лист до выхода
+    await run_sync(write_buffer.flush)
+    await run_sync(vote_aggregator.flush)
+    if replicator and leader_lease.is_leader:
+        # Последние локальные изменения - в Google Sheets до выхода
+        # (local.db общий, отправляет только ведущий)
+        await run_sync(replicator.push)
+    # Роль ведущего - резервному процессу сразу, не дожидаясь истечения аренды
+    leader_lease.stop()
+    shutdown_executor(wait=False)
     print('Bot stopped.')
 
 
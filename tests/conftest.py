@@ -0,0 +1,26 @@
+"""
+Общие настройки тестов
+Google Sheets заменён имитацией в памяти (app/database/fake_sheets.py): без сети и квоты
+"""
+
+import os
+import sys
+
+import pytest
+
+# До первого импорта app.database: листы подключаются при импорте модулей
+os.environ.setdefault('SHEETS_BACKEND', 'fake')
+os.environ.setdefault('FAKE_SHEETS_LATENCY_MS', '0')
+os.environ.setdefault('FAKE_SHEETS_JITTER_MS', '0')
+os.environ.setdefault('FAKE_SHEETS_QUOTA_PER_MINUTE', '0')
+os.environ.setdefault('FAKE_SHEETS_USERS', '50')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database.fake_sheets import FakeLimits  # noqa: E402
+
+
+@pytest.fixture
+def limits():
+    """Счётчики вызовов и ошибки имитации (общие для листов одного теста)"""
+    return FakeLimits()
@@ -0,0 +1,99 @@
+"""Задания рассылки: пауза из другого процесса и быстрое "пауза - продолжить\""""
+
+import asyncio
+import functools
+from types import SimpleNamespace
+
+import pytest
+
+import app.services.broadcast_jobs as broadcast_jobs_module
+from app.services.broadcast_jobs import (
+    BroadcastJobManager, BroadcastJobStore, KIND_COPY, JOB_RUNNING, JOB_PAUSED, JOB_DONE
+)
+
+
+@pytest.fixture(autouse=True)
+def fast_engine(monkeypatch):
+    monkeypatch.setattr(broadcast_jobs_module, 'BroadcastEngine', functools.partial(
+        broadcast_jobs_module.BroadcastEngine, concurrency=1, initial_rate=1000, max_rate=1000, progress_every=5
+    ))
+
+
+class FakeBot:
+    def __init__(self, on_send=None):
+        self.sent = []
+        self.on_send = on_send
+
+    async def copy_message(self, chat_id, from_chat_id, message_id):
+        self.sent.append(chat_id)
+        if self.on_send:
+            self.on_send(len(self.sent))
+        await asyncio.sleep(0)
+
+    async def edit_message_text(self, **kwargs):
+        pass
+
+    async def send_message(self, **kwargs):
+        pass
+
+
+def make_manager(tmp_path, bot):
+    manager = BroadcastJobManager(BroadcastJobStore(str(tmp_path / 'broadcasts.db')), checkpoint_every=5)
+    manager.bind(bot)
+    return manager
+
+
+async def wait_idle(manager, job_id):
+    for _ in range(1000):
+        if not manager.is_active(job_id):
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError('рассылка не остановилась')
+
+
+def test_pause_from_other_process_stops_at_checkpoint(tmp_path):
+    other = BroadcastJobStore(str(tmp_path / 'broadcasts.db'))
+    state = SimpleNamespace(job_id=None)
+
+    def pause_elsewhere(sent):
+        if sent == 7:
+            other.set_status(state.job_id, JOB_PAUSED)
+
+    async def scenario():
+        bot = FakeBot(pause_elsewhere)
+        manager = make_manager(tmp_path, bot)
+        state.job_id = manager.submit(KIND_COPY, {'from_chat_id': 1, 'message_id': 1}, range(1, 41), chat_id=1)
+        await wait_idle(manager, state.job_id)
+        return manager, bot
+
+    manager, bot = asyncio.run(scenario())
+
+    job = manager.store.get_job(state.job_id)
+    assert job.status == JOB_PAUSED
+    assert job.owner is None
+    assert len(bot.sent) <= 7 + manager.checkpoint_every
+    assert manager.store.counts(state.job_id)['pending'] == 40 - len(bot.sent)
+
+
+def test_quick_pause_and_resume_keeps_running(tmp_path):
+    async def scenario():
+        bot = FakeBot()
+        manager = make_manager(tmp_path, bot)
+        job_id = manager.submit(KIND_COPY, {'from_chat_id': 1, 'message_id': 1}, range(1, 41), chat_id=1)
+        await asyncio.sleep(0.01)
+
+        assert manager.pause(job_id)
+        assert manager.resume(job_id)
+        assert manager.store.get_status(job_id) == JOB_RUNNING
+
+        for _ in range(1000):
+            if manager.store.get_status(job_id) == JOB_DONE:
+                break
+            await asyncio.sleep(0.01)
+        return manager, job_id, bot
+
+    manager, job_id, bot = asyncio.run(scenario())
+
+    assert manager.store.get_status(job_id) == JOB_DONE
+    assert manager.store.counts(job_id)['pending'] == 0
+    assert sorted(set(bot.sent)) == list(range(1, 41))
@@ -0,0 +1,39 @@
+"""Локальная SQLite: один файл из нескольких процессов (здесь - два LocalStore)"""
+
+import threading
+
+from app.database.local_store import LocalStore
+
+
+def test_seq_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / 'local.db')
+    first, second = LocalStore(path), LocalStore(path)
+    first.conn, second.conn   # оба открыли файл до первой записи
+
+    first.write_cells('users', {(2, 1): 'a'})
+    second.write_cells('users', {(3, 1): 'b'})
+    first.write_cells('users', {(2, 1): 'c'})
+
+    seqs = first.dirty_cells('users')
+    assert seqs[(3, 1)] > 1
+    assert seqs[(2, 1)] > seqs[(3, 1)]
+
+
+def test_concurrent_appends_get_distinct_rows(tmp_path):
+    path = str(tmp_path / 'local.db')
+    stores = [LocalStore(path), LocalStore(path)]
+
+    def append(store, name):
+        sheet = store.worksheet('users')
+        for index in range(30):
+            sheet.append_row([f'{name}{index}'])
+
+    threads = [threading.Thread(target=append, args=(store, name)) for store, name in zip(stores, 'ab')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    values = stores[0].worksheet('users').get_all_values()
+    assert len(values) == 60
+    assert sorted(row[0] for row in values) == sorted(f'{name}{index}' for name in 'ab' for index in range(30))
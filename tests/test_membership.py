@@ -0,0 +1,70 @@
+"""Списки: лист members, запасной путь через ячейки config и фоновое обновление"""
+
+import time
+
+import gspread
+import pytest
+
+import app.database.membership as membership_module
+from app.database.config_cache import ConfigSnapshot
+from app.database.fake_sheets import FakeWorksheet, MEMBERS_HEADERS
+from app.database.membership import MembershipStore, VIP, DIAMOND, TEMP_VIP
+
+
+class MissingWorksheet:
+    """Лист members ещё не создан"""
+
+    def __getattr__(self, attr):
+        raise gspread.exceptions.WorksheetNotFound('members')
+
+
+@pytest.fixture
+def legacy_config(monkeypatch):
+    snapshot = ConfigSnapshot.from_row(['main', 'vip', 'diamond', '1, 2', '3', '@SomeOne'])
+    monkeypatch.setattr(membership_module.config_cache, 'get', lambda: snapshot)
+
+
+def test_missing_sheet_falls_back_to_config_cells(legacy_config):
+    store = MembershipStore(MissingWorksheet())
+
+    assert store.contains(VIP, 2)
+    assert store.contains(DIAMOND, '3')
+    assert store.contains(TEMP_VIP, '@someone')
+    assert not store.contains(VIP, 3)
+
+
+def test_sheet_takes_priority_over_config_cells(legacy_config, limits):
+    worksheet = FakeWorksheet('members', [MEMBERS_HEADERS, ['vip', '7', '', '']], limits)
+    store = MembershipStore(worksheet)
+
+    assert store.members(VIP) == {'7'}
+    assert store.members(DIAMOND) == set()
+
+
+def test_empty_local_sheet_falls_back_to_config_cells(legacy_config, limits):
+    store = MembershipStore(FakeWorksheet('members', [], limits))
+
+    assert store.contains(VIP, '1')
+
+
+def test_background_refresh_uses_background_lane(legacy_config, limits, monkeypatch):
+    from app.utils.api_stats import api_scope
+    from app.utils.sheets_quota import current_lane, LANE_BACKGROUND
+
+    seen = []
+    worksheet = FakeWorksheet('members', [MEMBERS_HEADERS], limits)
+    store = MembershipStore(worksheet, ttl=0)
+    store.refresh()
+
+    monkeypatch.setattr(store, '_refresh', lambda: seen.append((api_scope.get(), current_lane())))
+    token = api_scope.set('handler:cmd_start')
+    try:
+        store.contains(VIP, '1')
+    finally:
+        api_scope.reset(token)
+
+    for _ in range(100):
+        if seen:
+            break
+        time.sleep(0.01)
+    assert seen == [('refresh:membership', LANE_BACKGROUND)]
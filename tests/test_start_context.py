@@ -0,0 +1,35 @@
+"""/start: ошибка чтения не должна превращаться в регистрацию без проверки дубля"""
+
+import pytest
+
+import app.database.users as users
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(users, 'add_user', lambda *args, **kwargs: calls.append(kwargs) or True)
+    monkeypatch.setattr(users, 'is_temporarily_vip_user', lambda username: False)
+    monkeypatch.setattr(users.users_cache, 'peek', lambda user_id: None)
+    monkeypatch.setattr(users.membership, 'contains', lambda name, member: False)
+    return calls
+
+
+def test_read_failure_is_not_new_user(monkeypatch, calls):
+    def fail(*args, **kwargs):
+        raise RuntimeError('quota')
+    monkeypatch.setattr(users.users_flight, 'do', fail)
+
+    context = users.prepare_start(999001, 'someone', 'Someone')
+
+    assert context.user is None and not context.loaded
+    assert calls == [{}]
+
+
+def test_missing_user_is_registered_without_recheck(monkeypatch, calls):
+    monkeypatch.setattr(users.users_flight, 'do', lambda *args, **kwargs: None)
+
+    context = users.prepare_start(999002, 'someone', 'Someone')
+
+    assert context.user is None and context.loaded
+    assert calls == [{'checked': True}]
@@ -0,0 +1,65 @@
+"""Группы уведомлений о подписке: границы дней (classify_subscriptions)"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.subscription import DATE_FORMAT, classify_subscriptions
+
+
+NOW = datetime(2026, 3, 10, 15, 0, 0)
+
+
+def user(user_id, sub_end, active=True):
+    return {
+        'user_id': str(user_id),
+        'sub_end': sub_end.strftime(DATE_FORMAT) if isinstance(sub_end, datetime) else sub_end,
+        'is_sub_active': str(active),
+    }
+
+
+def groups_of(user_id, groups):
+    return sorted(name for name, members in groups.items() if user_id in members)
+
+
+@pytest.mark.parametrize('sub_end, active, expected', [
+    # Активна, последний день: напоминание, но деактивировать ещё рано
+    (NOW.replace(hour=23, minute=59), True, ['expiring_today']),
+    # Активна, закончилась сегодня утром: последний день и деактивация
+    (NOW.replace(hour=9), True, ['expiring_today', 'to_expire']),
+    # Ровно 3 дня до окончания - по дате, а не по часам
+    (NOW + timedelta(days=3), True, ['expiring_3_days']),
+    ((NOW + timedelta(days=3)).replace(hour=0), True, ['expiring_3_days']),
+    (NOW + timedelta(days=2), True, []),
+    (NOW + timedelta(days=4), True, []),
+    # Уже неактивна: напоминания через 3 и 7 дней
+    (NOW - timedelta(days=3), False, ['expired_3_days']),
+    (NOW - timedelta(days=7), False, ['expired_7_days']),
+    (NOW - timedelta(days=5), False, []),
+    (NOW - timedelta(days=8), False, []),
+    # Не деактивирована вовремя: деактивация и сразу напоминание "3 дня после"
+    (NOW - timedelta(days=3), True, ['expired_3_days', 'to_expire']),
+    (NOW - timedelta(days=1), True, ['to_expire']),
+])
+def test_date_buckets(sub_end, active, expected):
+    groups = classify_subscriptions([user(1, sub_end, active)], now=NOW)
+    assert groups_of(1, groups) == expected
+
+
+def test_expiring_today_is_not_expiring_in_3_days():
+    groups = classify_subscriptions(
+        [user(1, NOW.replace(hour=20)), user(2, NOW + timedelta(days=3))], now=NOW
+    )
+    assert groups['expiring_today'] == [1]
+    assert groups['expiring_3_days'] == [2]
+
+
+@pytest.mark.parametrize('record', [
+    {'user_id': '', 'sub_end': NOW.strftime(DATE_FORMAT), 'is_sub_active': 'True'},
+    {'user_id': 'abc', 'sub_end': NOW.strftime(DATE_FORMAT), 'is_sub_active': 'True'},
+    {'user_id': '1', 'sub_end': '', 'is_sub_active': 'True'},
+    {'user_id': '1', 'sub_end': '10.03.2026', 'is_sub_active': 'True'},
+])
+def test_broken_rows_are_skipped(record):
+    groups = classify_subscriptions([record], now=NOW)
+    assert all(not members for members in groups.values())
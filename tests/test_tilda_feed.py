@@ -0,0 +1,113 @@
+"""Курсор Tilda: чтение хвоста, восстановление после перезапуска, полная сверка"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import app.database.tilda_feed as tilda_feed_module
+from app.database.fake_sheets import FakeWorksheet, TILDA_HEADERS
+from app.database.tilda_feed import TildaFeed
+
+
+def payment_row(username, processed=''):
+    return ['Name', f'{username}@example.com', '', f'@{username}', '990',
+            '2026-04-10 00:00:00', '2026-03-10 00:00:00', processed]
+
+
+@pytest.fixture(autouse=True)
+def leader(monkeypatch):
+    """Файл курсора пишет только ведущий процесс"""
+    monkeypatch.setattr(tilda_feed_module, 'leader_lease', SimpleNamespace(is_leader=True))
+
+
+@pytest.fixture
+def sheet(limits):
+    return FakeWorksheet('Лист1', [
+        TILDA_HEADERS,
+        payment_row('old', processed='TRUE'),   # строка 2
+        payment_row('alice'),                   # строка 3
+        payment_row('bob'),                     # строка 4
+    ], limits)
+
+
+def pending(feed):
+    return {payment.row_number: payment.username for payment in feed.fetch_unprocessed()}
+
+
+def test_tail_read_after_full_reconcile(sheet, limits, tmp_path):
+    feed = TildaFeed(sheet, state_file=str(tmp_path / 'tilda.json'), full_every=10)
+
+    assert pending(feed) == {3: '@alice', 4: '@bob'}
+
+    sheet.append_row(payment_row('carol'))
+    limits.reset()
+    assert pending(feed) == {3: '@alice', 4: '@bob', 5: '@carol'}
+    # Только хвост листа, без полного чтения
+    assert limits.stats()['calls'] == {('Лист1', 'get'): 1}
+
+
+def test_cursor_survives_restart(sheet, limits, tmp_path):
+    state_file = str(tmp_path / 'tilda.json')
+    feed = TildaFeed(sheet, state_file=state_file, full_every=10)
+    feed.fetch_unprocessed()
+    feed.forget([3])
+
+    sheet.append_row(payment_row('carol'))
+    limits.reset()
+    restarted = TildaFeed(sheet, state_file=state_file, full_every=10)
+    assert pending(restarted) == {4: '@bob', 5: '@carol'}
+    assert ('Лист1', 'get_all_values') not in limits.stats()['calls']
+
+
+def test_reconcile_after_row_deleted_before_cursor(sheet, limits, tmp_path):
+    full_every = 3
+    feed = TildaFeed(sheet, state_file=str(tmp_path / 'tilda.json'), full_every=full_every)
+    assert pending(feed) == {3: '@alice', 4: '@bob'}
+
+    # Строку 2 удалили вручную: строки сдвинулись, курсор (last_row=4) теперь за концом
+    # данных, а новая оплата легла в строку 4 - хвост её не увидит
+    values = sheet.get_all_values()
+    feed.worksheet = FakeWorksheet('Лист1', values[:1] + values[2:], limits)
+    feed.worksheet.append_row(payment_row('carol'))
+
+    # Не позже чем через full_every проверок полная сверка восстанавливает
+    # и пропущенную оплату, и номера строк
+    for _ in range(full_every + 1):
+        result = pending(feed)
+    assert result == {2: '@alice', 3: '@bob', 4: '@carol'}
+
+    rows = feed.worksheet.get_all_values()
+    for row_number, username in result.items():
+        assert rows[row_number - 1][3] == username
+
+
+def test_processed_rows_are_not_pending(sheet, tmp_path):
+    feed = TildaFeed(sheet, state_file=str(tmp_path / 'tilda.json'), full_every=10)
+    feed.fetch_unprocessed()
+
+    sheet.append_rows([payment_row('dave', processed='TRUE'), ['', '', '', '', '', '', '', '']])
+    assert pending(feed) == {3: '@alice', 4: '@bob'}
+    assert feed.processed_column() == 'H'
+
+
+def test_verify_drops_cursor_when_rows_moved(sheet, limits, tmp_path):
+    feed = TildaFeed(sheet, state_file=str(tmp_path / 'tilda.json'), full_every=10)
+    payments = feed.fetch_unprocessed()
+
+    # Строку 2 удалили вручную: в строке 3 теперь bob, в строке 4 - пусто
+    values = sheet.get_all_values()
+    feed.worksheet = FakeWorksheet('Лист1', values[:1] + values[2:], limits)
+    limits.reset()
+
+    assert feed.verify(payments) == []
+    assert limits.stats()['calls'] == {('Лист1', 'batch_get'): 1}
+    # Следующая проверка - полная сверка с правильными номерами строк
+    assert pending(feed) == {2: '@alice', 3: '@bob'}
+
+
+def test_verify_keeps_matching_rows(sheet, tmp_path):
+    feed = TildaFeed(sheet, state_file=str(tmp_path / 'tilda.json'), full_every=10)
+    payments = feed.fetch_unprocessed()
+
+    assert feed.verify(payments) == payments
+    assert pending(feed) == {3: '@alice', 4: '@bob'}
@@ -0,0 +1,80 @@
+"""Буфер отложенной записи users: слияние после неудачного сброса"""
+
+import pytest
+
+from app.database.fake_sheets import FakeWorksheet, USERS_HEADERS, quota_error
+from app.database.users_cache import UsersCache
+from app.database.write_buffer import UserWriteBuffer
+
+
+def user_row(user_id, username):
+    row = dict.fromkeys(USERS_HEADERS, '')
+    row.update({'user_id': str(user_id), 'username': username, 'is_sub_active': 'False'})
+    return [row[name] for name in USERS_HEADERS]
+
+
+@pytest.fixture
+def sheet(limits):
+    return FakeWorksheet('users', [USERS_HEADERS, user_row(1, '@one'), user_row(2, '@two')], limits)
+
+
+@pytest.fixture
+def buffer(sheet):
+    cache = UsersCache(sheet)
+    cache.reload()
+    return UserWriteBuffer(sheet, cache, max_cells=1000)
+
+
+def cell(sheet, row_number, field):
+    return sheet.get_all_values()[row_number - 1][USERS_HEADERS.index(field)]
+
+
+def test_newer_value_wins_after_failed_flush(sheet, limits, buffer):
+    buffer.put(1, {'is_sub_active': 'True', 'email': 'one@example.com'})
+
+    limits.error_rate = 1.0
+    assert buffer.flush() is False
+    limits.error_rate = 0.0
+
+    buffer.put(1, {'is_sub_active': 'False'})
+    assert buffer.pending() == {'1': {'is_sub_active': 'False', 'email': 'one@example.com'}}
+
+    assert buffer.flush() is True
+    assert cell(sheet, 2, 'is_sub_active') == 'False'
+    assert cell(sheet, 2, 'email') == 'one@example.com'
+    assert len(buffer) == 0
+
+
+def test_value_put_during_failed_flush_is_not_overwritten(sheet, buffer, monkeypatch):
+    buffer.put(1, {'is_sub_active': 'True'})
+    buffer.put(2, {'username': '@second'})
+
+    write = sheet.batch_update
+
+    def fail_after_newer_put(data, **kwargs):
+        # Пока запись идёт, обработчик успел поменять то же поле
+        buffer.put(1, {'is_sub_active': 'False'})
+        raise quota_error("Injected 429")
+
+    monkeypatch.setattr(sheet, 'batch_update', fail_after_newer_put)
+    assert buffer.flush() is False
+    # Пока запись не прошла, читатели видят последнее значение
+    assert buffer.cache.get(1)['is_sub_active'] == 'False'
+
+    monkeypatch.setattr(sheet, 'batch_update', write)
+    assert buffer.flush() is True
+    assert cell(sheet, 2, 'is_sub_active') == 'False'
+    assert cell(sheet, 3, 'username') == '@second'
+
+
+def test_failed_flush_keeps_changes_visible_after_reload(sheet, limits, buffer):
+    buffer.cache.overlay = buffer.pending
+    buffer.put(2, {'is_sub_active': 'True'})
+
+    limits.error_rate = 1.0
+    assert buffer.flush() is False
+    limits.error_rate = 0.0
+
+    buffer.cache.reload()
+    assert buffer.cache.get(2)['is_sub_active'] == 'True'
+    assert cell(sheet, 3, 'is_sub_active') == 'False'